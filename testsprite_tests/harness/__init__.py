@@ -0,0 +1,6 @@
+"""Shared tooling for running and measuring the TestSprite TC flows.
+
+The generated ``TC*.py`` scripts stay untouched; the harness runs them with
+context hooks (see :mod:`harness.runner`) and adds standalone measurement
+tools on top of the same configuration.
+"""
@@ -0,0 +1,172 @@
+"""Resource profiles: skip images, fonts and third-party scripts in functional TCs.
+
+Functional flows (TC002, TC013, TC017, ...) download product images, web
+fonts and third-party scripts they never look at. :class:`BlockingHook`
+routes every request of each context through a :class:`Profile`:
+
+* ``functional`` aborts images, media, fonts and any request to a host
+  other than the app, Supabase and the payment API;
+* ``visual`` lets everything through (TC004 and TC012 use it by default,
+  see :data:`TC_PROFILES`);
+* ``--allow`` / ``--deny`` add URL glob patterns on top of either; an
+  allow pattern wins over everything else.
+
+Each TC result gets the number of requests blocked and the bytes they would
+have cost. Sizes come from ``tmp/harness/asset_sizes.json``, which every run
+updates with the requests it lets through; blocked URLs never seen before
+are counted under ``unknown_size`` (one ``--profile visual`` run fills it).
+
+Usage::
+
+    python -m harness.blocking TC002 TC013 TC017
+    python -m harness.blocking TC004 --profile functional --allow "*/capa-home.webp"
+"""
+
+import argparse
+import fnmatch
+import json
+import sys
+from collections import Counter
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from harness import config
+from harness.runner import ContextHook, find_tcs, run_tcs, tc_id
+
+SIZES_FILE = config.OUTPUT_DIR / "asset_sizes.json"
+
+FIRST_PARTY = {urlsplit(u).netloc for u in (config.BASE_URL, config.SUPABASE_URL, config.PAYMENT_API_URL)}
+
+
+@dataclass
+class Profile:
+    name: str
+    resource_types: frozenset = frozenset()
+    third_party: bool = False
+    allow: list = field(default_factory=list)
+    deny: list = field(default_factory=list)
+
+    def blocks(self, url, resource_type):
+        """Reason ``url`` is blocked (``image``, ``third-party``, ``deny``...) or ``None``."""
+        if any(fnmatch.fnmatch(url, pattern) for pattern in self.allow):
+            return None
+        if any(fnmatch.fnmatch(url, pattern) for pattern in self.deny):
+            return "deny"
+        if resource_type in self.resource_types:
+            return resource_type
+        if self.third_party and urlsplit(url).netloc not in FIRST_PARTY:
+            return "third-party"
+        return None
+
+
+PROFILES = {
+    "functional": Profile("functional", frozenset({"image", "media", "font"}), third_party=True),
+    "visual": Profile("visual"),
+}
+
+# TCs whose assertions depend on what the page looks like
+TC_PROFILES = {"TC004": "visual", "TC012": "visual"}
+
+
+def size_key(url):
+    # Vite appends ?t=/?v= cache busters; the asset is the same
+    return url.split("?", 1)[0]
+
+
+class BlockingHook(ContextHook):
+    def __init__(self, profile, sizes_path=SIZES_FILE):
+        self.profile = profile
+        self.sizes_path = sizes_path
+        try:
+            with open(sizes_path, encoding="utf-8") as fh:
+                self.sizes = json.load(fh)
+        except (FileNotFoundError, ValueError):
+            self.sizes = {}
+        self._reset()
+
+    def _reset(self):
+        self.blocked = Counter()
+        self.blocked_bytes = 0
+        self.unknown = 0
+        self.allowed = 0
+        self.allowed_bytes = 0
+
+    async def on_context(self, context):
+        await context.route("**/*", self._route)
+        context.on("requestfinished", self._on_finished)
+
+    async def _route(self, route, request):
+        reason = self.profile.blocks(request.url, request.resource_type)
+        if reason is None:
+            await route.fallback()
+            return
+        self.blocked[reason] += 1
+        size = self.sizes.get(size_key(request.url))
+        if size is None:
+            self.unknown += 1
+        else:
+            self.blocked_bytes += size
+        await route.abort("blockedbyclient")
+
+    async def _on_finished(self, request):
+        sizes = await request.sizes()
+        size = sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        self.allowed += 1
+        self.allowed_bytes += size
+        self.sizes[size_key(request.url)] = size
+
+    def on_finish(self, result):
+        result.extras["blocking"] = {
+            "profile": self.profile.name,
+            "blocked_requests": sum(self.blocked.values()),
+            "blocked_by": dict(self.blocked),
+            "blocked_bytes": self.blocked_bytes,
+            "unknown_size": self.unknown,
+            "allowed_requests": self.allowed,
+            "allowed_bytes": self.allowed_bytes,
+        }
+        self._reset()
+
+    def save(self):
+        self.sizes_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.sizes_path, "w", encoding="utf-8") as fh:
+            json.dump(self.sizes, fh)
+
+
+def profile_for(tc, args):
+    """The ``--profile`` given, else the TC's default, plus the custom patterns."""
+    base = PROFILES[args.profile or TC_PROFILES.get(tc, "functional")]
+    return Profile(base.name, base.resource_types, base.third_party,
+                   base.allow + args.allow, base.deny + args.deny)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run TCs with resource blocking profiles")
+    parser.add_argument("tests", nargs="*", help="TC ids; all when omitted")
+    parser.add_argument("--profile", choices=tuple(PROFILES), default=None,
+                        help="profile for every TC (default: per TC, functional unless visual)")
+    parser.add_argument("--allow", action="append", default=[], metavar="GLOB", help="never block these URLs")
+    parser.add_argument("--deny", action="append", default=[], metavar="GLOB", help="always block these URLs")
+    parser.add_argument("--out", default=str(config.output_path("blocking.json")))
+    args = parser.parse_args(argv)
+
+    results = []
+    hook = BlockingHook(PROFILES["visual"])
+    try:
+        for path in find_tcs(args.tests):
+            hook.profile = profile_for(tc_id(path), args)
+            results.extend(run_tcs([path], [hook]))
+    finally:
+        hook.save()
+    for result in results:
+        stats = result.extras["blocking"]
+        print("%s %-10s blocked %d requests, %.1f KiB (+%d unknown size)" % (
+            result.name, stats["profile"], stats["blocked_requests"],
+            stats["blocked_bytes"] / 1024, stats["unknown_size"]))
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump([r.__dict__ for r in results], fh, indent=2)
+    return 0 if all(r.passed for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Browser helpers for harness scenarios that drive their own contexts."""
+
+from playwright import async_api
+
+from harness import config
+
+# Records, per key, the wall-clock time (ms, sub-ms precision) at which the
+# watched element first matched. Installed with ``context.add_init_script``.
+WATCH_SCRIPT = """
+(() => {
+  window.__harnessSeen = window.__harnessSeen || {};
+  const now = () => performance.timeOrigin + performance.now();
+  window.__harnessWatch = (key, selector, expected, exact) => {
+    const matches = () => {
+      const el = document.querySelector(selector);
+      if (!el) return false;
+      const text = el.textContent.trim();
+      return exact ? text === expected : text.includes(expected);
+    };
+    delete window.__harnessSeen[key];
+    if (matches()) { window.__harnessSeen[key] = now(); return; }
+    const observer = new MutationObserver(() => {
+      if (matches()) { window.__harnessSeen[key] = now(); observer.disconnect(); }
+    });
+    observer.observe(document.documentElement, { subtree: true, childList: true, characterData: true });
+  };
+  window.__harnessNow = now;
+})();
+"""
+
+# Access token and user of the Supabase session the app keeps in localStorage
+SESSION_JS = """
+() => {
+  const raw = localStorage.getItem('supabase.auth.token');
+  if (!raw) return null;
+  const session = JSON.parse(raw);
+  const s = session.currentSession || session;
+  return { token: s.access_token, userId: s.user && s.user.id, email: s.user && s.user.email };
+}
+"""
+
+
+async def launch(pw, headless=True):
+    """Chromium with the same flags as the generated TCs."""
+    return await pw.chromium.launch(headless=headless, args=config.BROWSER_ARGS)
+
+
+async def new_context(browser, storage_state=None, **options):
+    context = await browser.new_context(storage_state=storage_state, **options)
+    context.set_default_timeout(config.DEFAULT_TIMEOUT_MS)
+    return context
+
+
+async def open_page(context, path="/", timeout=10000):
+    """Open ``path`` and wait for DOMContentLoaded the way the TCs do."""
+    page = await context.new_page()
+    await page.goto(config.url(path), wait_until="commit", timeout=timeout)
+    try:
+        await page.wait_for_load_state("domcontentloaded", timeout=3000)
+    except async_api.Error:
+        pass
+    return page
+
+
+async def install_watch(context):
+    await context.add_init_script(WATCH_SCRIPT)
+
+
+async def arm_watch(page, key, selector, expected, exact=False):
+    """Start observing ``selector`` until its text matches ``expected``."""
+    await page.evaluate(
+        "([k, s, e, x]) => window.__harnessWatch(k, s, e, x)", [key, selector, expected, exact]
+    )
+
+
+async def seen_at(page, key):
+    """Epoch ms at which ``key`` matched, or ``None``."""
+    return await page.evaluate("k => window.__harnessSeen[k] ?? null", key)
+
+
+async def page_now(page):
+    return await page.evaluate("() => window.__harnessNow()")
+
+
+async def session(page):
+    """``{token, userId, email}`` of the logged-in user, or ``None``."""
+    return await page.evaluate(SESSION_JS)
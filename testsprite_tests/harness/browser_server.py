@@ -0,0 +1,191 @@
+"""Long-lived Chromium that TC runs connect to instead of launching their own.
+
+Each TC launches Chromium inside ``run_test()``; during development that
+launch dominates a single-TC run. ``start`` launches Chromium once, with the
+TC flags and ``--remote-debugging-port``, and writes its CDP endpoint to
+``tmp/harness/browser_server.json``. :func:`harness.runner.run_tc` then
+turns the TC's ``chromium.launch()`` into ``connect_over_cdp()`` on that
+endpoint, falling back to a normal launch when the server is down.
+
+Python Playwright has no ``launch_server``, so the server is the Chromium
+binary Playwright installed, started directly. Contexts cannot be handed
+across CDP connections either; instead the server keeps the app warm by
+loading ``--warm`` paths once at startup, so the Vite module graph is
+transformed and Chromium's code cache is filled before the first TC.
+
+Usage::
+
+    python -m harness.browser_server start --detach
+    python -m harness.runner TC005        # connects to the server
+    python -m harness.browser_server status
+    python -m harness.browser_server stop
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from harness import config
+
+STATE_FILE = config.OUTPUT_DIR / "browser_server.json"
+ENDPOINT_RE = re.compile(rb"DevTools listening on (ws://\S+)")
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def read_state():
+    """The running server's ``{endpoint, pid, chromium_pid, started_at}`` or ``None``."""
+    try:
+        with open(STATE_FILE, encoding="utf-8") as fh:
+            state = json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return None
+    if not _alive(state["chromium_pid"]):
+        return None
+    return state
+
+
+def endpoint():
+    """CDP endpoint of the running server, or ``None``."""
+    state = read_state()
+    return state["endpoint"] if state else None
+
+
+async def warm(ws_endpoint, paths, report):
+    """Load ``paths`` once so the dev server and Chromium caches are hot."""
+    async with async_playwright() as pw:
+        browser = await pw.chromium.connect_over_cdp(ws_endpoint)
+        try:
+            context = await browser.new_context()
+            page = await context.new_page()
+            for path in paths:
+                started = time.perf_counter()
+                try:
+                    await page.goto(config.url(path), wait_until="load", timeout=60000)
+                    report("warmed %s in %.1fs" % (path, time.perf_counter() - started))
+                except async_api.Error as exc:
+                    report("warm %s failed: %s" % (path, str(exc).splitlines()[0]))
+            await context.close()
+        finally:
+            await browser.close()
+
+
+async def serve(args, report=print):
+    async with async_playwright() as pw:
+        executable = pw.chromium.executable_path
+    profile = tempfile.mkdtemp(prefix="harness-chromium-")
+    command = [
+        executable, "--headless=new", "--remote-debugging-port=%d" % args.port,
+        "--user-data-dir=" + profile, "--no-first-run", "--no-default-browser-check",
+    ] + config.BROWSER_ARGS
+    proc = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+    )
+    ws_endpoint = None
+    while ws_endpoint is None:
+        line = await asyncio.wait_for(proc.stderr.readline(), timeout=30)
+        if not line:
+            raise RuntimeError("Chromium exited before printing its DevTools endpoint")
+        match = ENDPOINT_RE.search(line)
+        if match:
+            ws_endpoint = match.group(1).decode()
+    # Keep draining stderr so Chromium never blocks on a full pipe
+    drain = asyncio.ensure_future(proc.stderr.read())
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        if args.warm:
+            await warm(ws_endpoint, args.warm, report)
+        STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(STATE_FILE, "w", encoding="utf-8") as fh:
+            json.dump({"endpoint": ws_endpoint, "pid": os.getpid(), "chromium_pid": proc.pid,
+                       "started_at": time.time()}, fh)
+        report("browser server on %s" % ws_endpoint)
+        exited = asyncio.ensure_future(proc.wait())
+        await asyncio.wait([exited, asyncio.ensure_future(stop.wait())], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if STATE_FILE.exists():
+            STATE_FILE.unlink()
+        if proc.returncode is None:
+            proc.terminate()
+            await proc.wait()
+        drain.cancel()
+    return 0
+
+
+def start_detached(argv, timeout=60.0):
+    """Re-run ``start`` in its own session and wait for the state file."""
+    log = open(config.output_path("browser_server.log"), "ab")
+    subprocess.Popen(
+        [sys.executable, "-m", "harness.browser_server", "start"] + argv,
+        cwd=str(config.TESTS_DIR), stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        state = read_state()
+        if state:
+            return state
+        time.sleep(0.1)
+    raise SystemExit("browser server did not start; see %s" % log.name)
+
+
+def stop_server():
+    state = read_state()
+    if not state:
+        return False
+    os.kill(state["pid"], signal.SIGTERM)
+    deadline = time.monotonic() + 10
+    while STATE_FILE.exists() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared warm Chromium for TC runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    start = sub.add_parser("start", help="launch the server (foreground unless --detach)")
+    start.add_argument("--detach", action="store_true")
+    start.add_argument("--port", type=int, default=0, help="remote debugging port; 0 picks a free one")
+    start.add_argument("--warm", nargs="*", default=["/"], help="paths loaded once at startup")
+    sub.add_parser("status")
+    sub.add_parser("stop")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        state = read_state()
+        print(("running on %s since %s" % (state["endpoint"], time.ctime(state["started_at"])))
+              if state else "not running")
+        return 0 if state else 1
+    if args.command == "stop":
+        print("stopped" if stop_server() else "not running")
+        return 0
+    if read_state():
+        raise SystemExit("browser server already running on %s" % endpoint())
+    if args.detach:
+        state = start_detached(["--port", str(args.port), "--warm"] + args.warm)
+        print("browser server on %s (pid %d)" % (state["endpoint"], state["pid"]))
+        return 0
+    return asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""JS/CSS coverage per route: bytes shipped vs bytes executed.
+
+TC015 waits for a "Critical Test Coverage Complete" banner that does not
+exist. :class:`CoverageHook` measures instead: every page the TCs open gets
+a CDP session with V8 precise coverage (``Profiler``) and CSS rule usage
+tracking. At each main-frame navigation (SPA route changes included) the
+coverage since the previous one is taken and written as one JSONL record
+for the route being left, so code running on the new route right before the
+navigation event counts for the previous one.
+
+Records go to ``tmp/harness/coverage/bundle-<pid>.jsonl``, one shard per
+process, so parallel workers never share a file. Script sources and their
+source maps (inline in Vite dev, ``.map`` files with ``vite build
+--sourcemap``) are stored once per content hash under ``sources/``.
+``report`` merges every shard and prints, per route, the JS/CSS bytes it
+loaded and executed, and per chunk the unused bytes broken down by original
+``src/`` file.
+
+Usage::
+
+    python -m harness.bundle_coverage run TC004 TC005 TC006 --reset
+    python -m harness.bundle_coverage report --top 10
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sys
+from collections import defaultdict
+from urllib.parse import urljoin, urlsplit
+
+from playwright import async_api
+
+from harness import config
+from harness.runner import ContextHook, find_tcs, on_new_page, run_tcs, tc_id
+from harness.sourcemap import (SourceMap, executed_ranges, line_starts, load_map, merge_ranges, overlap,
+                               range_bytes)
+
+COVERAGE_DIR = config.OUTPUT_DIR / "coverage"
+APP_ORIGIN = urlsplit(config.BASE_URL).netloc
+
+
+def strip_query(url):
+    # Vite adds ?t=/?v= stamps; the module is the same
+    return url.split("?", 1)[0]
+
+
+def route_of(url):
+    parts = urlsplit(url)
+    return (parts.path or "/") if parts.netloc == APP_ORIGIN else None
+
+
+class PageTracker:
+    """Coverage bookkeeping for one page's CDP session."""
+
+    def __init__(self, hook, context, page, cdp):
+        self.hook = hook
+        self.context = context
+        self.page = page
+        self.cdp = cdp
+        self.scripts = {}
+        self.sheets = {}
+        self.loaded_scripts = set()
+        self.loaded_sheets = set()
+        self.route = None
+        self.lock = asyncio.Lock()
+
+    async def start(self):
+        self.cdp.on("Debugger.scriptParsed", self._on_script)
+        self.cdp.on("CSS.styleSheetAdded", self._on_sheet)
+        await self.cdp.send("Profiler.enable")
+        await self.cdp.send("Profiler.startPreciseCoverage", {"callCount": False, "detailed": True})
+        await self.cdp.send("Debugger.enable")
+        await self.cdp.send("DOM.enable")
+        await self.cdp.send("CSS.enable")
+        await self.cdp.send("CSS.startRuleUsageTracking")
+        self.page.on("framenavigated", self._on_navigated)
+
+    def _on_script(self, params):
+        if urlsplit(params.get("url", "")).netloc != APP_ORIGIN:
+            return
+        self.scripts[params["scriptId"]] = params
+        self.loaded_scripts.add(params["scriptId"])
+
+    def _on_sheet(self, params):
+        header = params["header"]
+        self.sheets[header["styleSheetId"]] = header
+        self.loaded_sheets.add(header["styleSheetId"])
+
+    async def _on_navigated(self, frame):
+        if frame is self.page.main_frame:
+            await self.flush(route_of(frame.url))
+
+    async def flush(self, next_route=None):
+        """Write the coverage since the last flush under the current route."""
+        async with self.lock:
+            route, self.route = self.route, next_route
+            try:
+                js = await self.cdp.send("Profiler.takePreciseCoverage")
+                css = await self.cdp.send("CSS.takeCoverageDelta")
+                if route is None:
+                    return
+                record = {"tc": self.hook.tc, "route": route, "scripts": [], "sheets": []}
+                for entry in js["result"]:
+                    meta = self.scripts.get(entry["scriptId"])
+                    if meta is None:
+                        continue
+                    digest, length = await self.hook.save_script(self.context, self.cdp, meta)
+                    record["scripts"].append({
+                        "url": strip_query(meta["url"]),
+                        "source": digest,
+                        "length": length,
+                        "loaded": entry["scriptId"] in self.loaded_scripts,
+                        "executed": executed_ranges(entry["functions"]),
+                    })
+                used = defaultdict(list)
+                for rule in css["coverage"]:
+                    if rule["used"]:
+                        used[rule["styleSheetId"]].append([int(rule["startOffset"]), int(rule["endOffset"])])
+                for sheet_id in set(used) | self.loaded_sheets:
+                    header = self.sheets.get(sheet_id)
+                    if header is None:
+                        continue
+                    record["sheets"].append({
+                        "url": await self.hook.sheet_key(self.cdp, header),
+                        "length": header["length"],
+                        "loaded": sheet_id in self.loaded_sheets,
+                        "used": merge_ranges(used[sheet_id]),
+                    })
+            except async_api.Error:
+                return  # page or session already gone
+            finally:
+                self.loaded_scripts = set()
+                self.loaded_sheets = set()
+            self.hook.write(record)
+
+
+class CoverageHook(ContextHook):
+    def __init__(self, out_dir=COVERAGE_DIR):
+        self.sources_dir = out_dir / "sources"
+        self.sources_dir.mkdir(parents=True, exist_ok=True)
+        self._fh = open(out_dir / ("bundle-%d.jsonl" % os.getpid()), "a", encoding="utf-8")
+        self.tc = ""
+        self.records = 0
+        self.saved = {}
+        self.sheet_keys = {}
+        self.trackers = {}
+
+    async def on_context(self, context):
+        self.trackers[context] = on_new_page(context, lambda page: self._attach(context, page))
+
+    async def _attach(self, context, page):
+        tracker = PageTracker(self, context, page, await context.new_cdp_session(page))
+        await tracker.start()
+        return tracker
+
+    async def on_context_close(self, context):
+        for task in self.trackers.pop(context, {}).values():
+            tracker = await task
+            await tracker.flush()
+
+    async def save_script(self, context, cdp, meta):
+        """Content hash and length of the script; source and map are stored once per hash."""
+        script_id = meta["scriptId"]
+        # Script and stylesheet ids are only unique within one CDP session
+        key = (id(cdp), script_id)
+        if key in self.saved:
+            return self.saved[key]
+        source = (await cdp.send("Debugger.getScriptSource", {"scriptId": script_id}))["scriptSource"]
+        digest = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        path = self.sources_dir / (digest + ".json")
+        if not path.exists():
+            map_url = meta.get("sourceMapURL") or ""
+            if map_url and not map_url.startswith("data:"):
+                response = await context.request.get(urljoin(meta["url"], map_url))
+                source_map = await response.json() if response.ok else None
+            else:
+                source_map = load_map(meta["url"], map_url)
+            with open(path, "w", encoding="utf-8") as fh:
+                json.dump({"url": strip_query(meta["url"]), "source": source, "map": source_map}, fh)
+        self.saved[key] = (digest, len(source))
+        return self.saved[key]
+
+    async def sheet_key(self, cdp, header):
+        """``sourceURL`` of a stylesheet, or a content hash for injected ``<style>`` tags."""
+        sheet_id = header["styleSheetId"]
+        key = (id(cdp), sheet_id)
+        if key not in self.sheet_keys:
+            if header.get("sourceURL") and not header.get("isInline"):
+                self.sheet_keys[key] = strip_query(header["sourceURL"])
+            else:
+                text = (await cdp.send("CSS.getStyleSheetText", {"styleSheetId": sheet_id}))["text"]
+                self.sheet_keys[key] = "inline:" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+        return self.sheet_keys[key]
+
+    def write(self, record):
+        self._fh.write(json.dumps(record) + "\n")
+        self.records += 1
+
+    def on_finish(self, result):
+        self._fh.flush()
+        self.saved.clear()
+        self.sheet_keys.clear()
+        result.extras["coverage_records"] = self.records
+
+    def close(self):
+        self._fh.close()
+
+
+def read_shards(out_dir=COVERAGE_DIR, prefix="bundle-"):
+    """Every record of every worker's shard, streamed."""
+    for path in sorted(out_dir.glob(prefix + "*.jsonl")):
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def load_source(digest, out_dir=COVERAGE_DIR):
+    with open(out_dir / "sources" / (digest + ".json"), encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def by_source(digest, executed, out_dir=COVERAGE_DIR):
+    """``{original file: [bytes, executed bytes]}`` of a chunk through its source map."""
+    stored = load_source(digest, out_dir)
+    if not stored["map"]:
+        return {stored["url"]: [len(stored["source"]), range_bytes(executed)]}
+    source_map = SourceMap(stored["map"], stored["url"])
+    totals = defaultdict(lambda: [0, 0])
+    cursor = 0
+    for start, end, src, _ in source_map.spans(line_starts(stored["source"]), len(stored["source"])):
+        covered, cursor = overlap(executed, start, end, cursor)
+        totals[source_map.sources[src]][0] += end - start
+        totals[source_map.sources[src]][1] += covered
+    return totals
+
+
+def aggregate(records):
+    """Union executed ranges per (route, asset) and per chunk."""
+    routes = defaultdict(lambda: {"js": {}, "css": {}})
+    chunks = {}
+    for record in records:
+        route = routes[record["route"]]
+        for kind, items, ranges_key in (("js", record["scripts"], "executed"), ("css", record["sheets"], "used")):
+            for item in items:
+                key = (item["url"], item.get("source"))
+                entry = route[kind].setdefault(key, {"length": item["length"], "loaded": False, "ranges": []})
+                entry["loaded"] = entry["loaded"] or item["loaded"]
+                entry["ranges"] = merge_ranges(entry["ranges"] + item[ranges_key])
+                chunk = chunks.setdefault((kind,) + key, {"length": item["length"], "ranges": [], "routes": set()})
+                chunk["ranges"] = merge_ranges(chunk["ranges"] + item[ranges_key])
+                chunk["routes"].add(record["route"])
+    return routes, chunks
+
+
+def report(args, out=print):
+    routes, chunks = aggregate(read_shards())
+    if not chunks:
+        raise SystemExit("No coverage records under %s; run `bundle_coverage run` first" % COVERAGE_DIR)
+    route_rows = []
+    for route, kinds in sorted(routes.items()):
+        row = {"route": route}
+        for kind, entries in kinds.items():
+            loaded = [e for e in entries.values() if e["loaded"]]
+            row[kind] = {
+                "assets": len(entries),
+                "shipped_bytes": sum(e["length"] for e in loaded),
+                "executed_bytes": sum(range_bytes(e["ranges"]) for e in entries.values()),
+                "unused_loaded_bytes": sum(e["length"] - range_bytes(e["ranges"]) for e in loaded),
+            }
+        route_rows.append(row)
+    out("%-28s %12s %12s %12s %12s" % ("route", "js shipped", "js executed", "css shipped", "css used"))
+    for row in route_rows:
+        out("%-28s %11.1fK %11.1fK %11.1fK %11.1fK" % (
+            row["route"], row["js"]["shipped_bytes"] / 1024, row["js"]["executed_bytes"] / 1024,
+            row["css"]["shipped_bytes"] / 1024, row["css"]["executed_bytes"] / 1024))
+
+    chunk_rows = []
+    for (kind, url, digest), chunk in chunks.items():
+        used = range_bytes(chunk["ranges"])
+        row = {"kind": kind, "url": url, "bytes": chunk["length"], "executed_bytes": used,
+               "unused_pct": 100.0 * (chunk["length"] - used) / chunk["length"] if chunk["length"] else 0.0,
+               "routes": sorted(chunk["routes"])}
+        if kind == "js" and digest:
+            files = by_source(digest, chunk["ranges"])
+            row["sources"] = sorted(
+                ({"file": f, "bytes": b, "unused_bytes": b - e} for f, (b, e) in files.items()),
+                key=lambda s: -s["unused_bytes"],
+            )
+        chunk_rows.append(row)
+    chunk_rows.sort(key=lambda r: -(r["bytes"] - r["executed_bytes"]))
+    out("")
+    out("top unused chunks:")
+    for row in chunk_rows[:args.top]:
+        out("%-3s %-60s %8.1fK %5.1f%% unused" % (row["kind"], row["url"][-60:], row["bytes"] / 1024, row["unused_pct"]))
+        for source in row.get("sources", [])[:3]:
+            out("      %-58s %8.1fK unused" % (source["file"][-58:], source["unused_bytes"] / 1024))
+    return {"routes": route_rows, "chunks": chunk_rows}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JS/CSS bytes shipped vs executed per route")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="run TCs collecting coverage into this worker's shard")
+    run.add_argument("tests", nargs="*", help="TC ids; all when omitted")
+    run.add_argument("--reset", action="store_true", help="delete earlier shards and sources first")
+    rep = sub.add_parser("report", help="merge every shard")
+    rep.add_argument("--top", type=int, default=10)
+    rep.add_argument("--out", default=str(config.output_path("bundle_coverage.json")))
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        result = report(args)
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+        return 0
+
+    if args.reset and COVERAGE_DIR.exists():
+        shutil.rmtree(COVERAGE_DIR)
+    hook = CoverageHook()
+    results = []
+    try:
+        for path in find_tcs(args.tests):
+            hook.tc = tc_id(path)
+            results.extend(run_tcs([path], [hook]))
+    finally:
+        hook.close()
+    print("%d coverage records in %s" % (hook.records, COVERAGE_DIR))
+    return 0 if all(r.passed for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Driving ``/checkout`` up to the pending Pix modal for harness scenarios."""
+
+from harness import browser as hb
+
+# Valid values for every CustomerInformation field (the CPF passes the checksum)
+CUSTOMER = {
+    "firstName": "Bench",
+    "lastName": "Buyer",
+    "email": "bench.buyer@example.com",
+    "personType": "fisica",
+    "cpf": "529.982.247-25",
+    "country": "Brasil",
+    "zipCode": "01310-100",
+    "address": "Avenida Paulista",
+    "number": "1000",
+    "neighborhood": "Bela Vista",
+    "city": "São Paulo",
+    "state": "SP",
+    "phone": "(11) 99999-9999",
+}
+
+# Radix selects are buttons next to their label, not native <select>s
+SELECT_LABELS = {"country": "País*", "state": "Estado*"}
+
+PIX_PENDING_TEXT = "Aguardando confirmação do pagamento"
+CPF_VALID_TEXT = "válido"
+ORDER_BUTTON = 'button:has-text("Finalizar Pedido")'
+
+
+# Fills every field inside one evaluate. Text inputs go through the native
+# value setter plus bubbling input/change events, which is what React's
+# onChange listens to; radios are clicked; Radix selects get the pointer
+# sequence they open and select on, awaiting a frame for the portal.
+FAST_FILL_JS = """
+async ({ values, selects }) => {
+  const frame = () => new Promise(r => requestAnimationFrame(() => r()));
+  const setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+  const pointer = (el, type) => el.dispatchEvent(new PointerEvent(type, { bubbles: true, button: 0, pointerType: 'mouse' }));
+  const missing = [];
+  for (const [name, value] of Object.entries(values)) {
+    if (name === 'personType') {
+      const radio = document.getElementById(value);
+      if (radio) radio.click(); else missing.push(name);
+      continue;
+    }
+    if (selects[name]) {
+      const label = [...document.querySelectorAll('label')].find(l => l.textContent.trim() === selects[name]);
+      const trigger = label && label.parentElement.querySelector('button[role="combobox"]');
+      if (!trigger) { missing.push(name); continue; }
+      pointer(trigger, 'pointerdown');
+      let option = null;
+      for (let i = 0; i < 30 && !option; i++) {
+        await frame();
+        option = [...document.querySelectorAll('[role="option"]')].find(o => o.textContent.trim() === value);
+      }
+      if (!option) { missing.push(name); continue; }
+      pointer(option, 'pointerup');
+      option.click();
+      await frame();
+      continue;
+    }
+    const input = name === 'zipCode'
+      ? document.querySelector('input[placeholder="00000-000"]')
+      : document.querySelector(`input[name="${name}"]`);
+    if (!input) { missing.push(name); continue; }
+    setter.call(input, value);
+    input.dispatchEvent(new Event('input', { bubbles: true }));
+    input.dispatchEvent(new Event('change', { bubbles: true }));
+  }
+  return missing;
+}
+"""
+
+
+def _input(page, name):
+    if name == "zipCode":
+        return page.locator('input[placeholder="00000-000"]').first
+    return page.locator('input[name="%s"]' % name).first
+
+
+async def fill_customer(page, values=None):
+    """Fill the form one field at a time, the way a user (and TC017) does."""
+    values = dict(CUSTOMER, **(values or {}))
+    for name, value in values.items():
+        if name == "personType":
+            await page.locator("#%s" % value).click()
+        elif name in SELECT_LABELS:
+            item = page.locator('div:has(> label:text-is("%s"))' % SELECT_LABELS[name])
+            await item.locator('button[role="combobox"]').click()
+            await page.get_by_role("option", name=value, exact=True).click()
+        else:
+            await _input(page, name).fill(value)
+
+
+async def fast_fill(page, values=None, timeout=5000):
+    """Fill the whole form in one round trip and wait once for it to settle.
+
+    For setup only; TC017 and anything testing input behavior should use
+    :func:`fill_customer`. Returns after the CPF/CNPJ check reports valid.
+    """
+    values = dict(CUSTOMER, **(values or {}))
+    missing = await page.evaluate(FAST_FILL_JS, {"values": values, "selects": SELECT_LABELS})
+    if missing:
+        raise RuntimeError("checkout fields not found: %s" % ", ".join(missing))
+    await page.locator("p.text-green-600", has_text=CPF_VALID_TEXT).first.wait_for(timeout=timeout)
+
+
+async def submit_order(page):
+    await page.locator("#terms-checkbox").click()
+    await page.locator(ORDER_BUTTON).click()
+
+
+async def open_pending_pix(context, values=None, per_field=False, timeout=30000):
+    """Open ``/checkout`` (cart from the storage state), submit and wait for the Pix modal."""
+    page = await hb.open_page(context, "/checkout")
+    await _input(page, "firstName").wait_for()
+    if per_field:
+        await fill_customer(page, values)
+    else:
+        await fast_fill(page, values)
+    await submit_order(page)
+    await page.get_by_text(PIX_PENDING_TEXT).wait_for(timeout=timeout)
+    return page
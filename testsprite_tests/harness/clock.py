@@ -0,0 +1,167 @@
+"""Virtual time for the pages and the local Pix mock.
+
+:class:`VirtualClock` installs Playwright's fake clock (``context.clock``)
+in every context and keeps the harness-side "now" in step with it, so
+fast-forwarding 30 minutes of Pix validity takes milliseconds and
+:class:`harness.payment_mock.PixMock` expires or pays charges at the same
+virtual instant the page's countdown reaches them.
+
+:class:`ClockHook` does this for the unmodified TC files: each
+``--advance TEXT=DURATION`` jumps the clock once when ``TEXT`` first
+appears in a page (e.g. when the Pix modal shows "Aguardando confirmação do
+pagamento"). ``--mock`` serves the Pix functions from the mock instead of
+AbacatePay, ``--pay-after`` schedules the payment and ``--webhooks`` posts
+``billing.paid`` to ``webhook-abacatepay`` at the virtual payment time.
+
+Usage::
+
+    python -m harness.clock TC016 --mock --advance "Aguardando confirmação do pagamento=31m"
+    python -m harness.clock TC007 --mock --pay-after 10m --advance "Aguardando confirmação=10m"
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+
+from harness import config
+from harness.payment_mock import PixMock
+from harness.runner import ContextHook, find_tcs, run_tcs
+
+DURATION_RE = re.compile(r"^(\d+(?:\.\d+)?)(ms|s|m|h)?$")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}
+
+# Calls the exposed binding once per page when a trigger text shows up
+TRIGGER_SCRIPT = """
+(texts) => {
+  const pending = new Set(texts);
+  const check = () => {
+    const body = document.body ? document.body.innerText : '';
+    for (const text of [...pending]) {
+      if (body.includes(text)) { pending.delete(text); window.__harnessClockTrigger(text); }
+    }
+    if (!pending.size) observer.disconnect();
+  };
+  const observer = new MutationObserver(check);
+  const start = () => { observer.observe(document.documentElement, { subtree: true, childList: true, characterData: true }); check(); };
+  if (document.documentElement) start(); else document.addEventListener('DOMContentLoaded', start);
+}
+"""
+
+
+def parse_duration(text):
+    """Seconds for ``90``, ``500ms``, ``45s``, ``30m`` or ``2h``."""
+    match = DURATION_RE.match(text.strip())
+    if not match:
+        raise argparse.ArgumentTypeError("bad duration %r" % text)
+    return float(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+def parse_advance(text):
+    trigger, _, duration = text.rpartition("=")
+    if not trigger:
+        raise argparse.ArgumentTypeError("expected TEXT=DURATION, got %r" % text)
+    return trigger, parse_duration(duration)
+
+
+class VirtualClock:
+    """Wall-clock time plus every fast-forward applied to the pages."""
+
+    def __init__(self):
+        self.offset = 0.0
+        self.contexts = []
+        self.jumps = []
+
+    def now(self):
+        return time.time() + self.offset
+
+    async def attach(self, context):
+        """Install the fake clock at the current virtual time."""
+        await context.clock.install(time=self.now())
+        self.contexts.append(context)
+
+    def detach(self, context):
+        if context in self.contexts:
+            self.contexts.remove(context)
+
+    async def advance(self, seconds):
+        """Jump every attached page (timers included) and the mock forward."""
+        self.offset += seconds
+        self.jumps.append({"at": time.time(), "seconds": seconds})
+        for context in list(self.contexts):
+            await context.clock.fast_forward(int(seconds * 1000))
+
+
+class ClockHook(ContextHook):
+    def __init__(self, advances=(), mock=None):
+        self.clock = VirtualClock()
+        self.advances = dict(advances)
+        self.mock = mock
+        self.fired = set()
+        if mock:
+            mock.now = self.clock.now
+
+    async def on_context(self, context):
+        await self.clock.attach(context)
+        if self.mock:
+            await self.mock.install(context)
+        if self.advances:
+            await context.expose_binding("__harnessClockTrigger", self._on_trigger)
+            await context.add_init_script(
+                "(%s)(%s)" % (TRIGGER_SCRIPT.strip(), json.dumps(list(self.advances)))
+            )
+
+    def _on_trigger(self, source, text):
+        # Once per run: several pages showing the same text advance the clock once
+        if text in self.fired:
+            return
+        self.fired.add(text)
+        asyncio.ensure_future(self.clock.advance(self.advances[text]))
+
+    async def on_context_close(self, context):
+        self.clock.detach(context)
+        if self.mock:
+            self.mock.detach(context)
+
+    def on_finish(self, result):
+        result.extras["clock_jumps"] = self.clock.jumps
+        self.clock.jumps = []
+        self.fired.clear()
+        if self.mock:
+            result.extras["pix_events"] = self.mock.events
+            self.mock.events = []
+            # The TC's event loop is gone; the next TC starts its own ticker
+            self.mock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run TCs under a virtual clock")
+    parser.add_argument("tests", nargs="*", help="TC ids; all when omitted")
+    parser.add_argument("--advance", action="append", type=parse_advance, default=[],
+                        metavar="TEXT=DURATION", help="fast-forward once TEXT appears (repeatable)")
+    parser.add_argument("--mock", action="store_true", help="serve the Pix functions from the local mock")
+    parser.add_argument("--pay-after", type=parse_duration, default=None, help="virtual time until the mock pays")
+    parser.add_argument("--webhooks", action="store_true", help="mock posts billing.paid to webhook-abacatepay")
+    parser.add_argument("--webhook-delay", type=parse_duration, default=0.0)
+    parser.add_argument("--out", default=str(config.output_path("clock.json")))
+    args = parser.parse_args(argv)
+
+    mock = None
+    if args.mock:
+        mock = PixMock(pay_after=args.pay_after, webhook_delay=args.webhook_delay,
+                       deliver_webhooks=args.webhooks)
+    hook = ClockHook(args.advance, mock)
+    try:
+        results = run_tcs(find_tcs(args.tests), [hook])
+    finally:
+        if mock:
+            mock.close()
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump([r.__dict__ for r in results], fh, indent=2)
+    return 0 if all(r.passed for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
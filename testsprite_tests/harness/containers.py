@@ -0,0 +1,50 @@
+"""CPU/memory sampling of the local Supabase containers through ``docker stats``."""
+
+import asyncio
+import json
+
+SIZE_UNITS = {"B": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3, "kB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3}
+
+
+async def find(prefix):
+    """Name of the first running container whose name contains ``prefix``, or ``None``."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "docker", "ps", "--filter", "name=%s" % prefix, "--format", "{{.Names}}",
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        )
+    except OSError:
+        return None
+    out, _ = await proc.communicate()
+    names = out.decode().split()
+    return names[0] if names else None
+
+
+def parse_size(text):
+    for unit in sorted(SIZE_UNITS, key=len, reverse=True):
+        if text.endswith(unit):
+            return float(text[: -len(unit)]) * SIZE_UNITS[unit]
+    return float(text or 0)
+
+
+async def sample(names, samples, stop, interval=2.0):
+    """Append ``{container, cpu_pct, mem_bytes}`` rows for ``names`` until ``stop`` is set."""
+    while not stop.is_set():
+        proc = await asyncio.create_subprocess_exec(
+            "docker", "stats", "--no-stream", "--format", "{{json .}}", *names,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        )
+        out, _ = await proc.communicate()
+        for line in out.decode().splitlines():
+            row = json.loads(line)
+            samples.append(
+                {
+                    "container": row["Name"],
+                    "cpu_pct": float(row["CPUPerc"].rstrip("%") or 0),
+                    "mem_bytes": parse_size(row["MemUsage"].split("/")[0].strip()),
+                }
+            )
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,77 @@
+"""Direct Postgres access for the database-side benchmarks (asyncpg)."""
+
+import asyncpg
+
+from harness import config
+
+
+async def create_pool(dsn=None, min_size=1, max_size=10, **kwargs):
+    """Open an asyncpg pool against :data:`config.DATABASE_URL` by default."""
+    return await asyncpg.create_pool(
+        dsn or config.DATABASE_URL, min_size=min_size, max_size=max_size, **kwargs
+    )
+
+
+async def connect(dsn=None):
+    """Single connection for tools that need session state (EXPLAIN, DDL)."""
+    return await asyncpg.connect(dsn or config.DATABASE_URL)
+
+
+async def column_types(conn, table, schema="public"):
+    """``{column: formatted_type}`` for a table, empty when it does not exist."""
+    rows = await conn.fetch(
+        """
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod) AS type
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = $1 AND c.relname = $2 AND a.attnum > 0 AND NOT a.attisdropped
+        """,
+        schema,
+        table,
+    )
+    return {r["attname"]: r["type"] for r in rows}
+
+
+async def existing_indexes(conn, table, schema="public"):
+    """Column lists of the non-partial indexes on a table."""
+    rows = await conn.fetch(
+        """
+        SELECT array_agg(a.attname ORDER BY k.ord) AS columns
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        CROSS JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord)
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+        WHERE n.nspname = $1 AND c.relname = $2 AND i.indpred IS NULL
+        GROUP BY i.indexrelid
+        """,
+        schema,
+        table,
+    )
+    return [list(r["columns"]) for r in rows]
+
+
+async def create_order(conn, external_id, email, name="Bench Buyer", total=60, order_type="product",
+                       status="pending", payment_id=None, items=None):
+    """Create an order through ``create_order_with_lock`` like the edge functions do."""
+    return await conn.fetchval(
+        """
+        SELECT order_id FROM create_order_with_lock(
+            $1, $2, $3, $4, '11999999999', $5, $6, $7, $7, 'pix', $8, NULL, NULL, $9::jsonb
+        )
+        """,
+        external_id,
+        payment_id,
+        email,
+        name,
+        external_id[-11:],
+        total,
+        status,
+        order_type,
+        items,
+    )
+
+
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
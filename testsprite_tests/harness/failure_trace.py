@@ -0,0 +1,230 @@
+"""Failure-only Playwright traces from a rolling buffer of the last steps.
+
+When TC006 or TC016 fails at step 18 all we get is an ``AssertionError``;
+tracing and video on every run would slow the suite down and fill the disk.
+:class:`RingTraceHook` traces every context (DOM snapshots, screencast,
+network, console) but keeps only a ring of recent chunks:
+
+* every ``--steps`` actions (``click``, ``fill``, ``goto``, ... patched on
+  ``Locator`` / ``Page`` while the TC runs) the current chunk is written to
+  the ring directory (``/dev/shm`` when available, so it stays in memory)
+  and the chunk before the previous one is deleted;
+* at context close the last chunk joins the ring, together with an in-memory
+  screenshot of every open page;
+* if the TC failed, the ring is merged into one trace zip under
+  ``tmp/harness/failures/<TC>-<time>/`` with the screenshots and the names
+  of the last steps, ending with the one that raised; otherwise it is
+  dropped.
+
+The trace covers at least the last ``--steps`` actions of each context.
+``--measure`` runs every TC ``--repeat`` times with tracing off and with the
+ring, interleaved, and reports the median overhead.
+
+Usage::
+
+    python -m harness.failure_trace TC006 TC016
+    python -m harness.failure_trace TC006 --measure --repeat 5
+    npx playwright show-trace tmp/harness/failures/TC006-20250101-120000/trace.zip
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from playwright.async_api import Error
+
+from harness import config
+from harness.runner import ContextHook, find_tcs, patch_steps, run_tc, run_tcs, tc_id
+
+FAILURES_DIR = config.OUTPUT_DIR / "failures"
+
+
+def default_ring_dir():
+    shm = Path("/dev/shm")
+    return shm if shm.is_dir() and os.access(shm, os.W_OK) else Path(tempfile.gettempdir())
+
+
+def merge_traces(paths, out):
+    """One trace zip holding every chunk in ``paths``.
+
+    The trace viewer loads each ``<ordinal>.trace`` (with its ``.network`` and
+    ``.stacks``) as a separate context, so chunk entries get an ordinal
+    prefix and the content-addressed ``resources/`` are shared.
+    """
+    seen = set()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as merged:
+        for ordinal, path in enumerate(paths):
+            with zipfile.ZipFile(path) as chunk:
+                for name in chunk.namelist():
+                    target = name if name.startswith("resources/") else "%d-%s" % (ordinal, name)
+                    if target not in seen:
+                        seen.add(target)
+                        merged.writestr(target, chunk.read(name))
+    return str(out)
+
+
+@dataclass
+class Ring:
+    """Trace chunks and recent steps of one context."""
+    index: int
+    chunks: list = field(default_factory=list)
+    steps: deque = None
+    count: int = 0
+    written: int = 0
+    screenshots: list = field(default_factory=list)
+
+
+class RingTraceHook(ContextHook):
+    def __init__(self, steps=20, ring_dir=None, out_dir=FAILURES_DIR):
+        self.steps = steps
+        self.ring_dir = Path(ring_dir or default_ring_dir()) / ("harness-trace-%d" % os.getpid())
+        self.out_dir = Path(out_dir)
+        self.tc = None
+        self.rings = {}
+        self.finished = []
+        self.rotations = 0
+        self._restore = None
+
+    def chunk_path(self, ring):
+        self.ring_dir.mkdir(parents=True, exist_ok=True)
+        ring.written += 1
+        return self.ring_dir / ("%s-%d-%d.zip" % (self.tc or "context", ring.index, ring.written))
+
+    async def on_context(self, context):
+        await context.tracing.start(screenshots=True, snapshots=True)
+        self.rings[context] = Ring(len(self.rings) + len(self.finished), steps=deque(maxlen=self.steps))
+        if self._restore is None:
+            self._restore = patch_steps(self._after_step, self._before_step)
+
+    async def _before_step(self, page, description):
+        # Recorded before the action runs, so the step that raised is listed too
+        ring = self.rings.get(page.context)
+        if ring is not None:
+            ring.steps.append(description)
+
+    async def _after_step(self, page, description):
+        ring = self.rings.get(page.context)
+        if ring is None:
+            return
+        ring.count += 1
+        if ring.count % self.steps:
+            return
+        # Two chunks of ``steps`` actions always cover the last ``steps``
+        path = self.chunk_path(ring)
+        await page.context.tracing.stop_chunk(path=str(path))
+        await page.context.tracing.start_chunk()
+        ring.chunks.append(path)
+        while len(ring.chunks) > 2:
+            ring.chunks.pop(0).unlink()
+        self.rotations += 1
+
+    async def on_context_close(self, context):
+        ring = self.rings.pop(context, None)
+        if ring is None:
+            return
+        for page in context.pages:
+            try:
+                ring.screenshots.append(await page.screenshot(timeout=2000))
+            except Error:
+                pass
+        try:
+            path = self.chunk_path(ring)
+            await context.tracing.stop_chunk(path=str(path))
+            await context.tracing.stop()
+            ring.chunks.append(path)
+        except Error:
+            pass  # browser already gone; keep the chunks written so far
+        self.finished.append(ring)
+
+    def on_finish(self, result):
+        if self._restore:
+            self._restore()
+            self._restore = None
+        rings = sorted(self.finished + list(self.rings.values()), key=lambda r: r.index)
+        result.extras["trace_ring"] = {"steps": sum(r.count for r in rings), "rotations": self.rotations}
+        if not result.passed and any(r.chunks for r in rings):
+            out = self.out_dir / ("%s-%s" % (result.name, time.strftime("%Y%m%d-%H%M%S")))
+            out.mkdir(parents=True, exist_ok=True)
+            result.extras["failure_trace"] = merge_traces([p for r in rings for p in r.chunks], out / "trace.zip")
+            shots = []
+            for ring in rings:
+                for n, png in enumerate(ring.screenshots):
+                    path = out / ("context%d-page%d.png" % (ring.index, n))
+                    path.write_bytes(png)
+                    shots.append(str(path))
+            result.extras["failure_screenshots"] = shots
+            with open(out / "steps.json", "w", encoding="utf-8") as fh:
+                json.dump({"error": result.error, "last_steps": {r.index: list(r.steps) for r in rings}}, fh, indent=2)
+        for ring in rings:
+            for path in ring.chunks:
+                path.unlink(missing_ok=True)
+        self.rings = {}
+        self.finished = []
+        self.rotations = 0
+
+    def close(self):
+        shutil.rmtree(self.ring_dir, ignore_errors=True)
+
+
+def measure(paths, hook, repeat, report=print):
+    """Median duration per TC with tracing off and with the ring, runs interleaved."""
+    rows = []
+    for path in paths:
+        off, ring = [], []
+        hook.tc = tc_id(path)
+        for _ in range(repeat):
+            off.append(run_tc(path).duration_s)
+            ring.append(run_tc(path, [hook]).duration_s)
+        row = {"tc": tc_id(path), "off_s": statistics.median(off), "ring_s": statistics.median(ring),
+               "off_runs": off, "ring_runs": ring}
+        row["overhead_pct"] = 100.0 * (row["ring_s"] - row["off_s"]) / row["off_s"] if row["off_s"] else None
+        report("%-7s off %6.2fs  ring %6.2fs  %+6.1f%%" % (row["tc"], row["off_s"], row["ring_s"],
+                                                          row["overhead_pct"] or 0.0))
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep Playwright traces only for failing TCs")
+    parser.add_argument("tests", nargs="*", help="TC ids; all when omitted")
+    parser.add_argument("--steps", type=int, default=20, help="actions the failure trace covers at least")
+    parser.add_argument("--ring-dir", default=None, help="defaults to /dev/shm (tmpfs) when writable")
+    parser.add_argument("--measure", action="store_true", help="also time every TC with tracing off")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per mode with --measure")
+    parser.add_argument("--out", default=str(config.output_path("failure_trace.json")))
+    args = parser.parse_args(argv)
+
+    hook = RingTraceHook(args.steps, args.ring_dir)
+    paths = find_tcs(args.tests)
+    try:
+        if args.measure:
+            output = {"overhead": measure(paths, hook, args.repeat)}
+            passed = True
+        else:
+            results = []
+            for path in paths:
+                hook.tc = tc_id(path)
+                results.extend(run_tcs([path], [hook]))
+            for result in results:
+                if "failure_trace" in result.extras:
+                    print("%s trace: npx playwright show-trace %s" % (result.name, result.extras["failure_trace"]))
+            output = [r.__dict__ for r in results]
+            passed = all(r.passed for r in results)
+    finally:
+        hook.close()
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(output, fh, indent=2)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
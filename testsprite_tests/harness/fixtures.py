@@ -0,0 +1,195 @@
+"""API-driven fixtures: cart, order and ticket state without clicking through "Loja".
+
+Most flows spend 15-30 s in the store before reaching what they test. These
+fixtures write the state directly through the Supabase REST API, over one
+pooled Playwright ``APIRequestContext`` per run, so a scenario can open the
+page straight on its target route:
+
+* :meth:`Fixtures.cart` replaces the logged-in user's ``cart_items`` (with
+  the session token from the storage state, so RLS applies as in the app);
+* :meth:`Fixtures.local_cart` seeds the anonymous ``localStorage`` cart
+  before the app boots;
+* :meth:`Fixtures.order` and :meth:`Fixtures.paid_tickets` create orders
+  and tickets with the service role, through ``create_order_with_lock`` and
+  ``create_tickets_atomic`` like the edge functions.
+
+UI-level add-to-cart stays covered by TC005 only. Everything created is
+tagged ``bench-fx-<tag>`` and removed by :meth:`Fixtures.cleanup`.
+
+Usage::
+
+    fixtures = await Fixtures.start(pw, config.CUSTOMER_STORAGE_STATE)
+    await fixtures.cart(products=2)
+    page = await hb.open_page(context, "/checkout")
+    ...
+    await fixtures.cleanup()
+"""
+
+import json
+import uuid
+
+from harness import config
+
+SESSION_KEY = "supabase.auth.token"
+
+
+def session_from_state(path):
+    """``{token, userId, email}`` stored in a Playwright storage state file, or ``None``."""
+    if not path:
+        return None
+    try:
+        with open(path, encoding="utf-8") as fh:
+            state = json.load(fh)
+    except FileNotFoundError:
+        return None
+    for origin in state.get("origins", []):
+        for item in origin.get("localStorage", []):
+            if item["name"] == SESSION_KEY:
+                session = json.loads(item["value"])
+                session = session.get("currentSession", session)
+                user = session.get("user") or {}
+                return {"token": session["access_token"], "userId": user.get("id"), "email": user.get("email")}
+    return None
+
+
+class Rest:
+    """Minimal PostgREST client on a shared ``APIRequestContext``."""
+
+    def __init__(self, request, token):
+        self.request = request
+        self.headers = {
+            "apikey": config.SUPABASE_ANON_KEY,
+            "Authorization": "Bearer " + token,
+            "Content-Type": "application/json",
+        }
+
+    async def call(self, method, path, params=None, data=None, prefer=None):
+        headers = dict(self.headers)
+        if prefer:
+            headers["Prefer"] = prefer
+        response = await self.request.fetch(
+            config.SUPABASE_URL.rstrip("/") + "/rest/v1/" + path,
+            method=method, params=params, data=data, headers=headers,
+        )
+        if not response.ok:
+            raise RuntimeError("%s %s -> %d %s" % (method, path, response.status, await response.text()))
+        text = await response.text()
+        return json.loads(text) if text else None
+
+    async def select(self, table, **params):
+        return await self.call("GET", table, params=params)
+
+    async def insert(self, table, rows):
+        return await self.call("POST", table, data=rows, prefer="return=representation")
+
+    async def delete(self, table, **params):
+        return await self.call("DELETE", table, params=params)
+
+    async def rpc(self, name, **args):
+        return await self.call("POST", "rpc/" + name, data=args)
+
+
+class Fixtures:
+    def __init__(self, request, session=None):
+        self.request = request
+        self.session = session
+        self.tag = uuid.uuid4().hex[:6]
+        self.service = Rest(request, config.SUPABASE_SERVICE_ROLE_KEY or config.SUPABASE_ANON_KEY)
+        self.user = Rest(request, session["token"]) if session else None
+        self.orders = []
+        self._owned_request = False
+
+    @classmethod
+    async def start(cls, pw, storage_state=None):
+        """Fixtures sharing one new request context (closed by :meth:`cleanup`)."""
+        fixtures = cls(await pw.request.new_context(), session_from_state(storage_state))
+        fixtures._owned_request = True
+        return fixtures
+
+    async def products(self, count=1):
+        rows = await self.service.select(
+            "products", select="id,name,price,image_url,category",
+            stock_quantity="gt.0", order="created_at", limit=str(count),
+        )
+        if len(rows) < count:
+            raise SystemExit("Need %d products in stock, found %d; seed the local database first" % (count, len(rows)))
+        return rows
+
+    async def event(self):
+        rows = await self.service.select("events", select="id,title", order="created_at", limit="1")
+        if not rows:
+            raise SystemExit("No rows in events; seed the local database first")
+        return rows[0]
+
+    async def cart(self, products=1, quantity=1, tickets=0, ticket_price=60):
+        """Replace the logged-in user's cart with ``products`` items (+ ``tickets`` event tickets)."""
+        if not self.user:
+            raise RuntimeError("cart() needs a storage state with a Supabase session; use local_cart()")
+        user_id = self.session["userId"]
+        await self.user.delete("cart_items", user_id="eq." + user_id)
+        rows = [
+            {"user_id": user_id, "product_id": p["id"], "quantity": quantity,
+             "unit_price": p["price"], "total_price": p["price"] * quantity}
+            for p in (await self.products(products) if products else [])
+        ]
+        if tickets:
+            event = await self.event()
+            rows.append({"user_id": user_id, "event_id": event["id"], "ticket_type": "individual",
+                         "quantity": tickets, "unit_price": ticket_price,
+                         "total_price": ticket_price * tickets})
+        return await self.user.insert("cart_items", rows) if rows else []
+
+    async def local_cart(self, context, products=1, quantity=1):
+        """Seed the anonymous ``localStorage`` cart of every page in ``context``."""
+        items = [
+            {"id": p["id"], "product_id": p["id"], "name": p["name"], "price": p["price"],
+             "image": p.get("image_url") or "", "images": [p["image_url"]] if p.get("image_url") else [],
+             "category": p.get("category") or "", "quantity": quantity, "unit_price": p["price"],
+             "total_price": p["price"] * quantity, "metadata": {}}
+            for p in await self.products(products)
+        ]
+        await context.add_init_script(
+            "localStorage.getItem('cart') || localStorage.setItem('cart', %s)" % json.dumps(json.dumps(items))
+        )
+        return items
+
+    async def order(self, status="pending", order_type="product", total=60, items=None, email=None):
+        """Create an order the way the edge functions do; returns its id."""
+        external_id = "bench-fx-%s-%03d" % (self.tag, len(self.orders))
+        email = email or (self.session or {}).get("email") or "bench+%s@example.com" % external_id
+        rows = await self.service.rpc(
+            "create_order_with_lock",
+            p_external_id=external_id, p_payment_id=None, p_customer_email=email,
+            p_customer_name="Bench Buyer", p_customer_phone="11999999999",
+            p_customer_document=external_id[-11:], p_total_amount=total,
+            p_payment_status=status, p_status=status, p_order_type=order_type, p_items=items,
+            p_user_id=(self.session or {}).get("userId"),
+        )
+        self.orders.append(external_id)
+        return rows[0]["order_id"]
+
+    async def paid_tickets(self, quantity=1, price=60):
+        """A paid ticket order with ``quantity`` issued tickets; returns the order id."""
+        event = await self.event()
+        order_id = await self.order("paid", "ticket", total=price * quantity)
+        await self.service.rpc(
+            "create_tickets_atomic",
+            p_order_id=order_id,
+            p_items=[{"event_id": event["id"], "ticket_type": "individual", "price": price}] * quantity,
+            p_customer_data={"email": (self.session or {}).get("email"), "user_id": (self.session or {}).get("userId")},
+        )
+        return order_id
+
+    async def cleanup(self, keep_cart=False):
+        pattern = "like.bench-fx-%s-*" % self.tag
+        orders = await self.service.select("orders", select="id", external_id=pattern)
+        if orders:
+            ids = "in.(%s)" % ",".join(o["id"] for o in orders)
+            await self.service.delete("tickets", order_id=ids)
+            await self.service.delete("order_items", order_id=ids)
+            await self.service.delete("orders", id=ids)
+        await self.service.delete("customers", email="like.bench+bench-fx-%s-*" % self.tag)
+        if self.user and not keep_cart:
+            await self.user.delete("cart_items", user_id="eq." + self.session["userId"])
+        if self._owned_request:
+            await self.request.dispose()
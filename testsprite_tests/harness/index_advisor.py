@@ -0,0 +1,325 @@
+"""Propose and measure indexes for the recorded E2E workload.
+
+Reads a workload recorded by :mod:`harness.workload`, aggregates the
+filter/order-by column patterns per table and derives candidate btree
+indexes. Each candidate is then measured against a seeded local database:
+
+* ``--mode real`` creates the index, re-runs the workload with
+  ``EXPLAIN ANALYZE`` and measures write overhead by bulk-inserting table rows
+  into an indexed scratch copy (rolled back afterwards);
+* ``--mode hypo`` uses the ``hypopg`` extension and compares planner cost
+  only, without touching the tables.
+
+The output is a ranked list with latency improvement, write overhead and the
+``CREATE INDEX`` statement to put in a migration.
+
+Usage::
+
+    python -m harness.index_advisor tmp/harness/workload.jsonl --mode real
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from collections import OrderedDict
+
+from harness import config, db
+from harness.db import quote_ident
+from harness.workload import load_workload
+
+SAMPLES_PER_PATTERN = 3
+
+
+class Pattern:
+    """All recorded queries sharing one (table, filters, order-by) shape."""
+
+    def __init__(self, shape):
+        self.table = shape.table
+        self.key = shape.key()
+        self.samples = [shape]
+        self.count = 1
+
+    def add(self, shape):
+        self.count += 1
+        if len(self.samples) < SAMPLES_PER_PATTERN:
+            self.samples.append(shape)
+
+    @property
+    def equality_columns(self):
+        return list(self.key[1])
+
+    @property
+    def range_columns(self):
+        return [c for c, _ in self.key[2]]
+
+    @property
+    def order_columns(self):
+        return [c for c, _ in self.key[3]]
+
+    def describe(self):
+        parts = ["%s=" % c for c in self.equality_columns]
+        parts += ["%s %s" % pair for pair in self.key[2]]
+        if self.key[3]:
+            parts.append("order by " + ", ".join("%s %s" % o for o in self.key[3]))
+        return "%s(%s)" % (self.table, "; ".join(parts))
+
+
+def aggregate(shapes):
+    """Group shapes by value-independent key, most frequent first."""
+    patterns = OrderedDict()
+    for shape in shapes:
+        if not (shape.equality or shape.ranges or shape.order):
+            continue
+        key = shape.key()
+        if key in patterns:
+            patterns[key].add(shape)
+        else:
+            patterns[key] = Pattern(shape)
+    return sorted(patterns.values(), key=lambda p: -p.count)
+
+
+def candidate_indexes(patterns):
+    """Derive ``(table, columns)`` candidates from the aggregated patterns.
+
+    Equality columns go first (most selective usage first), followed by one
+    range column or the order-by columns, which is the column order a btree
+    can satisfy in a single scan. Single-column variants of each equality
+    column are proposed as well so shared prefixes can win.
+    """
+    usage = {}
+    for pattern in patterns:
+        for column in pattern.equality_columns:
+            usage[(pattern.table, column)] = usage.get((pattern.table, column), 0) + pattern.count
+
+    candidates = []
+
+    def add(table, columns):
+        columns = tuple(OrderedDict.fromkeys(columns))
+        if columns and (table, columns) not in candidates:
+            candidates.append((table, columns))
+
+    for pattern in patterns:
+        equality = sorted(pattern.equality_columns, key=lambda c: -usage[(pattern.table, c)])
+        if pattern.range_columns:
+            add(pattern.table, equality + pattern.range_columns[:1])
+        elif pattern.order_columns:
+            add(pattern.table, equality + pattern.order_columns)
+        else:
+            add(pattern.table, equality)
+        for column in equality:
+            add(pattern.table, [column])
+    return candidates
+
+
+def _covered(columns, existing):
+    return any(list(columns) == idx[: len(columns)] for idx in existing)
+
+
+def _replay_sql(shape, types):
+    """SELECT equivalent of a recorded request, values bound as text params."""
+    clauses, params = [], []
+    for column, value in shape.equality:
+        column_type = types[column]
+        if value == "null":
+            clauses.append("%s IS NULL" % quote_ident(column))
+        elif value.startswith("(") and value.endswith(")"):
+            params.append([v.strip('"') for v in value[1:-1].split(",") if v])
+            clauses.append("%s = ANY($%d::text[]::%s[])" % (quote_ident(column), len(params), column_type))
+        else:
+            params.append(value)
+            clauses.append("%s = $%d::text::%s" % (quote_ident(column), len(params), column_type))
+    operators = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "like": "LIKE", "ilike": "ILIKE"}
+    for column, op, value in shape.ranges:
+        if op in ("like", "ilike"):
+            params.append(value.replace("*", "%"))
+            clauses.append("%s::text %s $%d" % (quote_ident(column), operators[op], len(params)))
+        else:
+            params.append(value)
+            clauses.append(
+                "%s %s $%d::text::%s" % (quote_ident(column), operators[op], len(params), types[column])
+            )
+    sql = "SELECT * FROM public.%s" % quote_ident(shape.table)
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if shape.order:
+        sql += " ORDER BY " + ", ".join("%s %s" % (quote_ident(c), d.upper()) for c, d in shape.order)
+    if shape.limit:
+        sql += " LIMIT %d" % shape.limit
+    return sql, params
+
+
+def _index_ddl(name, table, columns):
+    return "CREATE INDEX IF NOT EXISTS %s ON public.%s (%s)" % (
+        quote_ident(name),
+        quote_ident(table),
+        ", ".join(quote_ident(c) for c in columns),
+    )
+
+
+async def _explain(conn, sql, params, analyze):
+    options = "ANALYZE, TIMING OFF, FORMAT JSON" if analyze else "FORMAT JSON"
+    raw = await conn.fetchval("EXPLAIN (%s) %s" % (options, sql), *params)
+    plan = json.loads(raw)[0] if isinstance(raw, str) else raw[0]
+    return plan["Execution Time"] if analyze else plan["Plan"]["Total Cost"]
+
+
+async def measure_patterns(conn, patterns, types, analyze, repeat):
+    """Weighted workload cost per pattern: median ms (analyze) or planner cost."""
+    costs = {}
+    for pattern in patterns:
+        values = []
+        for shape in pattern.samples:
+            sql, params = _replay_sql(shape, types[pattern.table])
+            for _ in range(repeat if analyze else 1):
+                values.append(await _explain(conn, sql, params, analyze))
+        costs[pattern.key] = statistics.median(values) * pattern.count
+    return costs
+
+
+async def write_overhead(conn, table, columns, rows):
+    """Extra µs per inserted row caused by the index, measured on a scratch copy."""
+    column_list = ", ".join(quote_ident(c) for c in columns)
+    timings = []
+    for with_index in (False, True):
+        tx = conn.transaction()
+        await tx.start()
+        try:
+            await conn.execute(
+                "CREATE TEMP TABLE _advisor_scratch (LIKE public.%s INCLUDING DEFAULTS) ON COMMIT DROP"
+                % quote_ident(table)
+            )
+            if with_index:
+                await conn.execute("CREATE INDEX ON _advisor_scratch (%s)" % column_list)
+            started = time.perf_counter()
+            inserted = await conn.execute(
+                "INSERT INTO _advisor_scratch SELECT * FROM public.%s LIMIT %d" % (quote_ident(table), rows)
+            )
+            timings.append((time.perf_counter() - started, int(inserted.split()[-1])))
+        finally:
+            await tx.rollback()
+    (base_s, count), (indexed_s, _) = timings
+    if not count:
+        return None
+    return (indexed_s - base_s) * 1e6 / count
+
+
+async def advise(shapes, mode="real", repeat=5, write_rows=5000, dsn=None, report=print):
+    patterns = aggregate(shapes)
+    conn = await db.connect(dsn)
+    try:
+        types, existing = {}, {}
+        for table in {p.table for p in patterns}:
+            types[table] = await db.column_types(conn, table)
+            existing[table] = await db.existing_indexes(conn, table)
+
+        usable = []
+        for pattern in patterns:
+            known = types[pattern.table]
+            columns = pattern.equality_columns + pattern.range_columns + pattern.order_columns
+            if known and all(c in known for c in columns):
+                usable.append(pattern)
+            else:
+                report("skip %s: table/columns not in local schema" % pattern.describe())
+        report("%d query patterns over %d tables" % (len(usable), len({p.table for p in usable})))
+
+        if mode == "hypo":
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS hypopg")
+        analyze = mode == "real"
+        baseline = await measure_patterns(conn, usable, types, analyze, repeat)
+
+        results = []
+        for table, columns in candidate_indexes(usable):
+            if _covered(columns, existing[table]):
+                continue
+            served = [p for p in usable if p.table == table]
+            before = sum(baseline[p.key] for p in served)
+            index_name = "idx_%s_%s" % (table, "_".join(columns))
+            ddl = _index_ddl(index_name, table, columns)
+            if mode == "hypo":
+                row = await conn.fetchrow("SELECT indexrelid FROM hypopg_create_index($1)", ddl)
+                size = await conn.fetchval("SELECT hypopg_relation_size($1)", row["indexrelid"])
+                try:
+                    after_costs = await measure_patterns(conn, served, types, False, 1)
+                finally:
+                    await conn.execute("SELECT hypopg_reset()")
+                overhead = None
+            else:
+                index_name = "_advisor_" + index_name
+                await conn.execute(_index_ddl(index_name, table, columns))
+                try:
+                    await conn.execute("ANALYZE public.%s" % quote_ident(table))
+                    after_costs = await measure_patterns(conn, served, types, True, repeat)
+                    size = await conn.fetchval(
+                        "SELECT pg_relation_size(to_regclass($1))", "public." + quote_ident(index_name)
+                    )
+                finally:
+                    await conn.execute("DROP INDEX IF EXISTS public.%s" % quote_ident(index_name))
+                overhead = await write_overhead(conn, table, columns, write_rows)
+            after = sum(after_costs.values())
+            results.append(
+                {
+                    "table": table,
+                    "columns": list(columns),
+                    "patterns": [p.describe() for p in served if after_costs[p.key] < baseline[p.key]],
+                    "queries": sum(p.count for p in served),
+                    "before": before,
+                    "after": after,
+                    "improvement": before - after,
+                    "improvement_pct": 100.0 * (before - after) / before if before else 0.0,
+                    "write_overhead_us_per_row": overhead,
+                    "size_bytes": size,
+                    "ddl": ddl + ";",
+                }
+            )
+    finally:
+        await conn.close()
+
+    results.sort(key=lambda r: -r["improvement"])
+    return [r for r in results if r["improvement"] > 0]
+
+
+def print_ranking(results, mode, report=print):
+    unit = "ms" if mode == "real" else "cost"
+    report("%-4s %-44s %10s %8s %12s %10s" % ("#", "index", "saved " + unit, "gain", "write µs/row", "size"))
+    for rank, r in enumerate(results, 1):
+        overhead = "-" if r["write_overhead_us_per_row"] is None else "%.2f" % r["write_overhead_us_per_row"]
+        report(
+            "%-4d %-44s %10.2f %7.1f%% %12s %9dk"
+            % (
+                rank,
+                "%s(%s)" % (r["table"], ", ".join(r["columns"])),
+                r["improvement"],
+                r["improvement_pct"],
+                overhead,
+                (r["size_bytes"] or 0) // 1024,
+            )
+        )
+        report("     " + r["ddl"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank candidate indexes for the recorded workload")
+    parser.add_argument("workload", help="JSONL written by harness.workload")
+    parser.add_argument("--mode", choices=("real", "hypo"), default="real")
+    parser.add_argument("--repeat", type=int, default=5, help="EXPLAIN ANALYZE runs per sample query")
+    parser.add_argument("--write-rows", type=int, default=5000, help="rows inserted for write overhead")
+    parser.add_argument("--browser-only", action="store_true", help="skip the built-in server-side lookups")
+    parser.add_argument("--server-weight", type=int, default=1,
+                        help="times each server-side lookup counts (e.g. payments the recorded runs stand for)")
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--out", default=str(config.output_path("index_advice.json")))
+    args = parser.parse_args(argv)
+
+    shapes = load_workload(args.workload, include_server=not args.browser_only, server_weight=args.server_weight)
+    results = asyncio.run(advise(shapes, args.mode, args.repeat, args.write_rows, args.dsn))
+    print_ranking(results, args.mode)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump({"mode": args.mode, "results": results}, fh, indent=2, default=str)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""Soak the store/cart flow in one page and watch the heap, DOM and listeners grow.
+
+TC005 adds and removes an item once; on the event floor the store tab stays
+open for hours. This scenario repeats, in a single page and through SPA
+navigation only:
+
+1. ``/loja``: open the first product's modal, add to cart, close it;
+2. ``/carrinho`` (navbar cart icon): ``+1``, ``-1``, remove the item;
+3. back to ``/loja`` (navbar link).
+
+Every ``--sample-every`` iterations it forces a GC and reads
+``Performance.getMetrics`` (``JSHeapUsedSize``, ``Nodes``,
+``JSEventListeners``, ...) over CDP. After ``--warmup`` iterations a
+least-squares slope per iteration is fitted on the samples; a metric whose
+slope exceeds its threshold with R² >= ``--min-r2`` is a leak. On the first
+detection two heap snapshots are written ``--snapshot-gap`` iterations
+apart (``tmp/harness/leak-*.heapsnapshot``); load both in DevTools Memory
+and use the Comparison view. The anonymous ``localStorage`` cart is used by
+default so the soak does not write ``cart_items`` thousands of times.
+
+Usage::
+
+    python -m harness.leak_soak --iterations 2000 --sample-every 25
+    python -m harness.leak_soak --iterations 300 --no-snapshots
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from harness import browser as hb
+from harness import config
+from harness.stats import linear_fit
+
+METRICS = ("JSHeapUsedSize", "Nodes", "JSEventListeners", "Documents", "Frames", "LayoutObjects")
+
+# Growth per iteration above which a metric counts as leaking
+THRESHOLDS = {"JSHeapUsedSize": 2048.0, "Nodes": 1.0, "JSEventListeners": 0.5, "Documents": 0.05}
+
+MODAL_TRIGGER = 'section [aria-haspopup="dialog"]'
+PRODUCT_MODAL = '[data-testid="product-modal"]'
+CART_ITEM = '[data-testid="cart-item"]'
+STORE_LINK = 'nav a[href="/loja"]'
+CART_LINK = '[data-testid="cart-icon"]'
+
+
+async def iteration(page):
+    await page.locator(MODAL_TRIGGER).first.click()
+    modal = page.locator(PRODUCT_MODAL)
+    await modal.wait_for()
+    await page.locator('[data-testid="modal-add-to-cart"]').click()
+    if await modal.is_visible():
+        await page.keyboard.press("Escape")
+    await modal.wait_for(state="hidden")
+
+    await page.locator(CART_LINK).first.click()
+    item = page.locator(CART_ITEM).first
+    await item.wait_for()
+    quantity = item.locator('[data-testid="item-quantity"]')
+    before = (await quantity.inner_text()).strip()
+    await item.locator('[data-testid="increase-quantity"]').click()
+    await page.wait_for_function(
+        "([sel, v]) => { const el = document.querySelector(sel); return el && el.textContent.trim() !== v; }",
+        arg=['[data-testid="item-quantity"]', before],
+    )
+    await item.locator('[data-testid="decrease-quantity"]').click()
+    await item.locator('[data-testid="remove-item"]').click()
+    await page.locator(CART_ITEM).first.wait_for(state="detached")
+
+    await page.locator(STORE_LINK).first.click()
+    await page.locator(MODAL_TRIGGER).first.wait_for()
+
+
+async def sample(cdp, n):
+    await cdp.send("HeapProfiler.collectGarbage")
+    metrics = {m["name"]: m["value"] for m in (await cdp.send("Performance.getMetrics"))["metrics"]}
+    return dict({name: metrics.get(name) for name in METRICS}, iteration=n, at=time.time())
+
+
+def fit(samples, warmup):
+    """Slope/R² per metric over the samples taken after ``warmup``."""
+    steady = [s for s in samples if s["iteration"] >= warmup]
+    fits = {}
+    for name in METRICS:
+        points = [(s["iteration"], s[name]) for s in steady if s[name] is not None]
+        if len(points) < 3:
+            continue
+        slope, _, r2 = linear_fit([p[0] for p in points], [p[1] for p in points])
+        fits[name] = {"slope_per_iteration": slope, "r2": r2}
+    return fits
+
+
+def leaking(fits, min_r2):
+    return sorted(name for name, f in fits.items()
+                  if name in THRESHOLDS and f["slope_per_iteration"] > THRESHOLDS[name] and f["r2"] >= min_r2)
+
+
+async def heap_snapshot(cdp, path):
+    """Stream a heap snapshot to ``path`` chunk by chunk."""
+    with open(path, "w", encoding="utf-8") as fh:
+        def handler(params):
+            fh.write(params["chunk"])
+
+        cdp.on("HeapProfiler.addHeapSnapshotChunk", handler)
+        try:
+            await cdp.send("HeapProfiler.takeHeapSnapshot", {"reportProgress": False})
+        finally:
+            cdp.remove_listener("HeapProfiler.addHeapSnapshotChunk", handler)
+    return str(path)
+
+
+async def soak_iteration(page, n, errors, max_errors):
+    """One iteration; a Playwright error is recorded and the page reloaded.
+
+    Returns False once more than ``max_errors`` errors were recorded.
+    """
+    try:
+        await iteration(page)
+        return True
+    except async_api.Error as exc:  # a failed step must not end a multi-hour soak
+        errors.append({"iteration": n, "error": str(exc).splitlines()[0]})
+    if len(errors) > max_errors:
+        return False
+    try:
+        await page.goto(config.url("/loja"))
+        await page.locator(MODAL_TRIGGER).first.wait_for(timeout=30000)
+    except async_api.Error as exc:
+        errors.append({"iteration": n, "error": "reload: %s" % str(exc).splitlines()[0]})
+    return len(errors) <= max_errors
+
+
+async def run(args, state, report=print):
+    """Fill ``state`` (samples, errors, snapshots, detected) as the soak goes."""
+    samples, errors, snapshots = state["samples"], state["errors"], state["snapshots"]
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    async with async_playwright() as pw:
+        browser = await hb.launch(pw)
+        try:
+            context = await hb.new_context(browser, storage_state=args.storage_state)
+            page = await hb.open_page(context, "/loja")
+            await page.locator(MODAL_TRIGGER).first.wait_for(timeout=30000)
+            cdp = await context.new_cdp_session(page)
+            await cdp.send("Performance.enable")
+            await cdp.send("HeapProfiler.enable")
+            samples.append(await sample(cdp, 0))
+            started = time.perf_counter()
+            for n in range(1, args.iterations + 1):
+                if not await soak_iteration(page, n, errors, args.max_errors):
+                    report("too many errors, stopping at iteration %d" % n)
+                    break
+                if n % args.sample_every:
+                    continue
+                samples.append(await sample(cdp, n))
+                last = samples[-1]
+                report("%5d  heap %7.1f MiB  nodes %6d  listeners %5d  %.2fs/it" % (
+                    n, last["JSHeapUsedSize"] / 2 ** 20, last["Nodes"], last["JSEventListeners"],
+                    (time.perf_counter() - started) / n))
+                if state["detected"] is None and n >= args.warmup + 3 * args.sample_every:
+                    names = leaking(fit(samples, args.warmup), args.min_r2)
+                    if names:
+                        state["detected"] = {"iteration": n, "metrics": names}
+                        report("leak suspected at %d: %s" % (n, ", ".join(names)))
+                        if args.snapshots:
+                            snapshots.append(await heap_snapshot(
+                                cdp, config.output_path("leak-%s-a.heapsnapshot" % stamp)))
+                            for _ in range(args.snapshot_gap):
+                                if not await soak_iteration(page, n, errors, args.max_errors):
+                                    break
+                            await cdp.send("HeapProfiler.collectGarbage")
+                            snapshots.append(await heap_snapshot(
+                                cdp, config.output_path("leak-%s-b.heapsnapshot" % stamp)))
+                            report("snapshots: %s" % ", ".join(snapshots))
+                        if args.stop_on_leak or len(errors) > args.max_errors:
+                            break
+            await context.close()
+        finally:
+            await browser.close()
+
+
+def summary(state, args, report=print):
+    samples = state["samples"]
+    fits = fit(samples, args.warmup)
+    for name, f in fits.items():
+        report("%-18s %+12.2f /iteration  r2=%.2f" % (name, f["slope_per_iteration"], f["r2"]))
+    return {
+        "iterations": samples[-1]["iteration"] if samples else 0,
+        "fits": fits,
+        "leaking": leaking(fits, args.min_r2),
+        "detected": state["detected"],
+        "snapshots": state["snapshots"],
+        "errors": state["errors"],
+        "samples": samples,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Heap/DOM/listener growth over repeated cart cycles")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--sample-every", type=int, default=25)
+    parser.add_argument("--warmup", type=int, default=50, help="iterations ignored by the fit")
+    parser.add_argument("--min-r2", type=float, default=0.8, help="how linear growth must be to count")
+    parser.add_argument("--no-snapshots", dest="snapshots", action="store_false")
+    parser.add_argument("--snapshot-gap", type=int, default=100, help="iterations between the two snapshots")
+    parser.add_argument("--stop-on-leak", action="store_true")
+    parser.add_argument("--max-errors", type=int, default=20)
+    parser.add_argument("--storage-state", default=None, help="defaults to the anonymous localStorage cart")
+    parser.add_argument("--out", default=str(config.output_path("leak_soak.json")))
+    args = parser.parse_args(argv)
+
+    state = {"samples": [], "errors": [], "snapshots": [], "detected": None}
+    try:
+        asyncio.run(run(args, state))
+    finally:
+        # Whatever ended the run, keep the samples gathered so far
+        result = summary(state, args)
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+    return 1 if result["leaking"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
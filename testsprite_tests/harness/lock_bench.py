@@ -0,0 +1,325 @@
+"""Contention benchmark for order creation, advisory locks and the stock trigger.
+
+Each simulated checkout runs, in one transaction, what the edge functions do
+on sale day:
+
+1. ``create_order_with_lock`` (or ``reserve_order_with_lock``) — advisory
+   lock on ``hashtext('order_lock_' || external_id)``;
+2. insert the ``order_items`` row for the chosen SKU;
+3. flip ``payment_status`` to ``paid`` — fires
+   ``update_product_stock_on_order_paid``, which updates the product row.
+
+Concurrency is stepped from 1 to 256 sessions over a pooled asyncpg
+connection, with either every session buying the same SKU (``hot``) or SKUs
+drawn uniformly (``spread``). A side connection samples
+``pg_stat_activity``/``pg_locks`` to attribute lock wait time to advisory
+vs row locks. After each level the final ``stock_quantity`` is checked
+against the quantities actually sold, which exposes lost updates in the
+trigger's read-then-write.
+
+Levels above the server's free connections (``max_connections`` minus the
+reserved and in-use ones) are skipped with a warning; the local Supabase
+Postgres allows about 100, so 128 and 256 need a larger setting. Each
+finished level is kept in ``--out`` even when a later one fails.
+
+Usage::
+
+    python -m harness.lock_bench --distribution hot spread --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+
+import asyncpg
+
+from harness import config, db
+from harness.stats import format_summary, summarize
+
+APPLICATION_NAME = "harness-lock-bench"
+DEFAULT_LEVELS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+CREATE_SQL = """
+SELECT order_id, order_exists FROM create_order_with_lock(
+    $1, $2, $3, 'Bench Buyer', '11999999999', $4, $5,
+    'pending', 'pending', 'pix', 'product', NULL, NULL, $6::jsonb
+)
+"""
+
+RESERVE_SQL = """
+SELECT order_id, order_exists FROM reserve_order_with_lock(
+    $1, $2, 'Bench Buyer', '11999999999', $3, $4, 'product', NULL, $5::jsonb
+)
+"""
+
+SQL = {"create": CREATE_SQL, "reserve": RESERVE_SQL}
+
+# Client connections still free, counting the one running the query
+CONNECTION_BUDGET_SQL = """
+SELECT current_setting('max_connections')::int
+       - current_setting('superuser_reserved_connections')::int
+       - (SELECT count(*) FROM pg_stat_activity WHERE backend_type = 'client backend') AS free
+"""
+
+LOCK_SAMPLE_SQL = """
+SELECT l.locktype, count(*) AS waiting
+FROM pg_stat_activity a
+JOIN pg_locks l ON l.pid = a.pid AND NOT l.granted
+WHERE a.application_name = $1
+GROUP BY l.locktype
+"""
+
+
+class Level:
+    """Counters for one (distribution, concurrency) run."""
+
+    def __init__(self, distribution, concurrency):
+        self.distribution = distribution
+        self.concurrency = concurrency
+        self.latencies_ms = []
+        self.committed = 0
+        self.duplicates = 0
+        self.deadlocks = 0
+        self.errors = {}
+        self.lock_wait_s = {}
+        self.elapsed_s = 0.0
+        self.stock = {}
+
+    def as_dict(self):
+        return {
+            "distribution": self.distribution,
+            "concurrency": self.concurrency,
+            "tps": self.committed / self.elapsed_s if self.elapsed_s else 0.0,
+            "committed": self.committed,
+            "duplicates": self.duplicates,
+            "deadlocks": self.deadlocks,
+            "errors": self.errors,
+            "latency_ms": summarize(self.latencies_ms),
+            "lock_wait_s": self.lock_wait_s,
+            "stock": self.stock,
+        }
+
+
+async def seed_products(conn, tag, count, initial_stock):
+    rows = await conn.fetch(
+        """
+        INSERT INTO products (name, price, category, stock_quantity, in_stock)
+        SELECT 'bench-sku-' || $1 || '-' || g, 10, 'bench', $2, TRUE
+        FROM generate_series(1, $3) AS g
+        RETURNING id
+        """,
+        tag,
+        initial_stock,
+        count,
+    )
+    return [r["id"] for r in rows]
+
+
+async def cleanup(conn, tag):
+    prefix = "bench-lock-%s-%%" % tag
+    await conn.execute(
+        "DELETE FROM order_items WHERE order_id IN (SELECT id FROM orders WHERE external_id LIKE $1)", prefix
+    )
+    await conn.execute("DELETE FROM orders WHERE external_id LIKE $1", prefix)
+    await conn.execute("DELETE FROM customers WHERE email LIKE $1", "bench+%s-%%" % tag)
+    await conn.execute("DELETE FROM products WHERE name LIKE $1", "bench-sku-%s-%%" % tag)
+
+
+def order_values(path, tag, external_id, product_id):
+    """Bind values of ``SQL[path]``, one per placeholder."""
+    items = json.dumps([{"product_id": str(product_id), "quantity": 1, "price": 10}])
+    values = [external_id, "bench+%s-%s@example.com" % (tag, external_id), external_id[-11:], 10, items]
+    if path == "create":
+        # reserve_order_with_lock has no payment id: the charge comes later
+        values.insert(1, "bench-pay-" + external_id)
+    return values
+
+
+async def checkout(conn, path, tag, external_id, product_id):
+    """One order: lock + create, add the item, mark paid (stock trigger)."""
+    async with conn.transaction():
+        row = await conn.fetchrow(SQL[path], *order_values(path, tag, external_id, product_id))
+        if row["order_exists"]:
+            return False
+        await conn.execute(
+            "INSERT INTO order_items (order_id, product_id, quantity, price) VALUES ($1, $2, 1, 10)",
+            row["order_id"],
+            product_id,
+        )
+        await conn.execute(
+            "UPDATE orders SET payment_status = 'paid', status = 'paid' WHERE id = $1", row["order_id"]
+        )
+    return True
+
+
+async def sample_locks(conn, level, interval, stop):
+    while not stop.is_set():
+        for row in await conn.fetch(LOCK_SAMPLE_SQL, APPLICATION_NAME):
+            level.lock_wait_s[row["locktype"]] = level.lock_wait_s.get(row["locktype"], 0.0) + row["waiting"] * interval
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def verify_stock(conn, tag, product_ids, initial_stock):
+    """Compare final stock with what was actually sold per SKU."""
+    rows = await conn.fetch(
+        """
+        SELECT p.id, p.stock_quantity,
+               COALESCE((SELECT sum(oi.quantity) FROM order_items oi
+                         JOIN orders o ON o.id = oi.order_id
+                         WHERE oi.product_id = p.id AND o.payment_status = 'paid'
+                           AND o.external_id LIKE $2), 0) AS sold
+        FROM products p WHERE p.id = ANY($1::uuid[])
+        """,
+        product_ids,
+        "bench-lock-%s-%%" % tag,
+    )
+    lost = oversold = 0
+    for row in rows:
+        expected = max(0, initial_stock - row["sold"])
+        lost += max(0, row["stock_quantity"] - expected)
+        oversold += max(0, row["sold"] - initial_stock)
+    return {
+        "sold": sum(r["sold"] for r in rows),
+        "lost_updates": lost,
+        "oversold": oversold,
+        "consistent": lost == 0 and oversold == 0,
+    }
+
+
+async def run_level(args, distribution, concurrency):
+    tag = uuid.uuid4().hex[:8]
+    level = Level(distribution, concurrency)
+    admin = await db.connect(args.dsn)
+    pool = None
+    try:
+        pool = await db.create_pool(
+            args.dsn,
+            min_size=concurrency,
+            max_size=concurrency,
+            server_settings={"application_name": APPLICATION_NAME},
+        )
+        product_ids = await seed_products(admin, tag, 1 if distribution == "hot" else args.skus, args.stock)
+        recent = []
+        sequence = iter(range(10 ** 9))
+        deadline = time.perf_counter() + args.duration
+
+        async def session():
+            async with pool.acquire() as conn:
+                while time.perf_counter() < deadline:
+                    if recent and random.random() < args.duplicate_ratio:
+                        external_id = random.choice(recent)
+                    else:
+                        external_id = "bench-lock-%s-%010d" % (tag, next(sequence))
+                        recent.append(external_id)
+                        del recent[:-64]
+                    started = time.perf_counter()
+                    try:
+                        created = await checkout(conn, args.path, tag, external_id, random.choice(product_ids))
+                    except asyncpg.exceptions.DeadlockDetectedError:
+                        level.deadlocks += 1
+                        continue
+                    except asyncpg.PostgresError as exc:
+                        name = type(exc).__name__
+                        level.errors[name] = level.errors.get(name, 0) + 1
+                        continue
+                    level.latencies_ms.append((time.perf_counter() - started) * 1000)
+                    if created:
+                        level.committed += 1
+                    else:
+                        level.duplicates += 1
+
+        stop = asyncio.Event()
+        sampler = asyncio.ensure_future(sample_locks(admin, level, args.sample_interval, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(session() for _ in range(concurrency)))
+        level.elapsed_s = time.perf_counter() - started
+        stop.set()
+        await sampler
+        level.stock = await verify_stock(admin, tag, product_ids, args.stock)
+    finally:
+        if pool is not None:
+            await pool.close()
+        if not args.keep:
+            await cleanup(admin, tag)
+        await admin.close()
+    return level
+
+
+async def usable_levels(args, report=print):
+    """``args.levels`` that fit in the server's free connections, next to the admin one."""
+    conn = await db.connect(args.dsn)
+    try:
+        free = await conn.fetchval(CONNECTION_BUDGET_SQL)
+    finally:
+        await conn.close()
+    levels = [c for c in args.levels if c <= free]
+    skipped = [c for c in args.levels if c > free]
+    if skipped:
+        report("warning: only %d connections free (max_connections); skipping levels %s"
+               % (free, " ".join(map(str, skipped))))
+    return levels
+
+
+async def run(args, results, report=print):
+    """Append each finished level to ``results``."""
+    levels = await usable_levels(args, report)
+    for distribution in args.distribution:
+        for concurrency in levels:
+            level = await run_level(args, distribution, concurrency)
+            data = level.as_dict()
+            results.append(data)
+            waits = ", ".join("%s=%.1fs" % kv for kv in sorted(level.lock_wait_s.items())) or "none"
+            report(
+                "%-6s c=%-3d tps=%7.1f deadlocks=%d dup=%d errors=%d stock=%s lock-wait[%s] %s"
+                % (
+                    distribution,
+                    concurrency,
+                    data["tps"],
+                    level.deadlocks,
+                    level.duplicates,
+                    sum(level.errors.values()),
+                    "ok" if level.stock["consistent"] else "LOST=%d OVERSOLD=%d"
+                    % (level.stock["lost_updates"], level.stock["oversold"]),
+                    waits,
+                    format_summary(data["latency_ms"]),
+                )
+            )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Order creation / stock trigger contention benchmark")
+    parser.add_argument("--distribution", nargs="+", choices=("hot", "spread"), default=["hot", "spread"])
+    parser.add_argument("--levels", nargs="+", type=int, default=DEFAULT_LEVELS, help="concurrent sessions")
+    parser.add_argument("--path", choices=("create", "reserve"), default="create",
+                        help="create_order_with_lock or reserve_order_with_lock")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--skus", type=int, default=200, help="products for the spread distribution")
+    parser.add_argument("--stock", type=int, default=1_000_000, help="initial stock per SKU")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0,
+                        help="share of requests retrying a recent external_id (advisory-lock collisions)")
+    parser.add_argument("--sample-interval", type=float, default=0.05)
+    parser.add_argument("--keep", action="store_true", help="keep benchmark rows for inspection")
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--out", default=str(config.output_path("lock_bench.json")))
+    args = parser.parse_args(argv)
+
+    results = []
+    try:
+        asyncio.run(run(args, results))
+    finally:
+        # Levels measured before a failure are kept
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump({"path": args.path, "results": results}, fh, indent=2)
+    return 0 if all(r["stock"]["consistent"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
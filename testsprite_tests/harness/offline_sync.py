@@ -0,0 +1,288 @@
+"""Real offline simulation and queue-drain benchmark for the cart.
+
+TC011 "goes offline" by clicking while fully online. This scenario calls
+``context.set_offline(True)``, performs a seeded burst of cart operations
+(add on ``/loja``, quantity +/-, remove on ``/carrinho``, switching routes
+client-side in one page), restores the network and measures:
+
+* drain time: reconnect until the ``offline_queue`` in localStorage has no
+  pending actions and ``cart_items`` traffic has been quiet for
+  ``--quiet`` seconds;
+* requests sent on reconnect (one per operation vs batched) and requests
+  that failed while offline (operations the app never queued);
+* consistency: cart shown offline vs cart after reload vs ``cart_items``
+  rows on the server.
+
+``--conflict`` runs two contexts on the same account that edit the same
+item while both offline, reconnect them and reports whether they converge.
+
+Usage::
+
+    python -m harness.offline_sync --ops 10 50 200
+    python -m harness.offline_sync --conflict
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from playwright.async_api import async_playwright
+
+from harness import browser as hb
+from harness import config
+from harness.fixtures import Fixtures
+
+CART_TRAFFIC = "/rest/v1/cart_items"
+ADD_BUTTON = 'button:has-text("Adicionar ao Carrinho")'
+
+CART_SNAPSHOT_JS = """
+() => [...document.querySelectorAll('[data-testid="cart-item"]')].map(el => [
+  (el.querySelector('[data-testid="item-name"]') || el).textContent.trim(),
+  Number((el.querySelector('[data-testid="item-quantity"], [data-testid="ticket-quantity"]') || {}).textContent || 0),
+]).sort()
+"""
+
+PENDING_QUEUE_JS = """
+() => {
+  try {
+    const queue = JSON.parse(localStorage.getItem('offline_queue') || '[]');
+    return queue.filter(a => !a.status || a.status === 'pending' || a.status === 'processing').length;
+  } catch (e) { return 0; }
+}
+"""
+
+
+class TrafficCounter:
+    """Counts cart requests per phase and tracks the last one seen."""
+
+    def __init__(self, context):
+        self.phase = "setup"
+        self.requests = {}
+        self.failed = {}
+        self.bytes = {}
+        self.last_at = time.monotonic()
+        context.on("request", self._on_request)
+        context.on("requestfailed", self._on_failed)
+        context.on("requestfinished", self._on_finished)
+
+    def _on_request(self, request):
+        if CART_TRAFFIC in request.url:
+            self.requests[self.phase] = self.requests.get(self.phase, 0) + 1
+            self.last_at = time.monotonic()
+
+    def _on_failed(self, request):
+        if CART_TRAFFIC in request.url:
+            self.failed[self.phase] = self.failed.get(self.phase, 0) + 1
+
+    def _on_finished(self, request):
+        if CART_TRAFFIC in request.url:
+            self.last_at = time.monotonic()
+            self.bytes[self.phase] = self.bytes.get(self.phase, 0) + len(request.post_data or "")
+
+
+async def snapshot(page):
+    return [tuple(item) for item in await page.evaluate(CART_SNAPSHOT_JS)]
+
+
+async def server_cart(context, page):
+    """``cart_items`` for the logged-in user, read with the page's own session."""
+    session = await hb.session(page)
+    if not session:
+        return None
+    response = await context.request.get(
+        config.SUPABASE_URL.rstrip("/")
+        + "/rest/v1/cart_items?select=quantity,products(name)&user_id=eq."
+        + session["userId"],
+        headers={"apikey": config.SUPABASE_ANON_KEY, "Authorization": "Bearer " + session["token"]},
+    )
+    rows = await response.json()
+    return sorted(((r.get("products") or {}).get("name", "?"), r["quantity"]) for r in rows)
+
+
+async def spa_navigate(page, path):
+    """Client-side navigation through the navbar links (works while offline)."""
+    if page.url.rstrip("/").endswith(path):
+        return
+    link = '[data-testid="cart-icon"]' if path == "/carrinho" else 'nav a[href="%s"]' % path
+    await page.locator(link).first.click()
+    await page.wait_for_url("**" + path)
+
+
+async def offline_burst(page, ops, rng):
+    """Apply ``ops`` random cart operations on one page; returns counts per kind.
+
+    Adds happen on ``/loja`` and the rest on ``/carrinho``, switching with
+    client-side navigation. Adds are counted as ``unavailable`` when the
+    store cannot render its products without network.
+    """
+    done = {"add": 0, "increase": 0, "decrease": 0, "remove": 0, "unavailable": 0}
+    for _ in range(ops):
+        await spa_navigate(page, "/carrinho")
+        items = await page.locator('[data-testid="cart-item"]').count()
+        kind = rng.choice(["add", "increase", "decrease", "remove"]) if items else "add"
+        if kind == "add":
+            await spa_navigate(page, "/loja")
+            buttons = page.locator(ADD_BUTTON)
+            count = await buttons.count()
+            if not count:
+                done["unavailable"] += 1
+                continue
+            await buttons.nth(rng.randrange(count)).click()
+        else:
+            testid = {"increase": "increase-quantity", "decrease": "decrease-quantity", "remove": "remove-item"}[kind]
+            await page.locator('[data-testid="%s"]' % testid).nth(rng.randrange(items)).click()
+        done[kind] += 1
+    await spa_navigate(page, "/carrinho")
+    return done
+
+
+async def wait_drained(page, traffic, quiet, timeout):
+    """Seconds until the offline queue is empty and cart traffic went quiet."""
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        pending = await page.evaluate(PENDING_QUEUE_JS)
+        if not pending and time.monotonic() - traffic.last_at >= quiet:
+            return max(0.0, traffic.last_at - started)
+        await asyncio.sleep(0.05)
+    return None
+
+
+async def run_burst(browser, args, ops, report):
+    context = await hb.new_context(browser, storage_state=args.storage_state)
+    try:
+        traffic = TrafficCounter(context)
+        cart = await hb.open_page(context, "/loja")
+        await cart.locator(ADD_BUTTON).first.wait_for()
+        rng = random.Random(args.seed)
+
+        traffic.phase = "offline"
+        await context.set_offline(True)
+        done = await offline_burst(cart, ops, rng)
+        offline_view = await snapshot(cart)
+
+        traffic.phase = "reconnect"
+        await context.set_offline(False)
+        drain_s = await wait_drained(cart, traffic, args.quiet, args.timeout)
+
+        traffic.phase = "verify"
+        await cart.reload()
+        await cart.wait_for_load_state("networkidle")
+        reloaded = await snapshot(cart)
+        server = await server_cart(context, cart)
+    finally:
+        await context.close()
+
+    result = {
+        "ops": ops,
+        "done": done,
+        "drain_s": drain_s,
+        "reconnect_requests": traffic.requests.get("reconnect", 0),
+        "reconnect_bytes": traffic.bytes.get("reconnect", 0),
+        "failed_while_offline": traffic.failed.get("offline", 0),
+        "offline_view": offline_view,
+        "after_reload": reloaded,
+        "server": server,
+        "consistent": offline_view == reloaded and (server is None or server == reloaded),
+    }
+    report(
+        "ops=%-4d drain=%s requests=%d (%.2f/op) failed-offline=%d %s"
+        % (
+            ops,
+            "timeout" if drain_s is None else "%.2fs" % drain_s,
+            result["reconnect_requests"],
+            result["reconnect_requests"] / ops if ops else 0.0,
+            result["failed_while_offline"],
+            "consistent" if result["consistent"] else "INCONSISTENT",
+        )
+    )
+    return result
+
+
+async def run_conflict(browser, args, report):
+    """Two offline clients edit the same first item, then reconnect in turn."""
+    contexts = [await hb.new_context(browser, storage_state=args.storage_state) for _ in range(2)]
+    try:
+        pages = [await hb.open_page(c, "/carrinho") for c in contexts]
+        for page in pages:
+            await page.locator('[data-testid="cart-item"]').first.wait_for()
+        before = await snapshot(pages[0])
+        for context in contexts:
+            await context.set_offline(True)
+        # A bumps the quantity, B removes the item: a classic lost-update pair
+        for _ in range(2):
+            await pages[0].locator('[data-testid="increase-quantity"]').first.click()
+        await pages[1].locator('[data-testid="remove-item"]').first.click()
+        views = [await snapshot(p) for p in pages]
+
+        traffic = [TrafficCounter(c) for c in contexts]
+        for context, page, counter in zip(contexts, pages, traffic):
+            counter.phase = "reconnect"
+            await context.set_offline(False)
+            await wait_drained(page, counter, args.quiet, args.timeout)
+        live = [await snapshot(p) for p in pages]
+        for page in pages:
+            await page.reload()
+            await page.wait_for_load_state("networkidle")
+        reloaded = [await snapshot(p) for p in pages]
+        server = await server_cart(contexts[0], pages[0])
+    finally:
+        for context in contexts:
+            await context.close()
+
+    winner = "A" if server == views[0] else "B" if server == views[1] else "merged/other"
+    result = {
+        "before": before,
+        "offline_views": views,
+        "live_after_reconnect": live,
+        "after_reload": reloaded,
+        "server": server,
+        "live_converged": live[0] == live[1],
+        "converged": reloaded[0] == reloaded[1] == server,
+        "winner": winner,
+    }
+    report(
+        "conflict: live-converged=%s converged-after-reload=%s winner=%s"
+        % (result["live_converged"], result["converged"], winner)
+    )
+    return result
+
+
+async def run(args, report=print):
+    async with async_playwright() as pw:
+        # Every run starts from the same one-product cart instead of whatever the account held
+        fixtures = await Fixtures.start(pw, args.storage_state)
+        await fixtures.cart(products=1, quantity=1)
+        browser = await hb.launch(pw)
+        try:
+            if args.conflict:
+                return {"conflict": await run_conflict(browser, args, report)}
+            return {"bursts": [await run_burst(browser, args, ops, report) for ops in args.ops]}
+        finally:
+            await browser.close()
+            await fixtures.cleanup()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline cart burst and queue-drain benchmark")
+    parser.add_argument("--ops", nargs="+", type=int, default=[10, 50, 200], help="operations per offline burst")
+    parser.add_argument("--conflict", action="store_true", help="two clients editing offline at the same time")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--quiet", type=float, default=1.0, help="seconds without cart traffic to call it drained")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--storage-state", default=config.CUSTOMER_STORAGE_STATE)
+    parser.add_argument("--out", default=str(config.output_path("offline_sync.json")))
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    if args.conflict:
+        return 0 if results["conflict"]["converged"] else 1
+    return 0 if all(r["consistent"] and r["drain_s"] is not None for r in results["bursts"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""End-to-end "Pix paid -> ticket visible" latency, split per hop.
+
+TC007 only asserts "Payment Successful!". This scenario runs the real chain
+many times and timestamps every hop:
+
+1. ``charge``: ``POST /api/abacatepay/criar-cobranca`` on the Express API
+   (``server.js`` -> ``criar-cobranca-optimized``) for a one-ticket order;
+2. ``webhook``: payment trigger -> ``webhooks`` row written by
+   ``webhook-abacatepay``;
+3. ``order``: webhook row -> order ``updated_at`` once it is ``paid``;
+4. ``ticket``: order paid -> first ``tickets`` row of the order;
+5. ``ui``: ticket row -> seat/ID rendered under "Meus Ingressos" on
+   ``/perfil`` for the logged-in customer (skipped with ``--no-ui``);
+6. ``total``: trigger -> last measured hop.
+
+The payment is triggered either by a local AbacatePay stand-in (``--trigger
+local``, default: the harness posts the ``billing.paid`` webhook AbacatePay
+would send, with ``WEBHOOK_SECRET``) or through ``simular-pagamento-pix``
+(``--trigger abacatepay``), which asks the AbacatePay sandbox to pay and
+deliver the real webhook. Database timestamps and the harness clock are
+compared directly, so run against the local stack where they share a host
+clock.
+
+Usage::
+
+    python -m harness.payment_latency --iterations 200
+    python -m harness.payment_latency --iterations 50 --trigger abacatepay --no-ui
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from harness import browser as hb
+from harness import config, db, payment_mock
+from harness.stats import format_summary, summarize
+
+STAGES = ("charge", "webhook", "order", "ticket", "ui", "total")
+
+PROGRESS_SQL = """
+SELECT o.id,
+       o.status,
+       extract(epoch FROM o.updated_at) AS order_at,
+       (SELECT extract(epoch FROM min(w.created_at)) FROM webhooks w
+         WHERE w.payload -> 'data' -> 'pixQrCode' ->> 'id' = $1) AS webhook_at,
+       t.created_at_epoch AS ticket_at,
+       t.seat_number,
+       t.id AS ticket_id
+FROM orders o
+LEFT JOIN LATERAL (
+    SELECT id, seat_number, extract(epoch FROM created_at) AS created_at_epoch
+    FROM tickets WHERE order_id = o.id ORDER BY created_at LIMIT 1
+) t ON true
+WHERE o.payment_id = $1
+"""
+
+TICKET_TEXT_JS = """
+(text) => [...document.querySelectorAll('p')].some(p => p.textContent.trim() === text)
+"""
+
+
+class Payments:
+    """Creates charges on the Express API and triggers their payment."""
+
+    def __init__(self, request, trigger):
+        self.request = request
+        self.trigger = trigger
+
+    async def create(self, external_id, customer, event_id, amount):
+        response = await self.request.post(
+            config.PAYMENT_API_URL.rstrip("/") + "/api/abacatepay/criar-cobranca",
+            data={
+                "amount": amount,
+                "description": "Harness payment latency",
+                "external_id": external_id,
+                "customer": customer,
+                "items": [
+                    {
+                        "nome": "Ingresso harness",
+                        "quantidade": 1,
+                        "preco": amount,
+                        "event_id": event_id,
+                        "ticket_type": "individual",
+                    }
+                ],
+            },
+        )
+        body = await response.json()
+        if not response.ok:
+            raise RuntimeError("criar-cobranca %d: %s" % (response.status, body))
+        return body["id"], body.get("amount") or amount
+
+    async def pay(self, pix_id, amount):
+        base = config.SUPABASE_URL.rstrip("/") + "/functions/v1/"
+        if self.trigger == "abacatepay":
+            response = await self.request.post(
+                base + "simular-pagamento-pix",
+                data={"id": pix_id},
+                headers={"Authorization": "Bearer " + config.SUPABASE_SERVICE_ROLE_KEY},
+            )
+        else:
+            # The harness plays AbacatePay and posts the paid webhook itself
+            response = await self.request.post(
+                payment_mock.webhook_url(), data=payment_mock.webhook_payload(pix_id, amount)
+            )
+        if not response.ok:
+            raise RuntimeError("%s trigger %d: %s" % (self.trigger, response.status, await response.text()))
+
+
+async def wait_ticket(conn, pix_id, timeout):
+    """Poll until the order has a ticket; returns the last progress row."""
+    deadline = time.monotonic() + timeout
+    row = None
+    while time.monotonic() < deadline:
+        row = await conn.fetchrow(PROGRESS_SQL, pix_id)
+        if row and row["ticket_at"] is not None:
+            break
+        await asyncio.sleep(0.02)
+    return row
+
+
+async def wait_visible(page, text, timeout):
+    """Open the customer's tickets tab until ``text`` shows up; epoch seconds or ``None``."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        await page.goto(config.url("/perfil"), wait_until="domcontentloaded")
+        await page.get_by_role("tab", name="Meus Ingressos").click()
+        try:
+            await page.wait_for_function(TICKET_TEXT_JS, arg=text, timeout=min(5000, timeout * 1000))
+            return time.time()
+        except async_api.TimeoutError:
+            continue
+    return None
+
+
+async def iteration(payments, conn, page, args, n, customer, event_id, tag):
+    external_id = "bench-pay-%s-%04d" % (tag, n)
+    started = time.time()
+    pix_id, amount = await payments.create(external_id, customer, event_id, args.amount)
+    created = time.time()
+    await payments.pay(pix_id, amount)
+    row = await wait_ticket(conn, pix_id, args.timeout)
+
+    stages = {"charge": (created - started) * 1000}
+    if row is None or row["ticket_at"] is None:
+        return pix_id, stages, "no ticket after %.0fs (order status %s)" % (
+            args.timeout, row["status"] if row else "missing")
+    # Hops are measured from the previous one reached, so a missing webhook row
+    # (e.g. a trigger that updates the order directly) does not break the chain
+    previous = created
+    for stage, at in (("webhook", row["webhook_at"]), ("order", row["order_at"]), ("ticket", row["ticket_at"])):
+        if at is not None:
+            stages[stage] = (float(at) - previous) * 1000
+            previous = float(at)
+    if page is not None:
+        text = "Assento: %s" % row["seat_number"] if row["seat_number"] else "ID: %s" % str(row["ticket_id"])[:8]
+        visible = await wait_visible(page, text, args.timeout)
+        if visible is None:
+            return pix_id, stages, "ticket %s not visible on /perfil" % text
+        stages["ui"] = (visible - previous) * 1000
+        previous = visible
+    stages["total"] = (previous - created) * 1000
+    return pix_id, stages, None
+
+
+async def cleanup(conn, tag, pix_ids):
+    pattern = "bench-pay-%s-%%" % tag
+    await conn.execute(
+        "DELETE FROM tickets WHERE order_id IN (SELECT id FROM orders WHERE external_id LIKE $1)", pattern
+    )
+    await conn.execute(
+        "DELETE FROM order_items WHERE order_id IN (SELECT id FROM orders WHERE external_id LIKE $1)", pattern
+    )
+    await conn.execute("DELETE FROM orders WHERE external_id LIKE $1", pattern)
+    await conn.execute("DELETE FROM customers WHERE email LIKE $1", "bench+bench-pay-%s-%%" % tag)
+    await conn.execute(
+        "DELETE FROM webhooks WHERE payload -> 'data' -> 'pixQrCode' ->> 'id' = ANY($1::text[])", pix_ids
+    )
+
+
+async def run(args, report=print):
+    tag = uuid.uuid4().hex[:6]
+    samples = {stage: [] for stage in STAGES}
+    failures = []
+    pix_ids = []
+    conn = await db.connect(args.dsn)
+    try:
+        event_id = args.event or await conn.fetchval("SELECT id FROM events ORDER BY created_at LIMIT 1")
+        if event_id is None:
+            raise SystemExit("No rows in events; seed the local database first")
+        async with async_playwright() as pw:
+            request = await pw.request.new_context()
+            browser = context = page = None
+            try:
+                if args.ui:
+                    browser = await hb.launch(pw)
+                    context = await hb.new_context(browser, storage_state=args.storage_state)
+                    page = await hb.open_page(context, "/perfil")
+                    session = await hb.session(page)
+                    if not session:
+                        raise SystemExit("Storage state %s has no Supabase session" % args.storage_state)
+                    email = session["email"]
+                payments = Payments(request, args.trigger)
+                for n in range(args.iterations):
+                    if not args.ui:
+                        email = "bench+bench-pay-%s-%04d@example.com" % (tag, n)
+                    customer = {"name": "Bench Buyer", "email": email, "phone": "11999999999",
+                                "document": "52998224725"}
+                    try:
+                        pix_id, stages, error = await iteration(
+                            payments, conn, page, args, n, customer, event_id, tag
+                        )
+                    except RuntimeError as exc:
+                        failures.append({"iteration": n, "error": str(exc)})
+                        continue
+                    pix_ids.append(pix_id)
+                    for stage, value in stages.items():
+                        samples[stage].append(value)
+                    if error:
+                        failures.append({"iteration": n, "pix_id": pix_id, "error": error})
+                    await asyncio.sleep(args.pause)
+            finally:
+                if context:
+                    await context.close()
+                if browser:
+                    await browser.close()
+                await request.dispose()
+    finally:
+        if not args.keep:
+            await cleanup(conn, tag, pix_ids)
+        await conn.close()
+
+    result = {
+        "trigger": args.trigger,
+        "iterations": args.iterations,
+        "stages_ms": {stage: summarize(values) for stage, values in samples.items() if values},
+        "failures": failures,
+    }
+    for stage, summary in result["stages_ms"].items():
+        report("%-8s %s" % (stage, format_summary(summary)))
+    report("failures: %d/%d" % (len(failures), args.iterations))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pix paid -> ticket visible latency per stage")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--trigger", choices=("local", "abacatepay"), default="local",
+                        help="post the webhook locally or go through simular-pagamento-pix")
+    parser.add_argument("--amount", type=float, default=60.0)
+    parser.add_argument("--event", default=None, help="events.id for the ticket (defaults to the oldest event)")
+    parser.add_argument("--no-ui", dest="ui", action="store_false", help="stop at ticket creation")
+    parser.add_argument("--storage-state", default=config.CUSTOMER_STORAGE_STATE)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds per iteration before it fails")
+    parser.add_argument("--pause", type=float, default=0.2)
+    parser.add_argument("--keep", action="store_true", help="keep the orders, tickets and webhooks created")
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--out", default=str(config.output_path("payment_latency.json")))
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, indent=2)
+    return 0 if not result["failures"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Local stand-in for AbacatePay Pix charges, driven by a (virtual) clock.
+
+Routes the edge functions the checkout calls -- ``criar-pix-qrcode``,
+``consultar-cobranca`` and ``simular-pagamento-pix`` -- to in-memory charges
+whose expiry and payment follow ``clock.now()``. With a
+:class:`harness.clock.VirtualClock`, fast-forwarding the pages also expires
+charges and fires payments here, so the mock never disagrees with the
+countdown the page shows.
+
+A charge is paid ``pay_after`` seconds after creation (never when ``None``)
+unless it expired first; ``simular-pagamento-pix`` pays it immediately. With
+``deliver_webhooks`` the ``billing.paid`` webhook is posted to
+``webhook-abacatepay`` ``webhook_delay`` seconds after payment.
+"""
+
+import asyncio
+import base64
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+
+from harness import config
+
+FUNCTIONS = ("criar-pix-qrcode", "consultar-cobranca", "simular-pagamento-pix")
+
+
+def webhook_url():
+    return "%s/functions/v1/webhook-abacatepay?webhookSecret=%s" % (
+        config.SUPABASE_URL.rstrip("/"),
+        config.WEBHOOK_SECRET,
+    )
+
+
+def webhook_payload(pix_id, amount):
+    """The ``billing.paid`` body AbacatePay posts once a Pix QR code is paid."""
+    return {
+        "event": "billing.paid",
+        "devMode": True,
+        "data": {"pixQrCode": {"id": pix_id, "kind": "PIX", "status": "PAID", "amount": amount}},
+    }
+
+
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class PixMock:
+    def __init__(self, clock=None, pay_after=None, webhook_delay=0.0, deliver_webhooks=False):
+        self.now = clock.now if clock else time.time
+        self.pay_after = pay_after
+        self.webhook_delay = webhook_delay
+        self.deliver_webhooks = deliver_webhooks
+        self.charges = {}
+        self.events = []
+        self._ticker = None
+        self._ticker_context = None
+
+    def _log(self, kind, charge_id):
+        self.events.append({"at": self.now(), "event": kind, "id": charge_id})
+
+    def status(self, charge):
+        """``PENDING``/``PAID``/``EXPIRED`` at the current (virtual) time."""
+        now = self.now()
+        if charge["paid_at"] is not None and charge["paid_at"] <= now:
+            return "PAID"
+        if charge["expires_at"] <= now:
+            return "EXPIRED"
+        return "PENDING"
+
+    def create(self, amount, expires_in):
+        now = self.now()
+        charge_id = "pix_char_harness_%s" % uuid.uuid4().hex[:12]
+        paid_at = now + self.pay_after if self.pay_after is not None else None
+        charge = {
+            "id": charge_id,
+            "amount": amount,
+            "created_at": now,
+            "expires_at": now + expires_in,
+            # A payment scheduled after expiry never happens
+            "paid_at": paid_at if paid_at is not None and paid_at < now + expires_in else None,
+            "webhook_sent": False,
+        }
+        self.charges[charge_id] = charge
+        self._log("created", charge_id)
+        return charge
+
+    def pay(self, charge_id):
+        charge = self.charges.get(charge_id)
+        if charge is None or self.status(charge) != "PENDING":
+            return charge
+        charge["paid_at"] = self.now()
+        self._log("paid", charge_id)
+        return charge
+
+    def body(self, charge):
+        status = self.status(charge)
+        brcode = "00020126harness%s" % charge["id"]
+        return {
+            "status": status.lower(),
+            "data": {
+                "id": charge["id"],
+                "amount": charge["amount"],
+                "status": status,
+                "brCode": brcode,
+                "brCodeBase64": "data:image/png;base64," + base64.b64encode(brcode.encode()).decode(),
+                "createdAt": _iso(charge["created_at"]),
+                "expiresAt": _iso(charge["expires_at"]),
+            },
+        }
+
+    async def install(self, context):
+        base = config.SUPABASE_URL.rstrip("/") + "/functions/v1/"
+        for name in FUNCTIONS:
+            await context.route(base + name + "*", self._handle)
+        if self.deliver_webhooks and self._ticker is None:
+            self._ticker = asyncio.ensure_future(self._tick(context.request))
+            self._ticker_context = context
+
+    def detach(self, context):
+        """Stop delivering through ``context`` before it closes."""
+        if context is self._ticker_context:
+            self.close()
+
+    async def _handle(self, route, request):
+        if request.method == "OPTIONS":
+            await route.fulfill(status=204, headers={"Access-Control-Allow-Origin": "*",
+                                                     "Access-Control-Allow-Headers": "*"})
+            return
+        name = request.url.split("/functions/v1/", 1)[1].split("?", 1)[0]
+        payload = json.loads(request.post_data or "{}") if request.method == "POST" else {}
+        if name == "criar-pix-qrcode":
+            charge = self.create(payload.get("amount", 0), payload.get("expiresIn", 1800))
+        elif name == "simular-pagamento-pix":
+            charge = self.pay(payload.get("id"))
+        else:
+            charge = self.charges.get(request.url.split("id=", 1)[-1].split("&", 1)[0])
+        if charge is None:
+            await route.fulfill(status=404, json={"success": False, "error": "Cobrança não encontrada"},
+                                headers={"Access-Control-Allow-Origin": "*"})
+            return
+        await route.fulfill(status=200, json=dict(self.body(charge), success=True),
+                            headers={"Access-Control-Allow-Origin": "*"})
+
+    async def deliver_due(self, request):
+        """Post the webhooks whose (virtual) delivery time has passed."""
+        now = self.now()
+        for charge in self.charges.values():
+            paid_at = charge["paid_at"]
+            if charge["webhook_sent"] or paid_at is None or paid_at + self.webhook_delay > now:
+                continue
+            charge["webhook_sent"] = True
+            response = await request.post(webhook_url(), data=webhook_payload(charge["id"], charge["amount"]))
+            self._log("webhook %d" % response.status, charge["id"])
+
+    async def _tick(self, request):
+        while True:
+            await self.deliver_due(request)
+            await asyncio.sleep(0.25)
+
+    def close(self):
+        if self._ticker:
+            self._ticker.cancel()
+            self._ticker = None
+            self._ticker_context = None
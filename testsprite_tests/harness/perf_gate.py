@@ -0,0 +1,319 @@
+"""Statistical performance gate: K runs per scenario against the baseline from main.
+
+One run of a TC is too noisy to compare. Each scenario (a TC with
+:class:`PerfHook` attached) runs ``--runs`` times, and every metric
+becomes a distribution:
+
+* ``duration_ms`` of the whole TC and ``stepNN`` of every action
+  (``click``, ``fill``, ``goto``, ... timed by :func:`harness.runner.patch_steps`);
+* ``lcp <path>``: largest contentful paint of the first document on each path;
+* ``requests`` / ``api_requests`` (Supabase and payment API) per run.
+
+Each distribution is compared with the scenario's baseline using a one-sided
+Mann-Whitney U test and Cliff's delta. Only the aggregate metrics
+(``duration_ms``, ``lcp *`` and the request counts) gate, Holm-corrected
+among themselves: with 7 runs a side the smallest p the test can give is
+about 0.001, so correcting over dozens of ``stepNN`` metrics as well would
+leave nothing detectable. A gated metric is a regression only when it is
+significant, the effect is at least ``--min-effect``, and the median grew
+by ``--threshold`` and by ``--min-ms`` (``--min-count`` for request
+counts). Step rows are reported for information, to point at where a
+regression comes from. Each scenario also prints the minimum p its sample
+sizes allow next to Holm's smallest threshold, and warns when no
+regression could be flagged at all. Failed runs are left out of the
+samples, and a step whose label changed (regenerated TC) is skipped rather
+than compared.
+
+Baselines are one small JSON per scenario under ``perf_baselines/``
+(``HARNESS_PERF_BASELINE_DIR``), holding the rounded samples of the last
+green run. ``--update-baseline`` rewrites them only when every run passed,
+no regression was flagged and the branch is ``main`` (``--force`` skips the
+branch check), so CI on main keeps them current.
+
+Usage::
+
+    python -m harness.perf_gate TC004 TC005 TC006 --runs 7
+    python -m harness.perf_gate --runs 9 --update-baseline          # on main
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from harness import config
+from harness.route_crawler import is_api
+from harness.runner import ContextHook, find_tcs, patch_steps, run_tcs, tc_id
+from harness.stats import cliffs_delta, mann_whitney_u
+
+DEFAULT_SCENARIOS = ("TC004", "TC005", "TC006", "TC017")
+COUNT_METRICS = ("requests", "api_requests")
+
+LCP_JS = """
+(() => {
+  const doc = Math.random().toString(36).slice(2);
+  new PerformanceObserver(list => {
+    const entries = list.getEntries();
+    const last = entries[entries.length - 1];
+    if (last) window.__harnessLcp(doc, location.pathname, last.startTime);
+  }).observe({ type: 'largest-contentful-paint', buffered: true });
+})();
+"""
+
+
+class PerfHook(ContextHook):
+    """Step durations, LCP per path and request counts of one TC run."""
+
+    def __init__(self):
+        self._restore = None
+        self.reset()
+
+    def reset(self):
+        self.steps = []
+        self.lcp = {}
+        self.requests = 0
+        self.api_requests = 0
+        self._started = {}
+
+    async def on_context(self, context):
+        await context.expose_function("__harnessLcp", self._on_lcp)
+        await context.add_init_script(LCP_JS)
+        context.on("request", self._on_request)
+        if self._restore is None:
+            self._restore = patch_steps(self._after, self._before)
+
+    def _on_lcp(self, doc, path, value):
+        self.lcp[doc] = (path, value)
+
+    def _on_request(self, request):
+        self.requests += 1
+        if is_api(request.url):
+            self.api_requests += 1
+
+    async def _before(self, page, description):
+        self._started[page] = time.perf_counter()
+
+    async def _after(self, page, description):
+        started = self._started.pop(page, None)
+        if started is not None:
+            self.steps.append((description, (time.perf_counter() - started) * 1000))
+
+    def on_finish(self, result):
+        if self._restore:
+            self._restore()
+            self._restore = None
+        metrics = {"duration_ms": result.duration_s * 1000,
+                   "requests": self.requests, "api_requests": self.api_requests}
+        labels = {}
+        for path, value in self.lcp.values():
+            metrics.setdefault("lcp %s" % path, value)
+        for number, (description, ms) in enumerate(self.steps, 1):
+            name = "step%02d" % number
+            metrics[name] = ms
+            labels[name] = description
+        result.extras["perf"] = {"metrics": metrics, "labels": labels}
+        self.reset()
+
+
+def collect(paths, runs, report=print):
+    """``{scenario: {"metrics": {name: samples}, "labels": {...}, "runs": n, "failed": n}}``."""
+    hook = PerfHook()
+    scenarios = {}
+    for path in paths:
+        scenario = scenarios[tc_id(path)] = {"metrics": defaultdict(list), "labels": {}, "runs": 0, "failed": 0}
+        for _ in range(runs):
+            result = run_tcs([path], [hook], report=report)[0]
+            scenario["runs"] += 1
+            if not result.passed:
+                scenario["failed"] += 1
+                continue
+            for name, value in result.extras["perf"]["metrics"].items():
+                scenario["metrics"][name].append(value)
+            scenario["labels"].update(result.extras["perf"]["labels"])
+    return scenarios
+
+
+def baseline_path(scenario):
+    return config.PERF_BASELINE_DIR / ("%s.json" % scenario)
+
+
+def load_baseline(scenario):
+    try:
+        with open(baseline_path(scenario), encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(scenario, data, commit):
+    """Rounded, sorted samples per metric, one compact JSON line per scenario."""
+    config.PERF_BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+    metrics = {}
+    for name, samples in sorted(data["metrics"].items()):
+        entry = {"samples": sorted(round(v, 1) for v in samples)}
+        if name in data["labels"]:
+            entry["label"] = data["labels"][name]
+        metrics[name] = entry
+    document = {"scenario": scenario, "commit": commit, "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "metrics": metrics}
+    with open(baseline_path(scenario), "w", encoding="utf-8") as fh:
+        json.dump(document, fh, sort_keys=True, separators=(",", ":"))
+
+
+def gated(metric):
+    """Aggregate metrics block a merge; per-step rows are information."""
+    return metric == "duration_ms" or metric.startswith("lcp ") or metric in COUNT_METRICS
+
+
+def min_detectable_p(n1, n2):
+    """Smallest p the one-sided test gives for these sample sizes (complete separation)."""
+    return mann_whitney_u(list(range(n1)), list(range(n1, n1 + n2)))[1]
+
+
+def holm(rows, alpha):
+    """Mark ``significant`` on rows whose p-value survives Holm's step-down correction."""
+    ordered = sorted(rows, key=lambda r: r["p"])
+    for rank, row in enumerate(ordered):
+        row["significant"] = row["p"] <= alpha / (len(ordered) - rank)
+        if not row["significant"]:
+            for rest in ordered[rank + 1:]:
+                rest["significant"] = False
+            break
+
+
+def compare(baseline, current, args):
+    """One row per metric present in both, with the gate's verdict (gated metrics only)."""
+    rows = []
+    skipped = []
+    for name, samples in sorted(current["metrics"].items()):
+        entry = (baseline or {}).get("metrics", {}).get(name)
+        if entry is None:
+            skipped.append({"metric": name, "reason": "no baseline"})
+            continue
+        if entry.get("label") != current["labels"].get(name):
+            skipped.append({"metric": name, "reason": "step changed: %r -> %r"
+                            % (entry.get("label"), current["labels"].get(name))})
+            continue
+        base = entry["samples"]
+        if min(len(base), len(samples)) < args.min_samples:
+            skipped.append({"metric": name, "reason": "%d/%d samples" % (len(base), len(samples))})
+            continue
+        _, p = mann_whitney_u(base, samples)
+        before, after = statistics.median(base), statistics.median(samples)
+        rows.append({
+            "metric": name,
+            "label": current["labels"].get(name, ""),
+            "baseline_median": before,
+            "median": after,
+            "change": (after - before) / before if before else (float("inf") if after > before else 0.0),
+            "p": p,
+            "effect": cliffs_delta(base, samples),
+            "gated": gated(name),
+            "min_p": min_detectable_p(len(base), len(samples)),
+        })
+    holm([row for row in rows if row["gated"]], args.alpha)
+    for row in rows:
+        floor = args.min_count if row["metric"] in COUNT_METRICS else args.min_ms
+        slower = (row["effect"] >= args.min_effect and row["change"] >= args.threshold
+                  and row["median"] - row["baseline_median"] >= floor)
+        if row["gated"]:
+            row["regression"] = row["significant"] and slower
+        else:
+            row["significant"] = row["p"] <= args.alpha  # uncorrected, information only
+            row["regression"] = False
+            row["slower"] = row["significant"] and slower
+    return rows, skipped
+
+
+def git(*command):
+    try:
+        return subprocess.run(("git",) + command, capture_output=True, text=True, check=True,
+                              cwd=config.TESTS_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def current_branch():
+    return os.environ.get("GITHUB_REF_NAME") or git("rev-parse", "--abbrev-ref", "HEAD")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gate merges on significant perf regressions vs main")
+    parser.add_argument("tests", nargs="*", default=list(DEFAULT_SCENARIOS), help="TC ids (scenarios)")
+    parser.add_argument("--runs", type=int, default=7, help="runs per scenario (K)")
+    parser.add_argument("--alpha", type=float, default=0.05, help="family-wise error rate per scenario")
+    parser.add_argument("--min-effect", type=float, default=0.33, help="Cliff's delta (0.33 = medium)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative median increase")
+    parser.add_argument("--min-ms", type=float, default=50.0, help="absolute median increase for timings")
+    parser.add_argument("--min-count", type=float, default=1.0, help="absolute median increase for counts")
+    parser.add_argument("--min-samples", type=int, default=5, help="passing runs needed on each side")
+    parser.add_argument("--update-baseline", action="store_true", help="on a green main run, replace the baselines")
+    parser.add_argument("--force", action="store_true", help="update the baselines on any branch")
+    parser.add_argument("--out", default=str(config.output_path("perf_gate.json")))
+    args = parser.parse_args(argv)
+
+    scenarios = collect(find_tcs(args.tests), args.runs)
+    output = {}
+    regressions = 0
+    unjudged = []
+    green = True
+    for scenario, current in scenarios.items():
+        baseline = load_baseline(scenario)
+        rows, skipped = compare(baseline, current, args)
+        flagged = [row for row in rows if row["regression"]]
+        regressions += len(flagged)
+        green = green and not current["failed"] and not flagged
+        print("== %s  %d/%d runs passed, baseline %s" % (
+            scenario, current["runs"] - current["failed"], current["runs"],
+            baseline["commit"][:10] if baseline and baseline.get("commit") else "none"))
+        gate_rows = [row for row in rows if row["gated"]]
+        if gate_rows:
+            min_p = max(row["min_p"] for row in gate_rows)
+            first = args.alpha / len(gate_rows)
+            print("   %d gated metrics, min p %.4f vs Holm threshold %.4f%s" % (
+                len(gate_rows), min_p, first,
+                "  -- nothing can be flagged, raise --runs" if min_p > first else ""))
+        for row in sorted(rows, key=lambda r: -r["change"]):
+            if row["regression"] or row.get("slower") or abs(row["change"]) >= args.threshold:
+                if row["gated"]:
+                    verdict = "REGRESSION" if row["regression"] else ("faster" if row["change"] < 0 else "noise")
+                else:
+                    verdict = "step slower" if row["slower"] else "step"
+                print("   %-11s %-15s %9.1f -> %9.1f  %+6.1f%%  p=%.4f  delta=%+.2f  %s" % (
+                    verdict, row["metric"], row["baseline_median"], row["median"], 100 * row["change"],
+                    row["p"], row["effect"], row["label"][:60]))
+        if skipped:
+            print("   %d metrics not compared (%s)" % (len(skipped), ", ".join(sorted({s["reason"].split(":")[0]
+                                                                                     for s in skipped}))))
+        if current["runs"] - current["failed"] < args.min_samples:
+            unjudged.append(scenario)
+        output[scenario] = {"runs": current["runs"], "failed": current["failed"],
+                            "baseline_commit": (baseline or {}).get("commit"),
+                            "comparisons": rows, "skipped": skipped}
+
+    if args.update_baseline:
+        branch = current_branch()
+        if not green:
+            print("baselines kept: the run is not green")
+        elif branch != "main" and not args.force:
+            print("baselines kept: branch %s is not main" % branch)
+        else:
+            commit = os.environ.get("GITHUB_SHA") or git("rev-parse", "HEAD")
+            for scenario, current in scenarios.items():
+                save_baseline(scenario, current, commit)
+            print("baselines updated in %s" % config.PERF_BASELINE_DIR)
+
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(output, fh, indent=2)
+    print("%d regression(s)" % regressions)
+    if unjudged:
+        print("too few passing runs to judge: %s" % ", ".join(unjudged))
+    return 1 if regressions or unjudged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,503 @@
+"""Chrome performance traces of named slow steps, summarized for flamegraph work.
+
+:func:`performance_trace` wraps any step in CDP ``Tracing.start`` /
+``Tracing.end`` with the DevTools timeline categories plus the V8 sampling
+profiler, and writes the trace as gzipped Trace Event JSON: it loads as is
+in the DevTools Performance panel ("Load profile") and in
+https://ui.perfetto.dev. Each trace is summarized from the renderer main
+thread:
+
+* self time by category (scripting, rendering, painting, loading, other),
+  the way the DevTools summary pie attributes nested events;
+* the longest tasks, with their own category breakdown;
+* the top JS functions by self time, from the CPU profile samples.
+
+Named steps (:data:`SCENARIOS`) reproduce the interactions worth a profile
+with harness setup, since the generated TCs never reach some of them:
+
+* ``product-modal``: opening the product modal on ``/loja`` (TC004);
+* ``finalizar-pedido``: "Finalizar Pedido" up to the Pix modal, with the
+  cart from the fixtures and :class:`harness.payment_mock.PixMock` (TC006);
+* ``admin-stock``: loading ``/admin/estoque`` (TC009).
+
+``tc`` traces steps inside unmodified TC files instead: every action whose
+preceding TC comment matches ``--match`` is traced until the page settles.
+
+Usage::
+
+    python -m harness.perf_trace step product-modal finalizar-pedido admin-stock
+    python -m harness.perf_trace tc TC004 --match "product image or card"
+    python -m harness.perf_trace summary tmp/harness/traces/product-modal-20250101-120000.json.gz
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import gzip
+import json
+import linecache
+import re
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from harness import browser as hb
+from harness import checkout, config
+from harness.fixtures import Fixtures
+from harness.payment_mock import PixMock
+from harness.runner import ContextHook, find_tcs, patch_steps, run_tcs, tc_id
+
+TRACES_DIR = config.OUTPUT_DIR / "traces"
+
+# What the DevTools Performance panel records
+CATEGORIES = [
+    "devtools.timeline",
+    "v8.execute",
+    "disabled-by-default-devtools.timeline",
+    "disabled-by-default-devtools.timeline.frame",
+    "disabled-by-default-devtools.timeline.stack",
+    "toplevel",
+    "blink.console",
+    "blink.user_timing",
+    "latencyInfo",
+    "loading",
+    "disabled-by-default-v8.cpu_profiler",
+]
+
+EVENT_CATEGORIES = {
+    "scripting": {
+        "EvaluateScript", "FunctionCall", "TimerFire", "EventDispatch", "RunMicrotasks", "FireAnimationFrame",
+        "FireIdleCallback", "XHRReadyStateChange", "XHRLoad", "v8.compile", "v8.compileModule",
+        "v8.evaluateModule", "v8.run", "v8.produceCache", "v8.produceModuleCache", "MajorGC", "MinorGC",
+        "V8.GC_SCAVENGER", "BlinkGC.AtomicPhase", "CompileCode", "CompileModule", "ParseOnBackground",
+    },
+    "rendering": {
+        "Layout", "UpdateLayoutTree", "RecalculateStyles", "ScheduleStyleRecalculation", "InvalidateLayout",
+        "UpdateLayerTree", "HitTest", "PrePaint", "Layerize", "ParseAuthorStyleSheet",
+        "IntersectionObserverController::computeIntersections",
+    },
+    "painting": {
+        "Paint", "PaintImage", "CompositeLayers", "RasterTask", "Decode Image", "ImageDecodeTask",
+        "Decode LazyPixelRef", "Draw LazyPixelRef", "UpdateLayer", "Commit", "GPUTask",
+    },
+    "loading": {
+        "ParseHTML", "ResourceSendRequest", "ResourceReceiveResponse", "ResourceReceivedData", "ResourceFinish",
+    },
+}
+CATEGORY_OF = {name: category for category, names in EVENT_CATEGORIES.items() for name in names}
+TASK_EVENTS = {"RunTask", "ThreadControllerImpl::RunTask", "ThreadControllerImpl::DoWork"}
+# Profile nodes that are not JS
+NOT_JS = {"(root)", "(idle)", "(program)"}
+LONG_TASK_MS = 50.0
+
+
+async def read_stream(cdp, handle):
+    chunks = []
+    while True:
+        data = await cdp.send("IO.read", {"handle": handle, "size": 1 << 20})
+        chunks.append(base64.b64decode(data["data"]) if data.get("base64Encoded") else data["data"].encode())
+        if data.get("eof"):
+            break
+    await cdp.send("IO.close", {"handle": handle})
+    return b"".join(chunks)
+
+
+class PerformanceTrace:
+    """One CDP tracing session on ``page``: :meth:`start`, then :meth:`stop` to save and summarize."""
+
+    def __init__(self, page, name, top=10):
+        self.page = page
+        self.name = name
+        self.top = top
+        self.cdp = None
+        self.complete = None
+        self.started = None
+
+    async def start(self):
+        self.cdp = await self.page.context.new_cdp_session(self.page)
+        self.complete = asyncio.get_running_loop().create_future()
+
+        def on_complete(params):
+            if not self.complete.done():
+                self.complete.set_result(params)
+
+        self.cdp.on("Tracing.tracingComplete", on_complete)
+        await self.cdp.send("Tracing.start", {
+            "transferMode": "ReturnAsStream",
+            "traceConfig": {"includedCategories": CATEGORIES, "excludedCategories": ["*"]},
+        })
+        self.started = time.perf_counter()
+
+    async def stop(self):
+        """Save the trace under :data:`TRACES_DIR`; returns ``{name, wall_ms, path, summary}``."""
+        wall_ms = (time.perf_counter() - self.started) * 1000
+        await self.cdp.send("Tracing.end")
+        params = await asyncio.wait_for(self.complete, 60)
+        raw = await read_stream(self.cdp, params["stream"])
+        await self.cdp.detach()
+        TRACES_DIR.mkdir(parents=True, exist_ok=True)
+        path = TRACES_DIR / ("%s-%s.json.gz" % (self.name, time.strftime("%Y%m%d-%H%M%S")))
+        with gzip.open(path, "wb") as fh:
+            fh.write(raw)
+        return {"name": self.name, "wall_ms": wall_ms, "path": str(path),
+                "summary": summarize_trace(json.loads(raw), self.top)}
+
+
+@contextlib.asynccontextmanager
+async def performance_trace(page, name, top=10):
+    """Trace the body of the ``async with``; the yielded dict gets the :meth:`PerformanceTrace.stop` result."""
+    tracer = PerformanceTrace(page, name, top)
+    await tracer.start()
+    trace = {}
+    try:
+        yield trace
+    finally:
+        trace.update(await tracer.stop())
+
+
+def trace_events(document):
+    return document["traceEvents"] if isinstance(document, dict) else document
+
+
+def main_thread(events):
+    """``(pid, tid)`` of the busiest ``CrRendererMain`` thread."""
+    mains = {(e["pid"], e["tid"]) for e in events
+             if e.get("ph") == "M" and e.get("name") == "thread_name"
+             and e.get("args", {}).get("name") == "CrRendererMain"}
+    busy = defaultdict(float)
+    for e in events:
+        if e.get("ph") == "X" and (e.get("pid"), e.get("tid")) in mains:
+            busy[(e["pid"], e["tid"])] += e.get("dur", 0)
+    return max(busy, key=busy.get) if busy else None
+
+
+def complete_events(events, thread):
+    """``(start, duration, name)`` of the thread's X events and B/E pairs, in µs."""
+    spans = []
+    open_begins = defaultdict(list)
+    for e in events:
+        if (e.get("pid"), e.get("tid")) != thread:
+            continue
+        ph = e.get("ph")
+        if ph == "X":
+            spans.append((e["ts"], e.get("dur", 0), e["name"]))
+        elif ph == "B":
+            open_begins[e["name"]].append(e["ts"])
+        elif ph == "E" and open_begins[e.get("name")]:
+            begin = open_begins[e["name"]].pop()
+            spans.append((begin, e["ts"] - begin, e["name"]))
+    spans.sort(key=lambda s: (s[0], -s[1]))
+    return spans
+
+
+def self_times(spans):
+    """Self time per category overall and per top-level task.
+
+    Nested events inherit the category of their closest categorized parent;
+    what no known event covers (task scheduling, idle work) is ``other``.
+    """
+    totals = defaultdict(float)
+    tasks = []
+    stack = []  # [end, category, child time, duration, task index]
+
+    def close(frame):
+        own = max(frame[3] - frame[2], 0)
+        totals[frame[1]] += own
+        if frame[4] is not None:
+            tasks[frame[4]]["categories"][frame[1]] += own
+
+    for start, duration, name in spans:
+        while stack and stack[-1][0] <= start:
+            close(stack.pop())
+        parent = stack[-1] if stack else None
+        if parent:
+            parent[2] += duration
+        category = CATEGORY_OF.get(name) or (parent[1] if parent else "other")
+        task = parent[4] if parent else None
+        if parent is None and name in TASK_EVENTS:
+            tasks.append({"start": start, "duration": duration, "categories": defaultdict(float)})
+            task = len(tasks) - 1
+        stack.append([start + duration, category, 0.0, duration, task])
+    while stack:
+        close(stack.pop())
+    return totals, tasks
+
+
+def cpu_profile_self_times(events, pid):
+    """Self time (µs) per ``(function, url, line)`` from the sampling profiler chunks."""
+    nodes = defaultdict(dict)
+    samples = defaultdict(list)
+    deltas = defaultdict(list)
+    for e in events:
+        if e.get("name") != "ProfileChunk" or e.get("pid") != pid:
+            continue
+        data = e.get("args", {}).get("data", {})
+        profile = data.get("cpuProfile", {})
+        for node in profile.get("nodes", []):
+            nodes[e["id"]][node["id"]] = node["callFrame"]
+        samples[e["id"]].extend(profile.get("samples", []))
+        deltas[e["id"]].extend(data.get("timeDeltas", []))
+    functions = defaultdict(float)
+    for profile_id, ids in samples.items():
+        # timeDeltas[i] is the gap before sample i, i.e. how long sample i-1 ran
+        for sample, delta in zip(ids, deltas[profile_id][1:]):
+            frame = nodes[profile_id].get(sample)
+            if frame is None or frame["functionName"] in NOT_JS:
+                continue
+            key = (frame["functionName"] or "(anonymous)", frame.get("url", ""), frame.get("lineNumber", -1) + 1)
+            functions[key] += max(delta, 0)
+    return functions
+
+
+def summarize_trace(document, top=10):
+    events = trace_events(document)
+    thread = main_thread(events)
+    if thread is None:
+        return {"error": "no renderer main thread in the trace"}
+    spans = complete_events(events, thread)
+    totals, tasks = self_times(spans)
+    origin = spans[0][0] if spans else 0
+    long_tasks = sorted((t for t in tasks if t["duration"] / 1000 >= LONG_TASK_MS),
+                        key=lambda t: t["duration"], reverse=True)[:top]
+    functions = cpu_profile_self_times(events, thread[0])
+    return {
+        "categories_ms": {name: round(us / 1000, 2) for name, us in sorted(totals.items(), key=lambda i: -i[1])},
+        "tasks": len(tasks),
+        "long_tasks": [
+            {"start_ms": round((t["start"] - origin) / 1000, 1), "duration_ms": round(t["duration"] / 1000, 1),
+             "categories_ms": {k: round(v / 1000, 1) for k, v in sorted(t["categories"].items(), key=lambda i: -i[1])}}
+            for t in long_tasks
+        ],
+        "total_blocking_ms": round(sum(max(t["duration"] / 1000 - LONG_TASK_MS, 0) for t in tasks), 1),
+        "top_functions": [
+            {"function": name, "url": url, "line": line, "self_ms": round(us / 1000, 2)}
+            for (name, url, line), us in sorted(functions.items(), key=lambda i: -i[1])[:top]
+        ],
+    }
+
+
+def report_trace(trace, report=print):
+    summary = trace["summary"]
+    report("== %s  %.0f ms wall -> %s" % (trace["name"], trace.get("wall_ms", 0), trace.get("path", "")))
+    if "error" in summary:
+        report("   %s" % summary["error"])
+        return
+    report("   %s  (TBT %.0f ms, %d tasks)" % (
+        "  ".join("%s %.1f ms" % item for item in summary["categories_ms"].items()),
+        summary["total_blocking_ms"], summary["tasks"]))
+    for task in summary["long_tasks"]:
+        report("   long task @%7.1f ms  %6.1f ms  %s" % (
+            task["start_ms"], task["duration_ms"],
+            ", ".join("%s %.1f" % item for item in list(task["categories_ms"].items())[:3])))
+    for fn in summary["top_functions"]:
+        report("   %8.2f ms  %s  %s:%d" % (fn["self_ms"], fn["function"], fn["url"].rsplit("/", 1)[-1], fn["line"]))
+
+
+@dataclass
+class Scenario:
+    tc: str
+    storage_state: str = None
+    description: str = ""
+
+
+async def settle(page, timeout=5000):
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout)
+    except async_api.TimeoutError:
+        pass
+
+
+async def product_modal(context, fixtures):
+    page = await hb.open_page(context, "/loja")
+    await page.locator('section [aria-haspopup="dialog"]').first.wait_for()
+    await settle(page)
+
+    async def step():
+        await page.locator('section [aria-haspopup="dialog"]').first.click()
+        await page.locator('[data-testid="product-modal"]').wait_for()
+        await page.evaluate("() => new Promise(r => requestAnimationFrame(() => requestAnimationFrame(r)))")
+
+    return page, step
+
+
+async def finalizar_pedido(context, fixtures):
+    await fixtures.cart(products=1)
+    await PixMock().install(context)
+    page = await hb.open_page(context, "/checkout")
+    await page.locator('input[name="firstName"]').wait_for()
+    await checkout.fast_fill(page)
+    await page.locator("#terms-checkbox").click()
+
+    async def step():
+        await page.locator(checkout.ORDER_BUTTON).click()
+        await page.get_by_text(checkout.PIX_PENDING_TEXT).wait_for(timeout=30000)
+
+    return page, step
+
+
+async def admin_stock(context, fixtures):
+    page = await hb.open_page(context, "/admin")
+    await settle(page)
+
+    async def step():
+        await page.goto(config.url("/admin/estoque"))
+        await page.get_by_text("Controle de Estoque").wait_for()
+        await page.locator("table").first.wait_for()
+        await settle(page)
+
+    return page, step
+
+
+SCENARIOS = {
+    "product-modal": (Scenario("TC004", None, "open the product modal on /loja"), product_modal),
+    "finalizar-pedido": (Scenario("TC006", config.CUSTOMER_STORAGE_STATE, "submit the checkout up to the Pix modal"),
+                         finalizar_pedido),
+    "admin-stock": (Scenario("TC009", config.ADMIN_STORAGE_STATE, "load /admin/estoque"), admin_stock),
+}
+
+
+async def run_scenarios(names, top, report=print):
+    traces = []
+    async with async_playwright() as pw:
+        browser = await hb.launch(pw)
+        try:
+            for name in names:
+                scenario, setup = SCENARIOS[name]
+                fixtures = await Fixtures.start(pw, scenario.storage_state)
+                context = await hb.new_context(browser, storage_state=scenario.storage_state)
+                try:
+                    page, step = await setup(context, fixtures)
+                    async with performance_trace(page, name, top) as trace:
+                        await step()
+                    trace["tc"] = scenario.tc
+                    report_trace(trace, report)
+                    traces.append(trace)
+                except async_api.Error as exc:
+                    report("== %s failed: %s" % (name, str(exc).splitlines()[0]))
+                    traces.append({"name": name, "tc": scenario.tc, "error": str(exc).splitlines()[0]})
+                finally:
+                    await context.close()
+                    await fixtures.cleanup()
+        finally:
+            await browser.close()
+    return traces
+
+
+def step_comment(path):
+    """Nearest ``# ...`` comment above the line of ``path`` currently executing."""
+    frame = sys._getframe()
+    while frame is not None and frame.f_code.co_filename != str(path):
+        frame = frame.f_back
+    if frame is None:
+        return ""
+    for number in range(frame.f_lineno, 0, -1):
+        text = linecache.getline(str(path), number).strip()
+        if text.startswith("#"):
+            return text.lstrip("#-> ").strip()
+    return ""
+
+
+class StepTraceHook(ContextHook):
+    """Trace the TC actions whose preceding comment matches ``pattern``."""
+
+    def __init__(self, pattern, top=10, tail_ms=1000, report=print):
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.top = top
+        self.tail_ms = tail_ms
+        self.report = report
+        self.path = None
+        self.active = {}
+        self.traces = []
+        self._restore = None
+
+    async def _before(self, page, description):
+        if page.context in self.active:
+            return
+        comment = step_comment(self.path)
+        if not self.pattern.search(comment):
+            return
+        name = "%s-%s" % (tc_id(self.path), re.sub(r"[^a-z0-9]+", "-", comment.lower()).strip("-")[:40])
+        tracer = PerformanceTrace(page, name, self.top)
+        await tracer.start()
+        self.active[page.context] = tracer
+
+    async def _after(self, page, description):
+        if page.context not in self.active:
+            return
+        await settle(page)
+        await page.wait_for_timeout(self.tail_ms)
+        await self._finish(page.context)
+
+    async def _finish(self, context):
+        trace = await self.active.pop(context).stop()
+        report_trace(trace, self.report)
+        self.traces.append(trace)
+
+    async def on_context(self, context):
+        if self._restore is None:
+            self._restore = patch_steps(self._after, self._before)
+
+    async def on_context_close(self, context):
+        if context in self.active:
+            try:
+                await self._finish(context)  # the traced action failed
+            except async_api.Error:
+                pass
+
+    def on_finish(self, result):
+        if self._restore:
+            self._restore()
+            self._restore = None
+        result.extras["perf_traces"] = self.traces
+        self.traces = []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CDP performance traces of named steps")
+    sub = parser.add_subparsers(dest="command", required=True)
+    step = sub.add_parser("step", help="trace harness-driven named steps")
+    step.add_argument("names", nargs="+", choices=tuple(SCENARIOS))
+    tc = sub.add_parser("tc", help="trace steps of TC files by comment")
+    tc.add_argument("tests", nargs="+", help="TC ids")
+    tc.add_argument("--match", required=True, help="regex on the TC comment above the action")
+    tc.add_argument("--tail-ms", type=int, default=1000, help="keep tracing this long after the page settles")
+    summary = sub.add_parser("summary", help="summarize saved traces")
+    summary.add_argument("paths", nargs="+")
+    for p in (step, tc, summary):
+        p.add_argument("--top", type=int, default=10, help="long tasks and functions to list")
+        p.add_argument("--out", default=str(config.output_path("perf_trace.json")))
+    args = parser.parse_args(argv)
+
+    passed = True
+    if args.command == "step":
+        output = asyncio.run(run_scenarios(args.names, args.top))
+        passed = not any("error" in trace for trace in output)
+    elif args.command == "tc":
+        hook = StepTraceHook(args.match, args.top, args.tail_ms)
+        results = []
+        for path in find_tcs(args.tests):
+            hook.path = path
+            results.extend(run_tcs([path], [hook]))
+        output = [r.__dict__ for r in results]
+        passed = all(r.passed for r in results)
+    else:
+        output = []
+        for path in args.paths:
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "rt", encoding="utf-8") as fh:
+                trace = {"name": Path(path).name, "path": path, "summary": summarize_trace(json.load(fh), args.top)}
+            report_trace(trace)
+            output.append(trace)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(output, fh, indent=2)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,372 @@
+"""Backend load from checkout pages left open on a pending Pix.
+
+While the Pix modal is open, ``AbacatePayCheckout`` calls the
+``consultar-cobranca`` edge function every 5 s, and every call is proxied to
+the AbacatePay API. (``verificar-pagamento`` is only used from the admin
+orders page and its function is empty in this tree, so checkout never hits
+it.) Two modes:
+
+* ``browser``: ``--pages`` real contexts each go through ``/checkout`` to
+  the pending Pix modal (customer storage state; the cart is seeded by
+  :mod:`harness.fixtures`) and
+  stay there for ``--duration`` seconds. Every request and WebSocket frame
+  is counted per endpoint, giving the page's real request rate and bytes.
+* ``replay`` (default): ``--virtual`` lightweight pages per policy replay
+  the polling against the real ``consultar-cobranca`` with different
+  schedules, e.g. ``fixed:5`` (today), ``fixed:15``, ``backoff:3:1.5:30``
+  (first delay, factor, cap), ``jitter:3:1.5:30`` (backoff with +-20%) or
+  ``realtime:30`` (one Realtime WebSocket plus a 30 s safety poll).
+
+CPU of the edge runtime, Kong and Postgres containers is sampled with
+``docker stats`` against an idle baseline, and every result is projected to
+1k/5k/10k concurrent pending checkouts (requests/s, bytes/s, upstream
+AbacatePay calls/s and backend cores).
+
+Usage::
+
+    python -m harness.polling_load --virtual 200 --duration 120
+    python -m harness.polling_load --policies fixed:5 jitter:3:1.5:30 realtime:30
+    python -m harness.polling_load --mode browser --pages 10 --duration 300
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from harness import browser as hb
+from harness import checkout, config, containers, db, realtime_fanout
+from harness.fixtures import Fixtures
+from harness.payment_latency import Payments
+from harness.stats import format_summary, summarize
+
+BACKEND_CONTAINERS = ("supabase_edge_runtime", "supabase_kong", "supabase_db", "supabase_realtime")
+FUNCTION_RE = re.compile(r"/functions/v1/([^/?]+)")
+REST_RE = re.compile(r"/rest/v1/([^/?]+)")
+
+
+@dataclass
+class Policy:
+    """Delay schedule between two status checks of one page."""
+
+    name: str
+    first: float
+    factor: float = 1.0
+    cap: float = 0.0
+    jitter: float = 0.0
+    realtime: bool = False
+
+    def delays(self, rng):
+        delay = self.first
+        while True:
+            yield delay * (1 + rng.uniform(-self.jitter, self.jitter)) if self.jitter else delay
+            delay = min(delay * self.factor, self.cap) if self.cap else delay * self.factor
+
+
+def parse_policy(spec):
+    kind, *numbers = spec.split(":")
+    values = [float(n) for n in numbers]
+    if kind == "fixed" and len(values) == 1:
+        return Policy(spec, values[0])
+    if kind in ("backoff", "jitter") and len(values) == 3:
+        return Policy(spec, values[0], values[1], values[2], 0.2 if kind == "jitter" else 0.0)
+    if kind == "realtime" and len(values) == 1:
+        return Policy(spec, values[0], realtime=True)
+    raise argparse.ArgumentTypeError("unknown policy %r" % spec)
+
+
+def endpoint_of(url):
+    match = FUNCTION_RE.search(url)
+    if match:
+        return "function:" + match.group(1)
+    match = REST_RE.search(url)
+    if match:
+        return "rest:" + match.group(1)
+    return None
+
+
+class Counter:
+    """Requests and bytes per endpoint for a set of pages."""
+
+    def __init__(self):
+        self.requests = {}
+        self.bytes = {}
+        self.latencies = []
+        self.errors = 0
+
+    def add(self, endpoint, size, latency_ms=None):
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        self.bytes[endpoint] = self.bytes.get(endpoint, 0) + size
+        if latency_ms is not None:
+            self.latencies.append(latency_ms)
+
+    def watch(self, context):
+        """Count backend requests and WebSocket frames of every page in ``context``."""
+        async def on_finished(request):
+            endpoint = endpoint_of(request.url)
+            if endpoint:
+                sizes = await request.sizes()
+                self.add(endpoint, sum(sizes.values()), request.timing["responseEnd"])
+
+        def on_websocket(ws):
+            def frame(payload):
+                self.add("websocket", len(payload))
+            ws.on("framesent", frame)
+            ws.on("framereceived", frame)
+
+        context.on("requestfinished", on_finished)
+        context.on("requestfailed", lambda request: setattr(self, "errors", self.errors + 1))
+        for page in context.pages:
+            page.on("websocket", on_websocket)
+        context.on("page", lambda page: page.on("websocket", on_websocket))
+
+    def rates(self, pages, seconds):
+        minutes = pages * seconds / 60.0
+        return {
+            "requests_per_page_min": {k: v / minutes for k, v in self.requests.items()},
+            "bytes_per_page_min": {k: v / minutes for k, v in self.bytes.items()},
+            "total_requests_per_page_min": sum(v for k, v in self.requests.items() if k != "websocket") / minutes,
+            "total_bytes_per_page_min": sum(self.bytes.values()) / minutes,
+            "upstream_per_page_min": self.requests.get("function:consultar-cobranca", 0) / minutes,
+        }
+
+
+class Sampler:
+    """Backend container CPU, sampled for one phase at a time."""
+
+    def __init__(self, names):
+        self.names = names
+        self.samples = []
+        self.stop = None
+        self.task = None
+
+    def start(self):
+        self.samples = []
+        if self.names:
+            self.stop = asyncio.Event()
+            self.task = asyncio.ensure_future(containers.sample(self.names, self.samples, self.stop, 1.0))
+
+    async def finish(self):
+        """Mean CPU% per container over the phase."""
+        if self.task:
+            self.stop.set()
+            await self.task
+            self.task = None
+        cpu = {}
+        for sample in self.samples:
+            cpu.setdefault(sample["container"], []).append(sample["cpu_pct"])
+        return {name: sum(values) / len(values) for name, values in cpu.items()}
+
+
+async def sleep_or_stop(stop, seconds):
+    try:
+        await asyncio.wait_for(stop.wait(), seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def virtual_page(request, policy, charge_id, counter, stop, rng):
+    url = config.SUPABASE_URL.rstrip("/") + "/functions/v1/consultar-cobranca?id=" + charge_id
+    headers = {"Authorization": "Bearer " + config.SUPABASE_ANON_KEY, "Accept": "application/json"}
+    # Pages open at random moments, not in lockstep
+    await sleep_or_stop(stop, rng.uniform(0, policy.first))
+    for delay in policy.delays(rng):
+        if stop.is_set():
+            return
+        started = time.perf_counter()
+        try:
+            response = await request.get(url, headers=headers)
+            body = await response.body()
+        except async_api.Error:
+            counter.errors += 1
+        else:
+            counter.add("function:consultar-cobranca", len(body), (time.perf_counter() - started) * 1000)
+        await sleep_or_stop(stop, delay)
+
+
+async def run_policy(pw, policy, args, charge_id, sampler):
+    counter = Counter()
+    stop = asyncio.Event()
+    rng = random.Random(args.seed)
+    request = await pw.request.new_context()
+    tasks = [
+        asyncio.ensure_future(virtual_page(request, policy, charge_id, counter, stop, rng))
+        for _ in range(args.virtual)
+    ]
+    ws_stats = None
+    if policy.realtime:
+        ws_stats = realtime_fanout.Stats()
+        token = config.SUPABASE_SERVICE_ROLE_KEY or config.SUPABASE_ANON_KEY
+        url = realtime_fanout.websocket_url(config.SUPABASE_ANON_KEY or token)
+        tasks += [
+            asyncio.ensure_future(realtime_fanout.subscriber(url, ["orders"], token, ws_stats, stop))
+            for _ in range(args.virtual)
+        ]
+    sampler.start()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    cpu = await sampler.finish()
+    await request.dispose()
+
+    result = {"policy": policy.name, "pages": args.virtual, "duration_s": args.duration, "cpu_pct": cpu}
+    result.update(counter.rates(args.virtual, args.duration))
+    result["latency_ms"] = summarize(counter.latencies)
+    result["errors"] = counter.errors
+    if ws_stats:
+        # Phoenix heartbeats: one frame each way per interval and socket
+        result["websockets"] = ws_stats.connected - ws_stats.dropped
+        result["heartbeats_per_page_min"] = 2 * 60.0 / realtime_fanout.HEARTBEAT_S
+    return result
+
+
+async def run_browser(pw, args, sampler):
+    fixtures = await Fixtures.start(pw, args.storage_state)
+    await fixtures.cart(products=1)
+    browser = await hb.launch(pw)
+    counter = Counter()
+    contexts = []
+    try:
+        for _ in range(args.pages):
+            context = await hb.new_context(browser, storage_state=args.storage_state)
+            contexts.append(context)
+        await asyncio.gather(*(checkout.open_pending_pix(c) for c in contexts))
+        # Counting starts once every page sits on the pending Pix modal
+        for context in contexts:
+            counter.watch(context)
+        sampler.start()
+        await asyncio.sleep(args.duration)
+        cpu = await sampler.finish()
+    finally:
+        for context in contexts:
+            await context.close()
+        await browser.close()
+        await fixtures.cleanup()
+
+    result = {"policy": "browser", "pages": args.pages, "duration_s": args.duration, "cpu_pct": cpu}
+    result.update(counter.rates(args.pages, args.duration))
+    result["latency_ms"] = summarize(counter.latencies)
+    result["errors"] = counter.errors
+    return result
+
+
+def project(result, idle_cpu, scales):
+    """Linear projection of one measured run to ``scales`` concurrent pending checkouts."""
+    measured_rps = result["total_requests_per_page_min"] * result["pages"] / 60.0
+    busy_cores = sum(
+        max(0.0, pct - idle_cpu.get(name, 0.0)) for name, pct in result["cpu_pct"].items()
+    ) / 100.0
+    core_s_per_request = busy_cores / measured_rps if measured_rps else 0.0
+    rows = []
+    for pages in scales:
+        rps = result["total_requests_per_page_min"] * pages / 60.0
+        rows.append(
+            {
+                "pages": pages,
+                "requests_per_s": rps,
+                "bytes_per_s": result["total_bytes_per_page_min"] * pages / 60.0,
+                "upstream_per_s": result["upstream_per_page_min"] * pages / 60.0,
+                "websockets": pages if result.get("websockets") is not None else 0,
+                "backend_cores": rps * core_s_per_request,
+            }
+        )
+    return rows
+
+
+async def create_charge(pw, tag):
+    request = await pw.request.new_context()
+    try:
+        customer = {"name": "Bench Buyer", "email": "bench+bench-poll-%s@example.com" % tag,
+                    "phone": "11999999999", "document": "52998224725"}
+        charge_id, _ = await Payments(request, "local").create("bench-poll-%s" % tag, customer, None, 10.0)
+        return charge_id
+    finally:
+        await request.dispose()
+
+
+async def cleanup(dsn, tag):
+    conn = await db.connect(dsn)
+    try:
+        await conn.execute(
+            "DELETE FROM order_items WHERE order_id IN (SELECT id FROM orders WHERE external_id = $1)",
+            "bench-poll-%s" % tag,
+        )
+        await conn.execute("DELETE FROM orders WHERE external_id = $1", "bench-poll-%s" % tag)
+        await conn.execute("DELETE FROM customers WHERE email = $1", "bench+bench-poll-%s@example.com" % tag)
+    finally:
+        await conn.close()
+
+
+async def run(args, report=print):
+    names = [n for n in [await containers.find(prefix) for prefix in BACKEND_CONTAINERS] if n]
+    sampler = Sampler(names)
+    sampler.start()
+    await asyncio.sleep(args.idle)
+    idle_cpu = await sampler.finish()
+
+    tag = uuid.uuid4().hex[:6]
+    results = []
+    async with async_playwright() as pw:
+        if args.mode == "browser":
+            results.append(await run_browser(pw, args, sampler))
+        else:
+            charge_id = args.charge_id or await create_charge(pw, tag)
+            try:
+                for policy in args.policies:
+                    results.append(await run_policy(pw, policy, args, charge_id, sampler))
+            finally:
+                if not args.charge_id:
+                    await cleanup(args.dsn, tag)
+
+    for result in results:
+        result["projection"] = project(result, idle_cpu, args.project)
+        report(
+            "%-18s req/page/min=%.2f bytes/page/min=%.0f %s"
+            % (
+                result["policy"],
+                result["total_requests_per_page_min"],
+                result["total_bytes_per_page_min"],
+                format_summary(result["latency_ms"]),
+            )
+        )
+        for row in result["projection"]:
+            report(
+                "    %6d pages: %8.1f req/s %10.0f B/s upstream=%.1f/s cores=%.2f"
+                % (row["pages"], row["requests_per_s"], row["bytes_per_s"], row["upstream_per_s"], row["backend_cores"])
+            )
+    return {"idle_cpu_pct": idle_cpu, "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Polling load of checkout pages waiting on a Pix")
+    parser.add_argument("--mode", choices=("replay", "browser"), default="replay")
+    parser.add_argument("--policies", nargs="+", type=parse_policy,
+                        default=[parse_policy(p) for p in ("fixed:5", "fixed:15", "jitter:3:1.5:30", "realtime:30")])
+    parser.add_argument("--virtual", type=int, default=200, help="virtual pages per policy (replay)")
+    parser.add_argument("--pages", type=int, default=5, help="real checkout pages (browser)")
+    parser.add_argument("--duration", type=float, default=120.0, help="seconds each run keeps the pages open")
+    parser.add_argument("--idle", type=float, default=10.0, help="seconds of idle CPU baseline")
+    parser.add_argument("--project", nargs="+", type=int, default=[1000, 5000, 10000])
+    parser.add_argument("--charge-id", default=None, help="poll an existing pix_char_* instead of creating one")
+    parser.add_argument("--storage-state", default=config.CUSTOMER_STORAGE_STATE)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--out", default=str(config.output_path("polling_load.json")))
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
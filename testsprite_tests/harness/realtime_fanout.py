@@ -0,0 +1,301 @@
+"""Protocol-level realtime fan-out load test with thousands of subscribers.
+
+Browser contexts are far too heavy for an event-day audience, so this tool
+opens plain WebSocket clients speaking the Supabase Realtime Phoenix channel
+protocol (``vsn=1.0.0`` JSON) and joins the same ``postgres_changes``
+channels the app uses (``realtime:orders``, ``realtime:cart_items``). It can
+also hold open SSE streams on the ``realtime-notifications`` edge function,
+which polls ``webhooks`` every 2 s per connection.
+
+Changes are then injected into the database with a unique marker and the
+receive time of every copy is recorded, giving the fan-out latency
+distribution and message loss. When the local stack runs in Docker, the
+realtime container's CPU and memory are sampled with ``docker stats``.
+
+Run against a local Supabase stack (``supabase start``); raise ``ulimit -n``
+above the subscriber count first.
+
+Usage::
+
+    python -m harness.realtime_fanout --subscribers 1000 5000 10000 --events 20
+    python -m harness.realtime_fanout --subscribers 2000 --sse 500
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import ssl
+import sys
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import websockets
+
+from harness import config, containers, db
+from harness.stats import format_summary, summarize
+
+HEARTBEAT_S = 25
+CART_MARKER_BASE = 900000
+
+
+def websocket_url(key):
+    base = config.SUPABASE_URL.rstrip("/").replace("https://", "wss://").replace("http://", "ws://")
+    return "%s/realtime/v1/websocket?apikey=%s&vsn=1.0.0" % (base, key)
+
+
+def join_message(table, token, ref):
+    return json.dumps(
+        {
+            "topic": "realtime:%s" % table,
+            "event": "phx_join",
+            "payload": {
+                "config": {
+                    "broadcast": {"ack": False, "self": False},
+                    "presence": {"key": ""},
+                    "postgres_changes": [{"event": "*", "schema": "public", "table": table}],
+                },
+                "access_token": token,
+            },
+            "ref": str(ref),
+            "join_ref": str(ref),
+        }
+    )
+
+
+def marker_of(table, record):
+    """The value an injected change is recognised by."""
+    if table == "orders":
+        return record.get("customer_name")
+    if table == "cart_items":
+        return record.get("quantity")
+    return None
+
+
+class Stats:
+    def __init__(self):
+        self.connected = 0
+        self.joined = 0
+        self.join_errors = 0
+        self.failed = 0           # never connected
+        self.dropped = 0          # connected, then lost before the end
+        self.received = {}        # marker -> [receive epoch seconds]
+        self.sse_messages = 0
+        self.sse_bytes = 0
+        self.sse_connected = 0
+
+
+async def subscriber(url, tables, token, stats, stop):
+    refs = itertools.count(1)
+    connected = False
+    try:
+        async with websockets.connect(url, max_size=None, ping_interval=None, open_timeout=30) as ws:
+            connected = True
+            stats.connected += 1
+            for table in tables:
+                await ws.send(join_message(table, token, next(refs)))
+
+            async def heartbeat():
+                while not stop.is_set():
+                    await asyncio.sleep(HEARTBEAT_S)
+                    beat = {"topic": "phoenix", "event": "heartbeat", "payload": {}, "ref": str(next(refs))}
+                    await ws.send(json.dumps(beat))
+
+            beating = asyncio.ensure_future(heartbeat())
+            try:
+                while not stop.is_set():
+                    try:
+                        raw = await asyncio.wait_for(ws.recv(), 1.0)
+                    except asyncio.TimeoutError:
+                        continue
+                    at = time.time()
+                    message = json.loads(raw)
+                    event = message.get("event")
+                    if event == "phx_reply" and message.get("topic", "").startswith("realtime:"):
+                        if message["payload"].get("status") == "ok":
+                            stats.joined += 1
+                        else:
+                            stats.join_errors += 1
+                    elif event == "postgres_changes":
+                        data = message["payload"].get("data", {})
+                        marker = marker_of(data.get("table"), data.get("record") or {})
+                        if marker is not None:
+                            stats.received.setdefault(marker, []).append(at)
+            finally:
+                beating.cancel()
+    except (OSError, websockets.WebSocketException, asyncio.TimeoutError):
+        if connected:
+            stats.dropped += 1
+        else:
+            stats.failed += 1
+
+
+async def sse_subscriber(stats, stop):
+    """Raw HTTP/1.1 SSE reader for the realtime-notifications function."""
+    parts = urlsplit(config.SUPABASE_URL)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    path = "/functions/v1/realtime-notifications/sse?clientId=%s" % uuid.uuid4()
+    try:
+        reader, writer = await asyncio.open_connection(
+            parts.hostname, port, ssl=ssl.create_default_context() if secure else None
+        )
+    except OSError:
+        stats.failed += 1
+        return
+    request = (
+        "GET %s HTTP/1.1\r\nHost: %s\r\nAccept: text/event-stream\r\n"
+        "Authorization: Bearer %s\r\napikey: %s\r\n\r\n"
+    ) % (path, parts.netloc, config.SUPABASE_ANON_KEY, config.SUPABASE_ANON_KEY)
+    writer.write(request.encode())
+    stats.sse_connected += 1
+    try:
+        while not stop.is_set():
+            try:
+                line = await asyncio.wait_for(reader.readline(), 1.0)
+            except asyncio.TimeoutError:
+                continue
+            if not line:
+                break
+            stats.sse_bytes += len(line)
+            if line.startswith(b"data:"):
+                stats.sse_messages += 1
+    finally:
+        writer.close()
+
+
+async def inject(conn, tables, events, interval, tag):
+    """Insert/update one marked row per table per round; returns marker -> send time."""
+    sent = {}
+    cart_row = None
+    if "cart_items" in tables:
+        cart_row = await conn.fetchrow("SELECT id, quantity FROM cart_items LIMIT 1")
+    try:
+        for n in range(events):
+            if "orders" in tables:
+                marker = "FANOUT-%s-%04d" % (tag, n)
+                external_id = "bench-fanout-%s-%04d" % (tag, n)
+                sent[marker] = time.time()
+                await db.create_order(conn, external_id, "bench+%s@example.com" % external_id, name=marker)
+            if cart_row:
+                marker = CART_MARKER_BASE + n
+                sent[marker] = time.time()
+                await conn.execute("UPDATE cart_items SET quantity = $1 WHERE id = $2", marker, cart_row["id"])
+            await asyncio.sleep(interval)
+    finally:
+        if cart_row:
+            await conn.execute("UPDATE cart_items SET quantity = $1 WHERE id = $2", cart_row["quantity"], cart_row["id"])
+    return sent
+
+
+async def run_level(args, count, report):
+    stats = Stats()
+    stop = asyncio.Event()
+    token = args.token or config.SUPABASE_SERVICE_ROLE_KEY or config.SUPABASE_ANON_KEY
+    url = websocket_url(config.SUPABASE_ANON_KEY or token)
+    tag = uuid.uuid4().hex[:6]
+
+    tasks = []
+    connect_started = time.perf_counter()
+    for n in range(count):
+        tasks.append(asyncio.ensure_future(subscriber(url, args.channels, token, stats, stop)))
+        if args.ramp and n % args.ramp == args.ramp - 1:
+            await asyncio.sleep(1.0)
+    tasks += [asyncio.ensure_future(sse_subscriber(stats, stop)) for _ in range(args.sse)]
+
+    expected_joins = count * len(args.channels)
+    deadline = time.monotonic() + args.join_timeout
+    while time.monotonic() < deadline:
+        settled = stats.connected + stats.failed >= count
+        live = stats.connected - stats.dropped
+        if settled and stats.joined + stats.join_errors >= live * len(args.channels):
+            break
+        await asyncio.sleep(0.2)
+    join_s = time.perf_counter() - connect_started
+
+    samples = []
+    container = await containers.find("supabase_realtime")
+    sampler = asyncio.ensure_future(containers.sample([container], samples, stop)) if container else None
+
+    conn = await db.connect(args.dsn)
+    try:
+        sent = await inject(conn, args.channels, args.events, args.interval, tag)
+        await asyncio.sleep(args.drain)
+    finally:
+        await conn.execute("DELETE FROM orders WHERE external_id LIKE $1", "bench-fanout-%s-%%" % tag)
+        await conn.execute("DELETE FROM customers WHERE email LIKE $1", "bench+bench-fanout-%s-%%" % tag)
+        await conn.close()
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if sampler:
+            await sampler
+
+    latencies = [(at - sent[m]) * 1000 for m, times in stats.received.items() if m in sent for at in times]
+    expected = len(sent) * (stats.connected - stats.dropped)
+    delivered = sum(len(stats.received.get(m, ())) for m in sent)
+    result = {
+        "subscribers": count,
+        "channels": args.channels,
+        "connected": stats.connected,
+        "joined": stats.joined,
+        "join_errors": stats.join_errors,
+        "failed": stats.failed,
+        "dropped": stats.dropped,
+        "join_s": join_s,
+        "events": len(sent),
+        "expected_deliveries": expected,
+        "delivered": delivered,
+        "loss_pct": 100.0 * (expected - delivered) / expected if expected else 0.0,
+        "fanout_latency_ms": summarize(latencies),
+        "sse": {"connected": stats.sse_connected, "messages": stats.sse_messages, "bytes": stats.sse_bytes},
+        "server": {
+            "container": container,
+            "cpu_pct_max": max((s["cpu_pct"] for s in samples), default=None),
+            "mem_bytes_max": max((s["mem_bytes"] for s in samples), default=None),
+            "samples": samples,
+        },
+    }
+    report(
+        "subs=%-6d joined=%d/%d join=%.1fs %s loss=%.2f%% cpu-max=%s mem-max=%s"
+        % (
+            count,
+            stats.joined,
+            expected_joins,
+            join_s,
+            format_summary(result["fanout_latency_ms"]),
+            result["loss_pct"],
+            result["server"]["cpu_pct_max"],
+            result["server"]["mem_bytes_max"],
+        )
+    )
+    return result
+
+
+async def run(args, report=print):
+    return [await run_level(args, count, report) for count in args.subscribers]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Realtime fan-out load test over the Phoenix protocol")
+    parser.add_argument("--subscribers", nargs="+", type=int, default=[1000], help="WebSocket clients per level")
+    parser.add_argument("--channels", nargs="+", choices=("orders", "cart_items"), default=["orders", "cart_items"])
+    parser.add_argument("--sse", type=int, default=0, help="SSE streams on realtime-notifications")
+    parser.add_argument("--events", type=int, default=20, help="changes injected per table")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between injected changes")
+    parser.add_argument("--drain", type=float, default=5.0, help="seconds to wait for late deliveries")
+    parser.add_argument("--ramp", type=int, default=500, help="new connections per second (0 = all at once)")
+    parser.add_argument("--join-timeout", type=float, default=120.0)
+    parser.add_argument("--token", default=None, help="JWT used to join (defaults to the service role key)")
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--out", default=str(config.output_path("realtime_fanout.json")))
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
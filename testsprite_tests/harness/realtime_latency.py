@@ -0,0 +1,190 @@
+"""Cross-client realtime propagation latency (the measurement TC011 never makes).
+
+Opens K independent browser contexts (2-50) on the same account, mutates
+data from one of them and timestamps, with a MutationObserver in every other
+context, the moment the change is rendered. Targets:
+
+* ``cart``: writer clicks ``increase-quantity``/``decrease-quantity`` on
+  ``/carrinho``; observers wait for ``item-quantity`` to show the new value.
+  Needs a customer storage state; the cart is seeded with one product
+  through :mod:`harness.fixtures`.
+* ``orders``: a new order with a unique customer name is created in the
+  database (``create_order_with_lock``); observers on ``/admin/pedidos``
+  wait for the name to appear. Needs an admin storage state and a database
+  shared with the frontend's Supabase stack.
+
+Usage::
+
+    python -m harness.realtime_latency --target cart --clients 2 5 10 --iterations 20
+    python -m harness.realtime_latency --target orders --clients 10 --iterations 50
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+
+from playwright.async_api import async_playwright
+
+from harness import browser as hb
+from harness import config, db
+from harness.fixtures import Fixtures
+from harness.stats import format_summary, summarize
+
+TARGETS = {
+    "cart": {"path": "/carrinho", "selector": '[data-testid="item-quantity"]', "exact": True},
+    "orders": {"path": "/admin/pedidos", "selector": "body", "exact": False},
+}
+
+
+class CartWriter:
+    """Alternates +1/-1 on the first cart item so quantity stays bounded."""
+
+    def __init__(self, page):
+        self.page = page
+        self.step = 0
+
+    async def prepare(self):
+        quantity = int((await self.page.locator('[data-testid="item-quantity"]').first.inner_text()).strip())
+        self.increase = self.step % 2 == 0 or quantity <= 1
+        self.step += 1
+        return str(quantity + 1 if self.increase else quantity - 1)
+
+    async def fire(self):
+        button = "increase-quantity" if self.increase else "decrease-quantity"
+        started = await hb.page_now(self.page)
+        await self.page.locator('[data-testid="%s"]' % button).first.click()
+        return started
+
+
+class OrderWriter:
+    """Inserts an order whose customer name is the marker observers look for."""
+
+    def __init__(self, page, conn, tag):
+        self.page = page
+        self.conn = conn
+        self.tag = tag
+        self.count = 0
+
+    async def prepare(self):
+        self.count += 1
+        self.marker = "RT-%s-%04d" % (self.tag, self.count)
+        return self.marker
+
+    async def fire(self):
+        external_id = "bench-rt-%s-%04d" % (self.tag, self.count)
+        started = await hb.page_now(self.page)
+        await db.create_order(self.conn, external_id, "bench+%s@example.com" % external_id, name=self.marker)
+        return started
+
+    async def cleanup(self):
+        await self.conn.execute("DELETE FROM orders WHERE external_id LIKE $1", "bench-rt-%s-%%" % self.tag)
+        await self.conn.execute("DELETE FROM customers WHERE email LIKE $1", "bench+bench-rt-%s-%%" % self.tag)
+
+
+async def measure(browser, args, clients, report):
+    target = TARGETS[args.target]
+    state = args.storage_state or (
+        config.CUSTOMER_STORAGE_STATE if args.target == "cart" else config.ADMIN_STORAGE_STATE
+    )
+    contexts = [await hb.new_context(browser, storage_state=state) for _ in range(clients)]
+    conn = None
+    try:
+        for context in contexts:
+            await hb.install_watch(context)
+        pages = await asyncio.gather(*(hb.open_page(c, target["path"]) for c in contexts))
+        await asyncio.gather(*(p.locator(target["selector"]).first.wait_for() for p in pages))
+        writer_page, observers = pages[0], pages[1:]
+
+        if args.target == "cart":
+            writer = CartWriter(writer_page)
+        else:
+            conn = await db.connect(args.dsn)
+            writer = OrderWriter(writer_page, conn, uuid.uuid4().hex[:6])
+
+        latencies, missed = [], 0
+        for iteration in range(args.iterations):
+            key = "it%d" % iteration
+            expected = await writer.prepare()
+            # Observers are armed before the change so the first matching mutation is timestamped
+            await asyncio.gather(
+                *(hb.arm_watch(p, key, target["selector"], expected, target["exact"]) for p in observers)
+            )
+            started = await writer.fire()
+            deadline = time.monotonic() + args.timeout
+            pending = list(observers)
+            while pending and time.monotonic() < deadline:
+                seen = await asyncio.gather(*(hb.seen_at(p, key) for p in pending))
+                for page, at in list(zip(pending, seen)):
+                    if at is not None:
+                        latencies.append(at - started)
+                        pending.remove(page)
+                if pending:
+                    await asyncio.sleep(0.01)
+            missed += len(pending)
+            await asyncio.sleep(args.pause)
+
+        if conn and not args.keep:
+            await writer.cleanup()
+    finally:
+        if conn:
+            await conn.close()
+        for context in contexts:
+            await context.close()
+
+    result = {
+        "target": args.target,
+        "clients": clients,
+        "iterations": args.iterations,
+        "latency_ms": summarize(latencies),
+        "missed": missed,
+        "expected": args.iterations * (clients - 1),
+    }
+    report(
+        "%s clients=%-3d %s missed=%d/%d"
+        % (args.target, clients, format_summary(result["latency_ms"]), missed, result["expected"])
+    )
+    return result
+
+
+async def run(args, report=print):
+    async with async_playwright() as pw:
+        fixtures = None
+        if args.target == "cart":
+            fixtures = await Fixtures.start(pw, args.storage_state or config.CUSTOMER_STORAGE_STATE)
+            await fixtures.cart(products=1, quantity=2)
+        browser = await hb.launch(pw)
+        try:
+            return [await measure(browser, args, clients, report) for clients in args.clients]
+        finally:
+            await browser.close()
+            if fixtures:
+                await fixtures.cleanup()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Realtime propagation latency across browser clients")
+    parser.add_argument("--target", choices=sorted(TARGETS), default="cart")
+    parser.add_argument("--clients", nargs="+", type=int, default=[2, 5, 10],
+                        help="contexts per run, writer included (2-50)")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds before an update counts as missed")
+    parser.add_argument("--pause", type=float, default=0.5, help="seconds between mutations")
+    parser.add_argument("--storage-state", default=None)
+    parser.add_argument("--keep", action="store_true", help="keep the orders created for the orders target")
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--out", default=str(config.output_path("realtime_latency.json")))
+    args = parser.parse_args(argv)
+    if any(not 2 <= c <= 50 for c in args.clients):
+        parser.error("--clients must be between 2 and 50")
+
+    results = asyncio.run(run(args))
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    return 0 if all(r["missed"] == 0 for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+"""Route x role crawl: access result and load time of every page.
+
+TC013 probes ``/protected-route`` and ``/logout`` by hand and TC015 opens
+``/tests``, which is not a route. This crawler takes the routes declared in
+``src/App.tsx`` (and/or the links found on the pages, starting at ``/``),
+visits each one as anonymous, customer and admin in three parallel contexts
+and records, per visit:
+
+* navigation timing (``domContentLoaded``, ``load``, first contentful
+  paint) plus the time until the page settled;
+* where the page ended up (``ProtectedRoute`` redirects to ``/auth`` or
+  ``/admin/login``), whether ``NotFound`` rendered and whether the guard
+  was still on its "Verificando..." spinner;
+* uncaught JS errors and the status of every Supabase / payment API call.
+
+The ``ProtectedRoute`` guard of each router entry gives the expected
+access; a role that reaches a page it should be redirected away from is a
+violation and makes the run fail. Roles whose storage state file is missing
+are skipped.
+
+Usage::
+
+    python -m harness.route_crawler
+    python -m harness.route_crawler --roles anonymous customer --discover links --concurrency 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from urllib.parse import urlparse
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from harness import browser as hb
+from harness import config
+from harness.stats import summarize
+
+ROUTER_FILE = config.TESTS_DIR.parent / "src" / "App.tsx"
+ROUTE_RE = re.compile(r'<Route\s+path="([^"]+)"')
+
+ROLES = {
+    "anonymous": None,
+    "customer": config.CUSTOMER_STORAGE_STATE,
+    "admin": config.ADMIN_STORAGE_STATE,
+}
+# Which guards each role is expected to pass
+ALLOWED = {
+    "anonymous": {"public"},
+    "customer": {"public", "auth"},
+    "admin": {"public", "auth", "admin"},
+}
+
+NOT_FOUND_TEXT = "Oops! Page not found"
+# ProtectedRoute spinner; an anonymous visit to an admin route can stay on it
+GUARD_PENDING_TEXT = "Verificando"
+
+TIMING_JS = """
+() => {
+  const nav = performance.getEntriesByType('navigation')[0];
+  const fcp = performance.getEntriesByName('first-contentful-paint')[0];
+  return {
+    dom_content_loaded_ms: nav ? nav.domContentLoadedEventEnd : null,
+    load_ms: nav ? nav.loadEventEnd : null,
+    fcp_ms: fcp ? fcp.startTime : null,
+    transfer_bytes: nav ? nav.transferSize : null,
+  };
+}
+"""
+
+LINKS_JS = """
+() => [...document.querySelectorAll('a[href]')].map(a => a.href)
+"""
+
+
+def router_routes(path=ROUTER_FILE):
+    """``{route: guard}`` for the static routes of the React router.
+
+    ``guard`` is ``admin`` (``requireAdmin``), ``auth`` (any other
+    ``ProtectedRoute``) or ``public``; ``*`` and ``:param`` routes are skipped.
+    """
+    source = path.read_text(encoding="utf-8")
+    routes = {}
+    matches = list(ROUTE_RE.finditer(source))
+    for match, following in zip(matches, matches[1:] + [None]):
+        route = match.group(1)
+        if route == "*" or ":" in route:
+            continue
+        element = source[match.end():following.start() if following else len(source)]
+        if "requireAdmin={true}" in element:
+            routes[route] = "admin"
+        elif "<ProtectedRoute" in element:
+            routes[route] = "auth"
+        else:
+            routes[route] = "public"
+    return routes
+
+
+def same_origin_path(url):
+    """Path of ``url`` when it belongs to the app under test, else ``None``."""
+    base = urlparse(config.BASE_URL)
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or parsed.netloc != base.netloc:
+        return None
+    return parsed.path.rstrip("/") or "/"
+
+
+def is_api(url):
+    return url.startswith(config.SUPABASE_URL.rstrip("/")) or url.startswith(config.PAYMENT_API_URL.rstrip("/"))
+
+
+def classify(visit, guard, role):
+    """``ok``, ``redirect``, ``stuck``, ``not-found`` or ``error``, and whether it breaks the guard."""
+    if visit.get("error") or (visit.get("status") or 0) >= 400:
+        access = "error"
+    elif visit["not_found"]:
+        access = "not-found"
+    elif visit["final_path"] != visit["route"]:
+        access = "redirect"
+    elif visit["guard_pending"]:
+        access = "stuck"
+    else:
+        access = "ok"
+    violation = access == "ok" and guard is not None and guard not in ALLOWED[role]
+    return access, violation
+
+
+async def visit(context, route, args):
+    page = await context.new_page()
+    errors = []
+    api = []
+    page.on("pageerror", lambda exc: errors.append(str(exc)))
+
+    def on_response(response):
+        if is_api(response.url):
+            api.append({"url": response.url.split("?", 1)[0], "status": response.status})
+
+    page.on("response", on_response)
+    result = {"route": route, "status": None, "error": None}
+    started = time.monotonic()
+    try:
+        response = await page.goto(config.url(route), wait_until="load", timeout=args.timeout * 1000)
+        result["status"] = response.status if response else None
+        # Guards resolve the session asynchronously; let the app settle before reading the URL
+        try:
+            await page.wait_for_load_state("networkidle", timeout=args.settle * 1000)
+        except async_api.TimeoutError:
+            pass
+        result["settled_ms"] = (time.monotonic() - started) * 1000
+        result.update(await page.evaluate(TIMING_JS))
+        result["final_path"] = same_origin_path(page.url) or page.url
+        result["not_found"] = await page.get_by_text(NOT_FOUND_TEXT).count() > 0
+        result["guard_pending"] = await page.get_by_text(GUARD_PENDING_TEXT).count() > 0
+        links = await page.evaluate(LINKS_JS) if args.discover != "router" else []
+    except async_api.Error as exc:
+        result.update(final_path=None, not_found=False, guard_pending=False, error=str(exc).splitlines()[0])
+        links = []
+    finally:
+        await page.close()
+    result["js_errors"] = errors
+    result["api"] = api
+    result["api_failures"] = [call for call in api if call["status"] >= 400]
+    return result, links
+
+
+async def crawl_role(browser, role, routes, args, report):
+    """Visit ``routes`` (plus discovered links) with ``concurrency`` pages in one context."""
+    context = await hb.new_context(browser, storage_state=ROLES[role])
+    queue = asyncio.Queue()
+    seen = set()
+    results = {}
+
+    def enqueue(route):
+        if route not in seen and route not in args.skip and len(seen) < args.max_routes:
+            seen.add(route)
+            queue.put_nowait(route)
+
+    for route in routes:
+        enqueue(route)
+
+    async def worker():
+        while True:
+            route = await queue.get()
+            try:
+                result, links = await visit(context, route, args)
+                results[route] = result
+                for link in links:
+                    path = same_origin_path(link)
+                    if path:
+                        enqueue(path)
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(args.concurrency)]
+    try:
+        await queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await context.close()
+    report("%-9s %d routes" % (role, len(results)))
+    return results
+
+
+def matrix_rows(crawls, guards, roles):
+    rows = []
+    for route in sorted({route for results in crawls.values() for route in results}):
+        guard = guards.get(route)
+        row = {"route": route, "guard": guard or "discovered", "roles": {}}
+        for role in roles:
+            result = crawls[role].get(route)
+            if result is None:
+                continue
+            access, violation = classify(result, guard, role)
+            row["roles"][role] = {
+                "access": access,
+                "violation": violation,
+                "final_path": result["final_path"],
+                "settled_ms": result.get("settled_ms"),
+                "load_ms": result.get("load_ms"),
+                "js_errors": len(result["js_errors"]),
+                "api_failures": len(result["api_failures"]),
+            }
+        rows.append(row)
+    return rows
+
+
+def format_cell(cell):
+    if cell is None:
+        return "-"
+    if cell["access"] == "redirect":
+        text = "->%s" % cell["final_path"]
+    elif cell["access"] == "ok" and cell["settled_ms"] is not None:
+        text = "ok %.0fms" % cell["settled_ms"]
+    else:
+        text = cell["access"]
+    if cell["js_errors"] or cell["api_failures"]:
+        text += " !%d/%d" % (cell["js_errors"], cell["api_failures"])
+    return ("VIOLATION " if cell["violation"] else "") + text
+
+
+async def run(args, report=print):
+    roles = []
+    for role in args.roles:
+        state = ROLES[role]
+        if state and not os.path.exists(state):
+            report("skipping %s: storage state %s not found" % (role, state))
+            continue
+        roles.append(role)
+    guards = router_routes() if args.discover != "links" else {}
+    start = list(guards) if guards else ["/"]
+    if args.discover != "router" and "/" not in start:
+        start.insert(0, "/")
+
+    async with async_playwright() as pw:
+        browser = await hb.launch(pw)
+        try:
+            crawls = dict(zip(roles, await asyncio.gather(
+                *(crawl_role(browser, role, start, args, report) for role in roles)
+            )))
+        finally:
+            await browser.close()
+
+    rows = matrix_rows(crawls, guards, roles)
+    width = max([len(row["route"]) for row in rows] + [5])
+    report("%-*s %-10s %s" % (width, "route", "guard", "  ".join("%-22s" % role for role in roles)))
+    for row in rows:
+        report("%-*s %-10s %s" % (width, row["route"], row["guard"],
+                                  "  ".join("%-22s" % format_cell(row["roles"].get(role)) for role in roles)))
+
+    slowest = sorted(
+        ((cell["settled_ms"], row["route"], role) for row in rows for role, cell in row["roles"].items()
+         if cell["access"] == "ok" and cell["settled_ms"] is not None),
+        reverse=True,
+    )[:args.top]
+    report("slowest: %s" % ", ".join("%s as %s %.0fms" % (route, role, ms) for ms, route, role in slowest))
+    violations = [
+        {"route": row["route"], "role": role} for row in rows
+        for role, cell in row["roles"].items() if cell["violation"]
+    ]
+    report("violations: %d" % len(violations))
+    return {
+        "roles": roles,
+        "matrix": rows,
+        "violations": violations,
+        "settled_ms": {role: summarize([r["settled_ms"] for r in crawls[role].values() if r.get("settled_ms")])
+                       for role in roles},
+        "visits": crawls,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl every route as every role")
+    parser.add_argument("--roles", nargs="+", choices=tuple(ROLES), default=list(ROLES))
+    parser.add_argument("--discover", choices=("router", "links", "both"), default="both",
+                        help="routes from src/App.tsx, links followed from /, or both")
+    parser.add_argument("--concurrency", type=int, default=4, help="pages in flight per role")
+    parser.add_argument("--max-routes", type=int, default=200, help="cap on routes visited per role")
+    parser.add_argument("--skip", nargs="*", default=["/auth/callback"], help="routes never visited")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds for the page load")
+    parser.add_argument("--settle", type=float, default=3.0, help="seconds to wait for network idle")
+    parser.add_argument("--top", type=int, default=5, help="slowest routes to list")
+    parser.add_argument("--out", default=str(config.output_path("route_crawler.json")))
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, indent=2)
+    return 0 if not result["violations"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
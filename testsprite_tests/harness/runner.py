@@ -0,0 +1,278 @@
+"""Run the generated TC scripts with context hooks attached.
+
+The TC files are regenerated by TestSprite, so instead of editing them the
+runner patches ``Browser.new_context`` / ``BrowserContext.close`` while a TC
+executes. Every measurement mode is a :class:`ContextHook`; several hooks can
+be stacked on one run.
+
+When :mod:`harness.browser_server` is running, ``python -m harness.runner``
+also patches ``BrowserType.launch`` so the TCs connect to that Chromium
+instead of launching their own (``--no-server`` opts out). ``--dist``
+serves the production build with :mod:`harness.static_server` on the
+dev server's address for the duration of the run (``--dist-route``
+reroutes to another port instead).
+
+Usage::
+
+    python -m harness.runner TC005 TC007
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import re
+import runpy
+import sys
+import time
+from dataclasses import dataclass, field
+
+from playwright.async_api import Browser, BrowserContext, BrowserType, Error, Locator, Page
+
+from harness import browser_server, config
+
+
+class ContextHook:
+    """Base class for per-context instrumentation.
+
+    ``context_options`` may rewrite the keyword arguments of
+    ``browser.new_context``; the async callbacks run on the TC's event loop.
+    ``on_finish`` runs after the TC returned or raised.
+    """
+
+    def context_options(self, options):
+        return options
+
+    async def on_context(self, context):
+        pass
+
+    async def on_context_close(self, context):
+        pass
+
+    def on_finish(self, result):
+        pass
+
+
+def on_new_page(context, setup):
+    """Run ``await setup(page)`` on every page of ``context`` before the TC gets it.
+
+    TCs navigate right after ``new_page()``, so the wrapped ``new_page`` only
+    returns once ``setup`` is done; popups arrive through the ``page`` event.
+    Returns the ``{page: setup task}`` map.
+    """
+    tasks = {}
+
+    def track(page):
+        if page not in tasks:
+            tasks[page] = asyncio.ensure_future(setup(page))
+        return tasks[page]
+
+    original_new_page = context.new_page
+
+    async def new_page(**kwargs):
+        page = await original_new_page(**kwargs)
+        await track(page)
+        return page
+
+    context.new_page = new_page
+    context.on("page", track)
+    return tasks
+
+
+# Actions that end a TC step
+STEP_ACTIONS = {
+    Locator: ("click", "dblclick", "fill", "press", "type", "check", "uncheck", "select_option", "hover",
+              "set_input_files"),
+    Page: ("goto", "reload", "go_back", "go_forward", "click", "fill", "press"),
+}
+
+SELECTOR_RE = re.compile(r"selector='(.*)'>$")
+
+
+def describe_step(target, name, args):
+    """``click xpath=...`` / ``goto http://...`` for step logs."""
+    if isinstance(target, Locator):
+        match = SELECTOR_RE.search(repr(target))
+        return "%s %s" % (name, match.group(1) if match else "")
+    return "%s %s" % (name, args[0] if args and isinstance(args[0], str) else "")
+
+
+def patch_steps(after, before=None):
+    """Await ``before(page, description)`` / ``after(page, description)`` around every :data:`STEP_ACTIONS` call.
+
+    ``after`` only runs when the action succeeded. Returns a function that
+    restores the original methods.
+    """
+    originals = []
+
+    def wrap(original, name):
+        @functools.wraps(original)
+        async def action(self, *args, **kwargs):
+            page = self if isinstance(self, Page) else self.page
+            description = describe_step(self, name, args)
+            if before:
+                await before(page, description)
+            result = await original(self, *args, **kwargs)
+            await after(page, description)
+            return result
+        return action
+
+    for cls, names in STEP_ACTIONS.items():
+        for name in names:
+            original = getattr(cls, name)
+            originals.append((cls, name, original))
+            setattr(cls, name, wrap(original, name))
+
+    def restore():
+        for cls, name, original in originals:
+            setattr(cls, name, original)
+
+    return restore
+
+
+@dataclass
+class TCResult:
+    name: str
+    passed: bool
+    duration_s: float
+    error: str = ""
+    extras: dict = field(default_factory=dict)
+
+
+def find_tcs(selectors=()):
+    """Resolve ``TC005`` / ``5`` / file-name selectors to TC paths (all when empty)."""
+    paths = sorted(config.TESTS_DIR.glob("TC[0-9][0-9][0-9]_*.py"))
+    if not selectors:
+        return paths
+    wanted = []
+    for selector in selectors:
+        selector = str(selector)
+        prefix = "TC%03d" % int(selector) if selector.isdigit() else selector.split(".py")[0]
+        matches = [p for p in paths if p.name.startswith(prefix)]
+        if not matches:
+            raise SystemExit("No TC matches %r" % selector)
+        wanted.extend(m for m in matches if m not in wanted)
+    return wanted
+
+
+def tc_id(path):
+    """``TC005`` for ``TC005_Add_and_Remove_Items_in_Cart.py``."""
+    return path.name.split("_", 1)[0]
+
+
+@contextlib.contextmanager
+def installed_hooks(hooks):
+    """Patch Playwright so every context created inside the block gets ``hooks``."""
+    original_new_context = Browser.new_context
+    original_close = BrowserContext.close
+    closed = set()
+
+    async def new_context(self, **options):
+        for hook in hooks:
+            options = hook.context_options(options)
+        context = await original_new_context(self, **options)
+        for hook in hooks:
+            await hook.on_context(context)
+        return context
+
+    async def close(self, **kwargs):
+        if id(self) not in closed:
+            closed.add(id(self))
+            for hook in hooks:
+                await hook.on_context_close(self)
+        await original_close(self, **kwargs)
+
+    Browser.new_context = new_context
+    BrowserContext.close = close
+    try:
+        yield
+    finally:
+        Browser.new_context = original_new_context
+        BrowserContext.close = original_close
+
+
+@contextlib.contextmanager
+def connected_launch(endpoint):
+    """Turn ``chromium.launch()`` into a CDP connection to ``endpoint``."""
+    original_launch = BrowserType.launch
+
+    async def launch(self, **options):
+        if endpoint and self.name == "chromium":
+            try:
+                return await self.connect_over_cdp(endpoint, timeout=2000)
+            except Error:
+                pass  # server went away: launch the way the TC asked
+        return await original_launch(self, **options)
+
+    BrowserType.launch = launch
+    try:
+        yield
+    finally:
+        BrowserType.launch = original_launch
+
+
+def run_tc(path, hooks=(), endpoint=None):
+    """Execute one TC file in-process and return a :class:`TCResult`.
+
+    With ``endpoint`` the TC's browser is a connection to a running
+    :mod:`harness.browser_server`.
+    """
+    hooks = list(hooks)
+    started = time.perf_counter()
+    error = ""
+    with installed_hooks(hooks), connected_launch(endpoint):
+        try:
+            runpy.run_path(str(path), run_name="__main__")
+        except KeyboardInterrupt:
+            raise
+        except BaseException as exc:
+            error = "%s: %s" % (type(exc).__name__, exc)
+    result = TCResult(tc_id(path), not error, time.perf_counter() - started, error)
+    for hook in hooks:
+        hook.on_finish(result)
+    return result
+
+
+def run_tcs(paths, hooks=(), report=print, endpoint=None):
+    """Run TCs sequentially, reporting one line per result."""
+    results = []
+    for path in paths:
+        result = run_tc(path, hooks, endpoint)
+        results.append(result)
+        status = "PASS" if result.passed else "FAIL"
+        line = "%s %s %.1fs" % (status, result.name, result.duration_s)
+        if result.error:
+            line += "  " + result.error.splitlines()[0][:160]
+        report(line)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("tests", nargs="*", help="TC ids (e.g. TC005 or 5); all when omitted")
+    parser.add_argument("--no-server", action="store_true", help="ignore a running browser server")
+    parser.add_argument("--dist", action="store_true", help="run against dist/ instead of the dev server")
+    parser.add_argument("--dist-route", action="store_true",
+                        help="--dist on port 4173 via context.route (disables the HTTP cache)")
+    args = parser.parse_args(argv)
+    endpoint = None if args.no_server else browser_server.endpoint()
+    if endpoint:
+        print("using browser server %s" % endpoint)
+    if not (args.dist or args.dist_route):
+        results = run_tcs(find_tcs(args.tests), endpoint=endpoint)
+        return 0 if all(r.passed for r in results) else 1
+
+    # Imported here: static_server itself imports this module for ContextHook
+    from harness.static_server import DistHook, StaticServer
+
+    server = StaticServer() if args.dist_route else StaticServer.at(config.BASE_URL)
+    hooks = [DistHook(server)] if args.dist_route else []
+    with server:
+        print("serving %s on %s" % (server.root, server.base_url))
+        results = run_tcs(find_tcs(args.tests), hooks, endpoint=endpoint)
+    print("%d requests, %.1f KiB sent" % (server.requests, server.bytes_sent / 1024))
+    return 0 if all(r.passed for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
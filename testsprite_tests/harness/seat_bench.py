@@ -0,0 +1,258 @@
+"""Seat-number allocation throughput benchmark and duplicate/gap verifier.
+
+Seat numbers come from the global ``ticket_seat_number_seq`` (0001-1300)
+through ``get_next_seat_number()``/``get_next_seat_numbers(n)`` and, on the
+real issuance path, ``create_tickets_atomic(order_id, items, customer)``.
+This tool hammers those functions with concurrent sessions and then checks
+the allocated numbers:
+
+* ``--mode single`` calls ``get_next_seat_number()`` directly;
+* ``--mode atomic`` issues tickets for pre-created orders with
+  ``--batch`` tickets each, spread over ``--events`` events.
+
+Because the sequence is capped at 1300, every round restarts it and runs
+until sold out; the original sequence position is restored at the end.
+The verifier reports duplicated seats (globally and per event), skipped
+seats inside the allocated range and failed allocations.
+
+Usage::
+
+    python -m harness.seat_bench --mode atomic --concurrency 32 --batch 2 --events 1
+    python -m harness.seat_bench --mode atomic --concurrency 32 --events 4 --rounds 3
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from collections import Counter
+
+import asyncpg
+
+from harness import config, db
+from harness.stats import format_summary, summarize
+
+CAPACITY = 1300
+
+# nextval() hits the sequence MAXVALUE before get_next_seat_number's own check
+SOLD_OUT_MARKERS = ("esgotados", "suficientes", "maximum value")
+
+
+async def save_sequence(conn):
+    return await conn.fetchrow("SELECT last_value, is_called FROM ticket_seat_number_seq")
+
+
+async def restore_sequence(conn, state):
+    await conn.execute("SELECT setval('ticket_seat_number_seq', $1, $2)", state["last_value"], state["is_called"])
+
+
+async def restart_sequence(conn):
+    await conn.execute("ALTER SEQUENCE ticket_seat_number_seq RESTART WITH 1")
+
+
+async def pick_events(conn, count):
+    rows = await conn.fetch("SELECT id FROM events ORDER BY created_at LIMIT $1", count)
+    if len(rows) < count:
+        raise SystemExit("Need %d rows in events, found %d; seed the local database first" % (count, len(rows)))
+    return [r["id"] for r in rows]
+
+
+async def create_orders(conn, tag, count):
+    ids = []
+    for n in range(count):
+        external_id = "bench-seat-%s-%06d" % (tag, n)
+        ids.append(
+            await db.create_order(
+                conn, external_id, "bench+%s@example.com" % external_id, order_type="ticket", status="paid"
+            )
+        )
+    return ids
+
+
+async def cleanup(conn, tag):
+    prefix = "bench-seat-%s-%%" % tag
+    await conn.execute(
+        "DELETE FROM tickets WHERE order_id IN (SELECT id FROM orders WHERE external_id LIKE $1)", prefix
+    )
+    await conn.execute("DELETE FROM orders WHERE external_id LIKE $1", prefix)
+    await conn.execute("DELETE FROM customers WHERE email LIKE $1", "bench+" + prefix)
+
+
+def is_sold_out(message):
+    """Sold-out signals: the functions' own errors or the sequence MAXVALUE."""
+    return any(marker in message for marker in SOLD_OUT_MARKERS)
+
+
+class Round:
+    def __init__(self):
+        self.latencies_ms = []
+        self.seats = []          # (seat_number, event_id or None)
+        self.failures = Counter()
+        self.sold_out = False
+        self.elapsed_s = 0.0
+
+
+async def run_single(pool, concurrency, result):
+    async def session():
+        async with pool.acquire() as conn:
+            while not result.sold_out:
+                started = time.perf_counter()
+                try:
+                    seat = await conn.fetchval("SELECT get_next_seat_number()")
+                except asyncpg.PostgresError as exc:
+                    if is_sold_out(str(exc)):
+                        result.sold_out = True
+                    else:
+                        result.failures[str(exc)[:80]] += 1
+                    continue
+                result.latencies_ms.append((time.perf_counter() - started) * 1000)
+                result.seats.append((seat, None))
+
+    await asyncio.gather(*(session() for _ in range(concurrency)))
+
+
+async def run_atomic(pool, concurrency, batch, order_ids, event_ids, result):
+    queue = asyncio.Queue()
+    for n, order_id in enumerate(order_ids):
+        queue.put_nowait((order_id, event_ids[n % len(event_ids)]))
+
+    async def session():
+        async with pool.acquire() as conn:
+            while not result.sold_out and not queue.empty():
+                order_id, event_id = queue.get_nowait()
+                items = json.dumps([{"event_id": str(event_id), "ticket_type": "bench", "price": 60}] * batch)
+                started = time.perf_counter()
+                row = await conn.fetchrow(
+                    "SELECT * FROM create_tickets_atomic($1, $2::jsonb, $3::jsonb)",
+                    str(order_id),
+                    items,
+                    json.dumps({"email": "bench@example.com"}),
+                )
+                elapsed = (time.perf_counter() - started) * 1000
+                if not row["success"]:
+                    message = row["error_message"] or ""
+                    if is_sold_out(message):
+                        result.sold_out = True
+                    else:
+                        result.failures[message[:80]] += 1
+                    continue
+                result.latencies_ms.append(elapsed)
+                result.seats.extend((seat, event_id) for seat in row["seat_numbers"])
+
+    await asyncio.gather(*(session() for _ in range(concurrency)))
+
+
+async def stored_seats(conn, tag):
+    """Seats as persisted in ``tickets`` (catches divergence from the RPC result)."""
+    rows = await conn.fetch(
+        """
+        SELECT t.seat_number, t.event_id FROM tickets t
+        JOIN orders o ON o.id = t.order_id
+        WHERE o.external_id LIKE $1 AND t.seat_number IS NOT NULL
+        """,
+        "bench-seat-%s-%%" % tag,
+    )
+    return [(r["seat_number"], r["event_id"]) for r in rows]
+
+
+def verify(seats):
+    """Duplicates (global and per event) and skipped numbers in the allocated range."""
+    numbers = [int(seat) for seat, _ in seats]
+    counts = Counter(numbers)
+    duplicates = sorted(n for n, c in counts.items() if c > 1)
+    per_event = Counter((event, seat) for seat, event in seats if event is not None)
+    event_duplicates = sum(1 for c in per_event.values() if c > 1)
+    skipped = sorted(set(range(1, max(numbers) + 1)) - set(numbers)) if numbers else []
+    return {
+        "allocated": len(numbers),
+        "highest": max(numbers) if numbers else 0,
+        "duplicates": duplicates,
+        "event_duplicates": event_duplicates,
+        "skipped": skipped,
+        "ok": not duplicates and not skipped,
+    }
+
+
+async def run_round(args, pool, admin, event_ids):
+    tag = uuid.uuid4().hex[:8]
+    result = Round()
+    await restart_sequence(admin)
+    try:
+        if args.mode == "atomic":
+            order_ids = await create_orders(admin, tag, CAPACITY // args.batch + args.concurrency)
+            started = time.perf_counter()
+            await run_atomic(pool, args.concurrency, args.batch, order_ids, event_ids, result)
+        else:
+            started = time.perf_counter()
+            await run_single(pool, args.concurrency, result)
+        result.elapsed_s = time.perf_counter() - started
+        report = verify(result.seats)
+        if args.mode == "atomic":
+            report["stored"] = verify(await stored_seats(admin, tag))
+            report["ok"] = report["ok"] and report["stored"]["ok"]
+    finally:
+        if args.mode == "atomic" and not args.keep:
+            await cleanup(admin, tag)
+    report.update(
+        {
+            "seats_per_s": len(result.seats) / result.elapsed_s if result.elapsed_s else 0.0,
+            "latency_ms": summarize(result.latencies_ms),
+            "failures": dict(result.failures),
+            "sold_out": result.sold_out,
+        }
+    )
+    return report
+
+
+async def run(args, report=print):
+    admin = await db.connect(args.dsn)
+    pool = await db.create_pool(args.dsn, min_size=args.concurrency, max_size=args.concurrency)
+    original = await save_sequence(admin)
+    rounds = []
+    try:
+        event_ids = await pick_events(admin, args.events) if args.mode == "atomic" else []
+        for n in range(args.rounds):
+            data = await run_round(args, pool, admin, event_ids)
+            rounds.append(data)
+            report(
+                "round %d: %d seats %.0f seats/s %s dup=%d skipped=%d failures=%d %s"
+                % (
+                    n + 1,
+                    data["allocated"],
+                    data["seats_per_s"],
+                    format_summary(data["latency_ms"]),
+                    len(data["duplicates"]),
+                    len(data["skipped"]),
+                    sum(data["failures"].values()),
+                    "OK" if data["ok"] else "INCONSISTENT",
+                )
+            )
+    finally:
+        await restore_sequence(admin, original)
+        await pool.close()
+        await admin.close()
+    return rounds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seat allocation throughput and duplicate/gap checker")
+    parser.add_argument("--mode", choices=("single", "atomic"), default="atomic")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=1, help="tickets per order (atomic mode)")
+    parser.add_argument("--events", type=int, default=1, help="events issued in parallel (atomic mode)")
+    parser.add_argument("--rounds", type=int, default=1, help="sell-outs of the 1300 seats to run")
+    parser.add_argument("--keep", action="store_true", help="keep benchmark tickets/orders")
+    parser.add_argument("--dsn", default=None)
+    parser.add_argument("--out", default=str(config.output_path("seat_bench.json")))
+    args = parser.parse_args(argv)
+
+    rounds = asyncio.run(run(args))
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump({"mode": args.mode, "rounds": rounds}, fh, indent=2)
+    return 0 if all(r["ok"] for r in rounds) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
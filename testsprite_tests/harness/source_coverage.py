@@ -0,0 +1,220 @@
+"""Line coverage of ``src/`` driven by the E2E suite, as LCOV and Istanbul summary.
+
+Collection is :class:`harness.bundle_coverage.CoverageHook`: every context
+streams V8 coverage deltas to its worker's JSONL shard, so raw profiles never
+pile up in memory. The merge reads the shards record by record and keeps,
+per script content hash and TC, only the union of executed byte ranges (at
+most one range list per script per TC, whatever the number of records), so
+it is linear in the shard size and safe for parallel workers and long runs.
+At the end each script is mapped once through its source map onto the
+original files:
+
+* a line is instrumented when generated code maps to it and covered when
+  any executed byte does; its LCOV hit count is the number of TCs covering it;
+* ``src/`` files no page ever loaded (e.g. ``src/api/webhook-*.ts``) are
+  listed with every non-blank line uncovered (``--no-all`` skips them).
+
+Writes ``lcov.info`` and ``coverage-summary.json`` (Istanbul
+``json-summary``) under ``tmp/harness/coverage/`` and prints the difference
+with the previous merge: per-file percentage changes and lines that stopped
+or started being covered.
+
+``run`` only appends to its own shard; earlier shards are dropped
+explicitly, once per suite run, with ``reset`` (or ``run --reset`` when a
+single process runs everything), so parallel workers never delete each
+other's shards.
+
+Usage::
+
+    python -m harness.source_coverage run TC001 TC006 TC017 --reset
+    python -m harness.source_coverage reset            # orchestrator, before the workers
+    python -m harness.source_coverage merge            # shards written by other workers
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+
+from harness import config
+from harness.bundle_coverage import COVERAGE_DIR, CoverageHook, load_source, read_shards
+from harness.runner import find_tcs, run_tcs, tc_id
+from harness.sourcemap import SourceMap, line_starts, merge_ranges, overlap
+
+REPO_DIR = config.TESTS_DIR.parent
+SUMMARY_FILE = COVERAGE_DIR / "coverage-summary.json"
+LINES_FILE = COVERAGE_DIR / "coverage-lines.json"
+LCOV_FILE = COVERAGE_DIR / "lcov.info"
+
+
+def repo_path(source):
+    """``src/...`` path of a source map entry, or ``None`` outside ``src/``."""
+    if "/node_modules/" in source:
+        return None
+    marker = source.find("/src/")
+    return source[marker + 1:].split("?", 1)[0] if marker != -1 else None
+
+
+def merge_records(records):
+    """``{digest: {tc: executed ranges}}`` folded one record at a time."""
+    executed = defaultdict(dict)
+    for record in records:
+        for script in record["scripts"]:
+            per_tc = executed[script["source"]]
+            per_tc[record["tc"]] = merge_ranges(per_tc.get(record["tc"], []) + script["executed"])
+    return executed
+
+
+def line_hits(executed):
+    """``{src file: {line: hits}}`` for every instrumented line (1-based)."""
+    files = defaultdict(dict)
+    for digest, per_tc in executed.items():
+        stored = load_source(digest)
+        if not stored["map"]:
+            continue
+        source_map = SourceMap(stored["map"], stored["url"])
+        paths = [repo_path(source) for source in source_map.sources]
+        spans = [span for span in source_map.spans(line_starts(stored["source"]), len(stored["source"]))
+                 if paths[span[2]]]
+        for _, _, src, line in spans:
+            files[paths[src]].setdefault(line + 1, 0)
+        for ranges in per_tc.values():
+            covered = set()
+            cursor = 0
+            for start, end, src, line in spans:
+                hit, cursor = overlap(ranges, start, end, cursor)
+                if hit:
+                    covered.add((paths[src], line + 1))
+            for path, line in covered:
+                files[path][line] += 1
+    return files
+
+
+def add_unloaded(files):
+    """Every ``src/`` module no page loaded, with its non-blank lines at zero."""
+    for path in sorted((REPO_DIR / "src").rglob("*.ts*")):
+        relative = path.relative_to(REPO_DIR).as_posix()
+        if relative in files or path.suffix not in (".ts", ".tsx") or "__tests__" in relative:
+            continue
+        lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+        files[relative] = {n: 0 for n, text in enumerate(lines, 1)
+                           if text.strip() and not text.strip().startswith(("//", "import "))}
+
+
+def write_lcov(files, path=LCOV_FILE):
+    with open(path, "w", encoding="utf-8") as fh:
+        for name in sorted(files):
+            lines = files[name]
+            fh.write("TN:\nSF:%s\n" % (REPO_DIR / name))
+            for number in sorted(lines):
+                fh.write("DA:%d,%d\n" % (number, lines[number]))
+            fh.write("LF:%d\nLH:%d\nend_of_record\n" % (len(lines), sum(1 for h in lines.values() if h)))
+
+
+def summary_entry(total, covered):
+    return {"lines": {"total": total, "covered": covered, "skipped": 0,
+                      "pct": round(100.0 * covered / total, 2) if total else 100.0}}
+
+
+def summarize_files(files):
+    """Istanbul ``json-summary`` document."""
+    summary = {}
+    for name, lines in sorted(files.items()):
+        summary[name] = summary_entry(len(lines), sum(1 for h in lines.values() if h))
+    summary["total"] = summary_entry(sum(v["lines"]["total"] for v in summary.values()),
+                                     sum(v["lines"]["covered"] for v in summary.values()))
+    return summary
+
+
+def diff(previous, current, previous_lines, current_lines):
+    """Per-file coverage changes between two merges."""
+    changes = []
+    for name in sorted(set(previous) | set(current)):
+        if name == "total":
+            continue
+        before = previous.get(name, {}).get("lines", {}).get("pct")
+        after = current.get(name, {}).get("lines", {}).get("pct")
+        lost = sorted(set(previous_lines.get(name, [])) - set(current_lines.get(name, [])))
+        gained = sorted(set(current_lines.get(name, [])) - set(previous_lines.get(name, [])))
+        if before != after or lost or gained:
+            changes.append({"file": name, "before": before, "after": after, "lost": lost, "gained": gained})
+    return changes
+
+
+def load_json(path, default):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+def merge(args, report=print):
+    files = line_hits(merge_records(read_shards()))
+    if not files:
+        raise SystemExit("No coverage mapped to src/ under %s" % COVERAGE_DIR)
+    if args.all:
+        add_unloaded(files)
+    summary = summarize_files(files)
+    covered_lines = {name: sorted(n for n, h in lines.items() if h) for name, lines in files.items()}
+
+    changes = diff(load_json(SUMMARY_FILE, {}), summary, load_json(LINES_FILE, {}), covered_lines)
+    write_lcov(files)
+    with open(SUMMARY_FILE, "w", encoding="utf-8") as fh:
+        json.dump(summary, fh, indent=2)
+    with open(LINES_FILE, "w", encoding="utf-8") as fh:
+        json.dump(covered_lines, fh)
+
+    total = summary["total"]["lines"]
+    report("src/ lines: %d/%d (%.1f%%) in %d files -> %s" % (
+        total["covered"], total["total"], total["pct"], len(files), LCOV_FILE))
+    for change in changes[:args.top]:
+        report("%-60s %6s -> %6s%%  -%d +%d lines" % (
+            change["file"][-60:], change["before"], change["after"], len(change["lost"]), len(change["gained"])))
+    if len(changes) > args.top:
+        report("... %d more files changed" % (len(changes) - args.top))
+    return {"total": total, "changes": changes}
+
+
+def reset():
+    """Drop the shards of earlier runs; sources and the previous summary are kept."""
+    for shard in COVERAGE_DIR.glob("bundle-*.jsonl"):
+        shard.unlink()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="src/ line coverage from the E2E flows")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="run TCs into this worker's shard, then merge")
+    run.add_argument("tests", nargs="*", help="TC ids; all when omitted")
+    run.add_argument("--reset", action="store_true", help="drop earlier shards first (single process only)")
+    sub.add_parser("reset", help="drop earlier shards, once before parallel workers start")
+    merge_parser = sub.add_parser("merge", help="merge the shards already on disk")
+    for p in (run, merge_parser):
+        p.add_argument("--no-all", dest="all", action="store_false", help="skip src/ files never loaded")
+        p.add_argument("--top", type=int, default=20, help="changed files to list")
+        p.add_argument("--out", default=str(config.output_path("source_coverage.json")))
+    args = parser.parse_args(argv)
+
+    if args.command == "reset":
+        reset()
+        return 0
+    passed = True
+    if args.command == "run":
+        if args.reset:
+            reset()
+        hook = CoverageHook()
+        try:
+            for path in find_tcs(args.tests):
+                hook.tc = tc_id(path)
+                passed = all(r.passed for r in run_tcs([path], [hook])) and passed
+        finally:
+            hook.close()
+    result = merge(args)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, indent=2)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
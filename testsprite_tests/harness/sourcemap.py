@@ -0,0 +1,158 @@
+"""Source map v3 decoding and byte-range helpers for the coverage tools."""
+
+import base64
+import json
+from urllib.parse import unquote, urljoin
+
+BASE64 = {c: i for i, c in enumerate("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/")}
+
+
+def decode_vlq(text):
+    """Integers of one base64 VLQ mapping segment."""
+    values = []
+    value = shift = 0
+    for char in text:
+        digit = BASE64[char]
+        value += (digit & 31) << shift
+        if digit & 32:
+            shift += 5
+            continue
+        values.append(-(value >> 1) if value & 1 else value >> 1)
+        value = shift = 0
+    return values
+
+
+def line_starts(source):
+    """Offset of the first character of every line of ``source``."""
+    starts = [0]
+    position = source.find("\n")
+    while position != -1:
+        starts.append(position + 1)
+        position = source.find("\n", position + 1)
+    return starts
+
+
+def merge_ranges(ranges):
+    """Sorted, non-overlapping ``[start, end]`` list covering ``ranges``."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def range_bytes(ranges):
+    return sum(end - start for start, end in ranges)
+
+
+def executed_ranges(functions):
+    """Offsets V8 block coverage reports as executed, as merged ``[start, end]`` ranges.
+
+    Ranges nest (function > block > sub-block) and the innermost one decides,
+    so a stack walk over ranges sorted outer-first yields the disjoint
+    segments and their counts.
+    """
+    ranges = sorted(
+        ((r["startOffset"], r["endOffset"], r["count"]) for f in functions for r in f["ranges"]),
+        key=lambda r: (r[0], -r[1]),
+    )
+    executed = []
+    stack = []
+    position = 0
+
+    def emit(start, end, count):
+        if count > 0 and end > start:
+            if executed and executed[-1][1] == start:
+                executed[-1][1] = end
+            else:
+                executed.append([start, end])
+
+    for start, end, count in ranges:
+        while stack and stack[-1][0] <= start:
+            top_end, top_count = stack.pop()
+            emit(position, top_end, top_count)
+            position = max(position, top_end)
+        if stack:
+            emit(position, start, stack[-1][1])
+        position = start
+        stack.append((end, count))
+    while stack:
+        top_end, top_count = stack.pop()
+        emit(position, top_end, top_count)
+        position = max(position, top_end)
+    return executed
+
+
+def overlap(ranges, start, end, cursor=0):
+    """Bytes of ``[start, end)`` inside the sorted ``ranges``, and the cursor to resume from.
+
+    Spans are visited in increasing order, so the cursor makes a full sweep linear.
+    """
+    while cursor < len(ranges) and ranges[cursor][1] <= start:
+        cursor += 1
+    covered = 0
+    index = cursor
+    while index < len(ranges) and ranges[index][0] < end:
+        covered += min(end, ranges[index][1]) - max(start, ranges[index][0])
+        index += 1
+    return covered, cursor
+
+
+def load_map(script_url, source_map_url, fetch=None):
+    """Parsed map JSON for a script, or ``None``.
+
+    ``data:`` URLs (Vite dev inlines them) are decoded here; other URLs are
+    resolved against the script and passed to ``fetch(url) -> text``.
+    """
+    if not source_map_url:
+        return None
+    if source_map_url.startswith("data:"):
+        header, _, payload = source_map_url.partition(",")
+        text = base64.b64decode(payload).decode("utf-8") if ";base64" in header else unquote(payload)
+        return json.loads(text)
+    if fetch is None:
+        return None
+    text = fetch(urljoin(script_url, source_map_url))
+    return json.loads(text) if text else None
+
+
+class SourceMap:
+    def __init__(self, data, script_url=""):
+        root = data.get("sourceRoot") or ""
+        self.sources = [urljoin(script_url, root + source) if script_url else root + source
+                        for source in data["sources"]]
+        self.lines = []
+        src = src_line = src_col = 0
+        for line in data["mappings"].split(";"):
+            segments = []
+            col = 0
+            for text in line.split(","):
+                if not text:
+                    continue
+                values = decode_vlq(text)
+                col += values[0]
+                if len(values) >= 4:
+                    src += values[1]
+                    src_line += values[2]
+                    src_col += values[3]
+                    segments.append((col, src, src_line))
+                else:
+                    segments.append((col, None, None))
+            self.lines.append(segments)
+
+    def spans(self, starts, length):
+        """``(start, end, source index, source line)`` for every mapped span of the generated code.
+
+        A span runs to the next segment of its line; the last one runs to the
+        end of the line, so code before the next line's first segment stays
+        unmapped rather than going to the previous line's source.
+        """
+        for number, segments in enumerate(self.lines[:len(starts)]):
+            line_end = starts[number + 1] if number + 1 < len(starts) else length
+            for index, (col, src, src_line) in enumerate(segments):
+                if src is None:
+                    continue
+                end = starts[number] + segments[index + 1][0] if index + 1 < len(segments) else line_end
+                yield starts[number] + col, end, src, src_line
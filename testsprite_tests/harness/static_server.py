@@ -0,0 +1,285 @@
+"""Serve the production build (``dist/``) for TC runs instead of the Vite dev server.
+
+Through the dev server every page load fetches unbundled modules from
+``node_modules/.vite/deps`` with ``?t=`` HMR stamps, so timings say nothing
+about what customers download. :class:`StaticServer` is a small asyncio
+HTTP/1.1 server, run on its own thread next to the TCs, that serves
+``npm run build`` output the way a CDN would:
+
+* ``br`` / ``gzip`` by ``Accept-Encoding``, using precompressed ``.br`` /
+  ``.gz`` siblings when the build wrote them, otherwise compressing once
+  and caching (``br`` on the fly needs the optional ``brotli`` package);
+* ``Cache-Control: immutable`` for the hashed files under ``/assets/``,
+  ``no-cache`` plus ``ETag`` for ``index.html``;
+* SPA fallback: unknown paths without a file extension get ``index.html``.
+
+The TCs hard-code ``http://localhost:8084/``, so ``python -m harness.runner
+--dist`` binds the server to :data:`config.BASE_URL`'s host and port
+(:meth:`StaticServer.at`) and the browser reaches it natively, HTTP cache
+and 304s included. The dev server must be stopped first; a busy port is an
+error. ``--dist-route`` is the fallback when it cannot be stopped: the
+server listens on 4173 and :class:`DistHook` reroutes the TCs' requests
+with ``context.route``. Playwright disables the HTTP cache while routing is
+on and every request goes through the driver, so those timings overstate
+repeat visits. Harness scenarios can point ``HARNESS_BASE_URL`` at a
+standalone server instead.
+
+Usage::
+
+    npm run build
+    python -m harness.runner --dist TC004 TC005
+    python -m harness.static_server --port 4173      # standalone
+"""
+
+import argparse
+import asyncio
+import email.utils
+import gzip
+import mimetypes
+import sys
+import threading
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from harness import config
+from harness.runner import ContextHook
+
+try:
+    import brotli
+except ImportError:  # precompressed .br files are still served
+    brotli = None
+
+DIST_DIR = config.TESTS_DIR.parent / "dist"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+MIN_COMPRESS_BYTES = 1024
+
+mimetypes.add_type("application/javascript", ".js")
+mimetypes.add_type("application/javascript", ".mjs")
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("font/woff2", ".woff2")
+
+REASONS = {200: "OK", 304: "Not Modified", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+def accepted_encodings(header):
+    return {part.split(";", 1)[0].strip() for part in (header or "").split(",") if part.strip()}
+
+
+class StaticServer:
+    def __init__(self, root=DIST_DIR, host="127.0.0.1", port=4173):
+        self.root = Path(root).resolve()
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.bytes_sent = 0
+        self._compressed = {}
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    @classmethod
+    def at(cls, url, root=DIST_DIR):
+        """A server bound to the host and port of ``url``."""
+        parts = urlsplit(url)
+        return cls(root, parts.hostname or "127.0.0.1", parts.port or 80)
+
+    @property
+    def base_url(self):
+        return "http://%s:%d/" % (self.host, self.port)
+
+    def resolve(self, path):
+        """File for a URL path and whether it came from the SPA fallback."""
+        target = (self.root / unquote(path).lstrip("/")).resolve()
+        if target != self.root and self.root not in target.parents:
+            return None, False
+        if target.is_dir():
+            target = target / "index.html"
+        if target.is_file():
+            return target, False
+        if "." not in path.rsplit("/", 1)[-1]:
+            return self.root / "index.html", True
+        return None, False
+
+    def encoded(self, target, encoding, content_type):
+        """Body of ``target`` in ``encoding`` (``None`` when not available)."""
+        sibling = target.with_name(target.name + {"br": ".br", "gzip": ".gz"}[encoding])
+        if sibling.is_file():
+            return sibling.read_bytes()
+        if not content_type.startswith(COMPRESSIBLE) or target.stat().st_size < MIN_COMPRESS_BYTES:
+            return None
+        if encoding == "br" and brotli is None:
+            return None
+        key = (target, encoding, target.stat().st_mtime_ns)
+        if key not in self._compressed:
+            raw = target.read_bytes()
+            self._compressed[key] = brotli.compress(raw) if encoding == "br" else gzip.compress(raw, 6)
+        return self._compressed[key]
+
+    def respond(self, method, path, headers):
+        """``(status, headers, body)`` for one request."""
+        if method not in ("GET", "HEAD"):
+            return 405, {"Allow": "GET, HEAD"}, b""
+        target, fallback = self.resolve(path)
+        if target is None or not target.is_file():
+            return 404, {"Content-Type": "text/plain"}, b"not found"
+        stat = target.stat()
+        etag = '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+        content_type = mimetypes.guess_type(target.name)[0] or "application/octet-stream"
+        out = {
+            "Content-Type": content_type,
+            "ETag": etag,
+            "Last-Modified": email.utils.formatdate(stat.st_mtime, usegmt=True),
+            "Vary": "Accept-Encoding",
+        }
+        # Vite puts hashed bundles under /assets/; everything else may change between builds
+        if not fallback and path.startswith("/assets/"):
+            out["Cache-Control"] = IMMUTABLE
+        elif target.name == "index.html":
+            out["Cache-Control"] = "no-cache"
+        else:
+            out["Cache-Control"] = "public, max-age=3600"
+        if headers.get("if-none-match") == etag:
+            return 304, out, b""
+        body = None
+        accepted = accepted_encodings(headers.get("accept-encoding"))
+        for encoding in ("br", "gzip"):
+            if encoding in accepted:
+                body = self.encoded(target, encoding, content_type)
+                if body is not None:
+                    out["Content-Encoding"] = encoding
+                    break
+        if body is None:
+            body = target.read_bytes()
+        return 200, out, body
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                status, out, body = self.respond(method, urlsplit(target).path, headers)
+                out["Content-Length"] = str(len(body))
+                out["Date"] = email.utils.formatdate(usegmt=True)
+                head = "HTTP/1.1 %d %s\r\n%s\r\n\r\n" % (
+                    status, REASONS[status], "\r\n".join("%s: %s" % item for item in out.items()))
+                writer.write(head.encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                self.requests += 1
+                self.bytes_sent += len(head) + (len(body) if method != "HEAD" else 0)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Serve on the current loop until cancelled."""
+        await self._bind()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start(self):
+        """Serve from a daemon thread (the TCs run their own event loops)."""
+        ready = threading.Event()
+        failed = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self._bind())
+            except BaseException as exc:
+                failed.append(exc)
+                ready.set()
+                return
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="static-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if failed:
+            self._loop.close()
+            self._loop = None
+            raise failed[0]
+        return self
+
+    async def _bind(self):
+        if not (self.root / "index.html").is_file():
+            raise SystemExit("%s has no index.html; run `npm run build` first" % self.root)
+        try:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        except OSError as exc:
+            raise SystemExit("cannot listen on %s:%d (%s); stop the dev server using it, or run with "
+                             "--dist-route" % (self.host, self.port, exc.strerror or exc)) from exc
+
+    def stop(self):
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class DistHook(ContextHook):
+    """Send the TCs' requests for :data:`config.BASE_URL` to the static server.
+
+    Fallback only: routing turns off the browser's HTTP cache.
+    """
+
+    def __init__(self, server):
+        self.base = config.BASE_URL.rstrip("/") + "/"
+        self.target = server.base_url
+
+    async def on_context(self, context):
+        await context.route(self.base + "**", self._route)
+
+    async def _route(self, route, request):
+        await route.continue_(url=self.target + request.url[len(self.base):])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve dist/ like production")
+    parser.add_argument("--root", default=str(DIST_DIR))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4173)
+    args = parser.parse_args(argv)
+
+    server = StaticServer(args.root, args.host, args.port)
+    print("serving %s on %s (brotli %s)" % (server.root, server.base_url, "on" if brotli else "precompressed only"))
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    print("%d requests, %.1f KiB sent" % (server.requests, server.bytes_sent / 1024))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
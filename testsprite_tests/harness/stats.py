@@ -0,0 +1,93 @@
+"""Small summary-statistics helpers used by the measurement tools."""
+
+import math
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of ``values`` (``pct`` in 0..100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return ordered[low]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values):
+    """Count, mean and p50/p95/p99/max of a list of samples."""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def format_summary(summary, unit="ms"):
+    """One-line rendering of :func:`summarize` output."""
+    if not summary.get("count"):
+        return "n=0"
+    return "n={count} p50={p50:.1f}{u} p95={p95:.1f}{u} p99={p99:.1f}{u} max={max:.1f}{u}".format(
+        u=unit, **summary
+    )
+
+
+def linear_fit(xs, ys):
+    """Least-squares ``(slope, intercept, r2)`` of ``ys`` over ``xs``."""
+    n = len(xs)
+    if n < 2:
+        return 0.0, (ys[0] if ys else 0.0), 0.0
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    syy = sum((y - mean_y) ** 2 for y in ys)
+    slope = sxy / sxx if sxx else 0.0
+    r2 = (sxy * sxy) / (sxx * syy) if sxx and syy else 0.0
+    return slope, mean_y - slope * mean_x, r2
+
+
+def mann_whitney_u(xs, ys):
+    """Mann-Whitney U of ``ys`` against ``xs`` and the one-sided p-value that ``ys`` tends to be larger.
+
+    Normal approximation with tie and continuity corrections; fine from
+    about five samples per side.
+    """
+    n1, n2 = len(xs), len(ys)
+    if not n1 or not n2:
+        return 0.0, 1.0
+    pooled = sorted([(v, 0) for v in xs] + [(v, 1) for v in ys])
+    rank_sum = 0.0
+    ties = 0.0
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        average = (i + j) / 2.0 + 1
+        rank_sum += average * sum(1 for k in range(i, j + 1) if pooled[k][1])
+        ties += (j - i + 1) ** 3 - (j - i + 1)
+        i = j + 1
+    u = rank_sum - n2 * (n2 + 1) / 2.0
+    n = n1 + n2
+    variance = n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return u, 1.0
+    z = (u - n1 * n2 / 2.0 - 0.5) / math.sqrt(variance)
+    return u, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def cliffs_delta(xs, ys):
+    """P(y > x) - P(y < x) over all pairs, in [-1, 1]; 0.33 is a medium effect, 0.47 large."""
+    if not xs or not ys:
+        return 0.0
+    greater = sum(1 for x in xs for y in ys if y > x)
+    smaller = sum(1 for x in xs for y in ys if y < x)
+    return (greater - smaller) / float(len(xs) * len(ys))
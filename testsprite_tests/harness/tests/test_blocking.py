@@ -0,0 +1,50 @@
+import argparse
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from harness import config  # noqa: E402
+from harness.blocking import PROFILES, Profile, profile_for, size_key  # noqa: E402
+
+APP = config.url("/assets/index-abc.js")
+LOGO = config.url("/capa-home.webp")
+SUPABASE = config.SUPABASE_URL.rstrip("/") + "/rest/v1/products?select=*"
+FONT = "https://fonts.gstatic.com/s/inter/v13/inter.woff2"
+ANALYTICS = "https://www.googletagmanager.com/gtag/js?id=G-X"
+
+
+@pytest.mark.parametrize("url, resource_type, reason", [
+    (APP, "script", None),
+    (SUPABASE, "fetch", None),
+    (LOGO, "image", "image"),
+    (FONT, "font", "font"),
+    (ANALYTICS, "script", "third-party"),
+])
+def test_functional_profile(url, resource_type, reason):
+    assert PROFILES["functional"].blocks(url, resource_type) == reason
+
+
+def test_visual_profile_blocks_nothing():
+    assert PROFILES["visual"].blocks(ANALYTICS, "script") is None
+    assert PROFILES["visual"].blocks(LOGO, "image") is None
+
+
+def test_allow_wins_over_deny_and_type():
+    profile = Profile("custom", frozenset({"image"}), allow=["*/capa-home.webp"], deny=["*.webp", "*/assets/*"])
+    assert profile.blocks(LOGO, "image") is None
+    assert profile.blocks(APP, "script") == "deny"
+
+
+def test_profile_for_uses_tc_default_and_adds_patterns():
+    args = argparse.Namespace(profile=None, allow=["*/capa-home.webp"], deny=[])
+    assert profile_for("TC004", args).name == "visual"
+    functional = profile_for("TC017", args)
+    assert functional.name == "functional" and functional.allow == ["*/capa-home.webp"]
+    assert PROFILES["functional"].allow == []
+    args.profile = "functional"
+    assert profile_for("TC004", args).name == "functional"
+
+
+def test_size_key_drops_cache_busters():
+    assert size_key(config.url("/src/main.tsx?t=1712345")) == config.url("/src/main.tsx")
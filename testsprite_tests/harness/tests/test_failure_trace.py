@@ -0,0 +1,69 @@
+import asyncio
+from collections import deque
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from harness.failure_trace import Ring, RingTraceHook  # noqa: E402
+
+
+class Tracing:
+    def __init__(self):
+        self.chunks = []
+
+    async def stop_chunk(self, path):
+        self.chunks.append(path)
+        with open(path, "wb") as fh:
+            fh.write(b"zip")
+
+    async def start_chunk(self):
+        pass
+
+
+class Context:
+    def __init__(self):
+        self.tracing = Tracing()
+
+
+class Page:
+    def __init__(self, context):
+        self.context = context
+
+
+def hook_with_ring(tmp_path, steps=2):
+    hook = RingTraceHook(steps, ring_dir=tmp_path)
+    context = Context()
+    hook.rings[context] = Ring(0, steps=deque(maxlen=steps))
+    return hook, hook.rings[context], Page(context)
+
+
+async def step(hook, page, description, fails=False):
+    await hook._before_step(page, description)
+    if not fails:
+        await hook._after_step(page, description)
+
+
+def test_failed_step_is_the_last_recorded(tmp_path):
+    hook, ring, page = hook_with_ring(tmp_path, steps=3)
+
+    async def scenario():
+        await step(hook, page, "fill #email")
+        await step(hook, page, "click text=Finalizar Pedido", fails=True)
+
+    asyncio.run(scenario())
+    assert list(ring.steps) == ["fill #email", "click text=Finalizar Pedido"]
+    assert ring.count == 1
+
+
+def test_chunks_rotate_on_completed_steps(tmp_path):
+    hook, ring, page = hook_with_ring(tmp_path, steps=2)
+
+    async def scenario():
+        for n in range(7):
+            await step(hook, page, "click #b%d" % n)
+
+    asyncio.run(scenario())
+    assert ring.count == 7 and hook.rotations == 3
+    assert len(ring.chunks) == 2 and all(p.exists() for p in ring.chunks)
+    assert list(ring.steps) == ["click #b5", "click #b6"]
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from playwright.async_api import Error  # noqa: E402
+
+from harness import leak_soak  # noqa: E402
+
+
+class FlakyPage:
+    """Page whose navigation fails ``goto_failures`` times."""
+
+    def __init__(self, goto_failures=0):
+        self.goto_failures = goto_failures
+        self.gotos = 0
+
+    async def goto(self, url):
+        self.gotos += 1
+        if self.gotos <= self.goto_failures:
+            raise Error("net::ERR_CONNECTION_RESET")
+
+    def locator(self, selector):
+        return self
+
+    @property
+    def first(self):
+        return self
+
+    async def wait_for(self, **kwargs):
+        pass
+
+
+@pytest.fixture
+def failing_iteration(monkeypatch):
+    async def iteration(page):
+        raise Error("Timeout 30000ms exceeded.\nwaiting for locator")
+
+    monkeypatch.setattr(leak_soak, "iteration", iteration)
+
+
+def test_error_is_recorded_and_page_reloaded(failing_iteration):
+    page, errors = FlakyPage(), []
+    assert asyncio.run(leak_soak.soak_iteration(page, 7, errors, max_errors=5))
+    assert errors == [{"iteration": 7, "error": "Timeout 30000ms exceeded."}]
+    assert page.gotos == 1
+
+
+def test_failed_reload_does_not_raise(failing_iteration):
+    page, errors = FlakyPage(goto_failures=1), []
+    assert asyncio.run(leak_soak.soak_iteration(page, 3, errors, max_errors=5))
+    assert [e["error"] for e in errors] == ["Timeout 30000ms exceeded.", "reload: net::ERR_CONNECTION_RESET"]
+
+
+def test_stops_past_max_errors(failing_iteration):
+    errors = [{"iteration": 1, "error": "x"}]
+    assert not asyncio.run(leak_soak.soak_iteration(FlakyPage(), 2, errors, max_errors=1))
@@ -0,0 +1,48 @@
+import argparse
+import asyncio
+import re
+
+import pytest
+
+pytest.importorskip("asyncpg")
+
+from harness import lock_bench  # noqa: E402
+from harness.lock_bench import SQL, order_values  # noqa: E402
+
+
+@pytest.mark.parametrize("path", sorted(SQL))
+def test_every_placeholder_is_bound(path):
+    placeholders = {int(n) for n in re.findall(r"\$(\d+)", SQL[path])}
+    values = order_values(path, "tag", "bench-lock-tag-0000000001", "00000000-0000-0000-0000-000000000001")
+    assert placeholders == set(range(1, len(values) + 1))
+
+
+def test_reserve_has_no_payment_id():
+    values = order_values("reserve", "tag", "bench-lock-tag-0000000001", "p")
+    assert not any(str(v).startswith("bench-pay-") for v in values)
+
+
+class BudgetConnection:
+    def __init__(self, free):
+        self.free = free
+        self.closed = False
+
+    async def fetchval(self, sql):
+        return self.free
+
+    async def close(self):
+        self.closed = True
+
+
+def test_levels_above_free_connections_are_skipped(monkeypatch):
+    conn = BudgetConnection(96)
+
+    async def connect(dsn=None):
+        return conn
+
+    monkeypatch.setattr(lock_bench.db, "connect", connect)
+    args = argparse.Namespace(dsn=None, levels=[1, 64, 128, 256])
+    messages = []
+    assert asyncio.run(lock_bench.usable_levels(args, messages.append)) == [1, 64]
+    assert conn.closed
+    assert messages == ["warning: only 96 connections free (max_connections); skipping levels 128 256"]
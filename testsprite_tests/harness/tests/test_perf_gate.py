@@ -0,0 +1,77 @@
+import argparse
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from harness.perf_gate import compare, gated, holm, min_detectable_p  # noqa: E402
+
+
+def args(**overrides):
+    values = dict(alpha=0.05, min_effect=0.33, threshold=0.10, min_ms=50.0, min_count=1.0, min_samples=5)
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def significant(ps, alpha=0.05):
+    rows = [{"p": p} for p in ps]
+    holm(rows, alpha)
+    return [row["significant"] for row in rows]
+
+
+def test_holm_step_down():
+    # .001 <= .05/3, .012 <= .05/2, .02 <= .05/1 (Bonferroni would reject .02 > .05/3)
+    assert significant([0.012, 0.02, 0.001]) == [True, True, True]
+
+
+def test_holm_stops_at_first_failure():
+    # .001 <= .05/3; .03 > .05/2 stops the procedure, so .04 fails although .04 <= .05
+    assert significant([0.04, 0.001, 0.03]) == [False, True, False]
+
+
+def test_holm_nothing_significant():
+    assert significant([0.02, 0.03], alpha=0.01) == [False, False]
+
+
+def test_gated_metrics():
+    assert gated("duration_ms") and gated("lcp /loja") and gated("api_requests")
+    assert not gated("step07")
+
+
+def test_min_detectable_p_seven_runs():
+    assert min_detectable_p(7, 7) == pytest.approx(0.0010825, rel=1e-4)
+
+
+def scenario(metrics, labels=None):
+    return {"metrics": metrics, "labels": labels or {}}
+
+
+def test_compare_flags_only_gated_regressions():
+    base = {"metrics": {
+        "duration_ms": {"samples": [1000, 1010, 990, 1005, 995, 1002, 998]},
+        "step01": {"samples": [100, 101, 99, 100, 102, 98, 100], "label": "click #buy"},
+        "requests": {"samples": [40, 40, 41, 40, 40, 41, 40]},
+    }}
+    current = scenario({
+        "duration_ms": [1300, 1310, 1290, 1305, 1295, 1302, 1298],
+        "step01": [400, 401, 399, 400, 402, 398, 400],
+        "requests": [40, 41, 40, 40, 40, 41, 40],
+    }, {"step01": "click #buy"})
+    rows, skipped = compare(base, current, args())
+    by_metric = {row["metric"]: row for row in rows}
+    assert by_metric["duration_ms"]["regression"]
+    assert not by_metric["requests"]["regression"]
+    assert not by_metric["step01"]["regression"] and by_metric["step01"]["slower"]
+    assert skipped == []
+
+
+def test_compare_skips_changed_steps_and_small_samples():
+    base = {"metrics": {
+        "step01": {"samples": [1, 2, 3, 4, 5], "label": "click #old"},
+        "duration_ms": {"samples": [1, 2, 3]},
+    }}
+    current = scenario({"step01": [1, 2, 3, 4, 5], "duration_ms": [1, 2, 3, 4, 5], "lcp /": [1] * 5},
+                       {"step01": "click #new"})
+    rows, skipped = compare(base, current, args())
+    assert rows == []
+    assert sorted(s["metric"] for s in skipped) == ["duration_ms", "lcp /", "step01"]
@@ -0,0 +1,14 @@
+import pytest
+
+pytest.importorskip("playwright")
+
+from harness import source_coverage  # noqa: E402
+
+
+def test_reset_keeps_sources_and_summary(tmp_path, monkeypatch):
+    monkeypatch.setattr(source_coverage, "COVERAGE_DIR", tmp_path)
+    (tmp_path / "sources").mkdir()
+    for name in ("bundle-101.jsonl", "bundle-202.jsonl", "coverage-summary.json", "sources/abc.js"):
+        (tmp_path / name).write_text("{}")
+    source_coverage.main(["reset"])
+    assert sorted(p.name for p in tmp_path.rglob("*") if p.is_file()) == ["abc.js", "coverage-summary.json"]
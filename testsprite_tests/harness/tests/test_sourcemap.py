@@ -0,0 +1,97 @@
+import base64
+import json
+
+import pytest
+
+from harness.sourcemap import (
+    SourceMap, decode_vlq, executed_ranges, line_starts, load_map, merge_ranges, overlap,
+)
+
+
+@pytest.mark.parametrize("segment, values", [
+    ("AAAA", [0, 0, 0, 0]),
+    ("AACA", [0, 0, 1, 0]),
+    ("IAAM", [4, 0, 0, 6]),
+    ("D", [-1]),
+    ("gB", [16]),
+    ("2H", [123]),
+    ("3H", [-123]),
+    ("uBAAoC", [23, 0, 0, 36]),
+])
+def test_decode_vlq(segment, values):
+    assert decode_vlq(segment) == values
+
+
+def test_line_starts():
+    assert line_starts("ab\n\ncd") == [0, 3, 4]
+    assert line_starts("") == [0]
+
+
+def test_merge_ranges():
+    assert merge_ranges([[20, 30], [0, 10], [5, 12], [30, 35]]) == [[0, 12], [20, 35]]
+
+
+def ranges(*triples):
+    return [{"startOffset": s, "endOffset": e, "count": c} for s, e, c in triples]
+
+
+@pytest.mark.parametrize("functions, executed", [
+    # script body ran, one block inside it never did
+    ([{"ranges": ranges((0, 100, 1), (10, 20, 0))}], [[0, 10], [20, 100]]),
+    # nested: a hot block with a zero-count child
+    ([{"ranges": ranges((0, 100, 1), (10, 20, 0), (50, 80, 2), (60, 70, 0))}], [[0, 10], [20, 60], [70, 100]]),
+    # a function never called, reported as its own entry
+    ([{"ranges": ranges((0, 100, 1))}, {"ranges": ranges((30, 40, 0))}], [[0, 30], [40, 100]]),
+    # nothing ran
+    ([{"ranges": ranges((0, 50, 0))}], []),
+    # adjacent executed segments are joined
+    ([{"ranges": ranges((0, 10, 1), (10, 20, 3))}], [[0, 20]]),
+])
+def test_executed_ranges(functions, executed):
+    assert executed_ranges(functions) == executed
+
+
+def test_overlap_cursor():
+    covered = [[0, 10], [20, 30], [40, 50]]
+    assert overlap(covered, 5, 25) == (10, 0)
+    assert overlap(covered, 25, 45, 0) == (10, 1)
+    assert overlap(covered, 45, 100, 1) == (5, 2)
+    assert overlap(covered, 60, 70, 2) == (0, 3)
+
+
+SOURCE = "let x = 1;\nfoo();\n    bar();"
+
+
+def spans(mappings, names=("src/a.ts",)):
+    source_map = SourceMap({"version": 3, "sources": list(names), "mappings": mappings})
+    return list(source_map.spans(line_starts(SOURCE), len(SOURCE)))
+
+
+def test_spans_within_and_across_lines():
+    assert spans("AAAA,IAAI;AACA") == [(0, 4, 0, 0), (4, 11, 0, 0), (11, 18, 0, 1)]
+
+
+def test_last_span_runs_to_end_of_line():
+    # line 2 starts mapping at column 4: its indentation is not attributed to line 0
+    assert spans("AAAA;;IAEA") == [(0, 11, 0, 0), (22, 28, 0, 2)]
+
+
+def test_unmapped_segment_ends_span():
+    assert spans("AAAA,E;AACA") == [(0, 2, 0, 0), (11, 18, 0, 1)]
+
+
+def test_source_index_and_root():
+    source_map = SourceMap({"sources": ["a.ts", "b.ts"], "sourceRoot": "src/", "mappings": "AAAA,ECAA"},
+                           "http://localhost:8084/assets/index.js")
+    assert source_map.sources == ["http://localhost:8084/assets/src/a.ts", "http://localhost:8084/assets/src/b.ts"]
+    assert list(source_map.spans([0], 10)) == [(0, 2, 0, 0), (2, 10, 1, 0)]
+
+
+def test_load_map_inline_and_fetched():
+    data = {"version": 3, "sources": ["a.ts"], "mappings": "AAAA"}
+    inline = "data:application/json;base64," + base64.b64encode(json.dumps(data).encode()).decode()
+    assert load_map("http://h/a.js", inline) == data
+    fetched = []
+    assert load_map("http://h/assets/a.js", "a.js.map", lambda url: fetched.append(url) or json.dumps(data)) == data
+    assert fetched == ["http://h/assets/a.js.map"]
+    assert load_map("http://h/a.js", None) is None
@@ -0,0 +1,52 @@
+import gzip
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from harness.static_server import IMMUTABLE, StaticServer  # noqa: E402
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_text("<html></html>")
+    (tmp_path / "assets" / "index-abc123.js").write_text("console.log(1);\n" * 200)
+    (tmp_path / "favicon.ico").write_bytes(b"\0" * 10)
+    return StaticServer(tmp_path, "127.0.0.1", 0)
+
+
+def test_hashed_asset_is_immutable_and_gzipped(server):
+    status, headers, body = server.respond("GET", "/assets/index-abc123.js", {"accept-encoding": "gzip, deflate"})
+    assert status == 200
+    assert headers["Cache-Control"] == IMMUTABLE
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body) == b"console.log(1);\n" * 200
+
+
+def test_index_revalidates_with_etag(server):
+    status, headers, _ = server.respond("GET", "/", {})
+    assert (status, headers["Cache-Control"]) == (200, "no-cache")
+    status, _, body = server.respond("GET", "/", {"if-none-match": headers["ETag"]})
+    assert (status, body) == (304, b"")
+
+
+def test_spa_fallback_only_without_extension(server):
+    status, headers, body = server.respond("GET", "/loja/produto", {})
+    assert (status, body, headers["Cache-Control"]) == (200, b"<html></html>", "no-cache")
+    assert server.respond("GET", "/assets/missing.js", {})[0] == 404
+
+
+def test_small_files_and_other_methods(server):
+    status, headers, _ = server.respond("GET", "/favicon.ico", {"accept-encoding": "gzip"})
+    assert status == 200 and "Content-Encoding" not in headers
+    assert server.respond("POST", "/", {})[0] == 405
+
+
+def test_path_traversal_is_rejected(server):
+    assert server.respond("GET", "/../secret.txt", {})[0] == 404
+
+
+def test_at_uses_host_and_port_of_url(tmp_path):
+    server = StaticServer.at("http://localhost:8084/", root=tmp_path)
+    assert (server.host, server.port, server.base_url) == ("localhost", 8084, "http://localhost:8084/")
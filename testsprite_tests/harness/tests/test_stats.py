@@ -0,0 +1,56 @@
+import math
+
+import pytest
+
+from harness.stats import cliffs_delta, linear_fit, mann_whitney_u, percentile
+
+# Reference p-values: scipy.stats.mannwhitneyu(ys, xs, alternative="greater",
+# method="asymptotic", use_continuity=True)
+MANN_WHITNEY_CASES = [
+    # complete separation, current slower
+    ([1, 2, 3, 4, 5, 6, 7], [8, 9, 10, 11, 12, 13, 14], 49.0, 0.0010825146665191878),
+    # reversed direction
+    ([8, 9, 10, 11, 12, 13, 14], [1, 2, 3, 4, 5, 6, 7], 0.0, 0.9992993492095199),
+    # ties across both samples
+    ([1, 2, 2, 3, 3, 3, 4], [2, 3, 3, 4, 4, 5, 5], 38.0, 0.04301815719753675),
+    # overlapping, unequal sizes
+    ([100, 102, 98, 101, 99], [101, 103, 99, 100, 104, 102], 22.0, 0.11552274413575647),
+]
+
+
+@pytest.mark.parametrize("xs, ys, u, p", MANN_WHITNEY_CASES)
+def test_mann_whitney_matches_reference(xs, ys, u, p):
+    got_u, got_p = mann_whitney_u(xs, ys)
+    assert got_u == u
+    assert got_p == pytest.approx(p, rel=1e-9)
+
+
+def test_mann_whitney_all_ties_is_never_significant():
+    assert mann_whitney_u([10.0] * 6, [10.0] * 5) == (15.0, 1.0)
+
+
+def test_mann_whitney_empty_side():
+    assert mann_whitney_u([], [1, 2]) == (0.0, 1.0)
+
+
+@pytest.mark.parametrize("xs, ys, delta", [
+    ([1, 2, 3], [4, 5, 6], 1.0),
+    ([4, 5, 6], [1, 2, 3], -1.0),
+    ([5, 5], [5, 5, 5], 0.0),
+    ([1, 2, 3], [2, 3, 4], 5 / 9),
+    ([], [1], 0.0),
+])
+def test_cliffs_delta(xs, ys, delta):
+    assert cliffs_delta(xs, ys) == pytest.approx(delta)
+
+
+def test_percentile_interpolates():
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+def test_linear_fit_exact_line():
+    slope, intercept, r2 = linear_fit([0, 1, 2, 3], [1, 3, 5, 7])
+    assert (slope, intercept) == (2.0, 1.0)
+    assert math.isclose(r2, 1.0)
@@ -0,0 +1,60 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+pytest.importorskip("playwright")
+
+from harness import visual  # noqa: E402
+
+
+def white(height=20, width=20):
+    return np.full((height, width, 3), 255, dtype=np.uint8)
+
+
+def test_identical_frames():
+    counts, diff, aliased = visual.compare(white(), white())
+    assert counts == {"diff_pixels": 0, "aa_pixels": 0, "total_pixels": 400}
+    assert not diff.any() and not aliased.any()
+
+
+def test_changed_block_counts_as_diff():
+    current = white()
+    current[8:12, 8:12] = (220, 0, 0)
+    counts, diff, _ = visual.compare(white(), current)
+    assert counts["diff_pixels"] == 16 and counts["aa_pixels"] == 0
+    assert diff[8:12, 8:12].all()
+
+
+def test_below_threshold_is_ignored():
+    current = white()
+    current[0, 0] = (250, 250, 250)
+    assert visual.compare(white(), current)[0]["diff_pixels"] == 0
+
+
+def test_ignored_region():
+    current = white()
+    current[8:12, 8:12] = 0
+    counts, _, _ = visual.compare(white(), current, ignore=[(6, 6, 10, 10)])
+    assert counts["diff_pixels"] == 0
+
+
+def test_one_pixel_edge_shift_is_anti_aliasing():
+    base, current = white(), white()
+    base[:, :10] = 0
+    current[:, :11] = 0
+    counts, diff, aliased = visual.compare(base, current)
+    assert counts["diff_pixels"] == 0
+    assert counts["aa_pixels"] == 20 and aliased[:, 10].all()
+
+
+def test_size_change_counts_outside_area():
+    counts, _, _ = visual.compare(white(20, 20), white(25, 20))
+    assert counts == {"diff_pixels": 100, "aa_pixels": 0, "total_pixels": 500}
+
+
+def test_store_is_content_addressed(tmp_path, monkeypatch):
+    monkeypatch.setattr(visual, "OBJECTS_DIR", tmp_path)
+    first = visual.store(b"png bytes")
+    assert visual.store(b"png bytes") == first
+    assert visual.object_path(first).read_bytes() == b"png bytes"
+    assert visual.object_path(first).parent.name == first[:2]
@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("playwright")
+
+from harness.watch import affected_tcs, changed_files  # noqa: E402
+
+FEATURES = {
+    "Checkout": ["src/pages/Checkout.tsx", "src/components/checkout/PixPayment.tsx"],
+    "Autenticação": ["src/pages/Auth.tsx"],
+    "Sem TCs": ["src/lib/unused.ts"],
+}
+
+
+@pytest.mark.parametrize("paths, tcs", [
+    (["testsprite_tests/TC005_Add_and_Remove_Items_in_Cart.py"], {"TC005"}),
+    (["src/pages/Auth.tsx"], {"TC001", "TC002", "TC003", "TC013"}),
+    # not listed: features with a file in the same directory
+    (["src/components/checkout/CustomerForm.tsx"], {"TC005", "TC006", "TC007", "TC017"}),
+    # nothing matches: the fallback
+    (["src/hooks/useRealtime.ts"], {"TC001"}),
+    # a feature with no TCs does not trigger the fallback
+    (["src/lib/unused.ts"], set()),
+    (["src/pages/Auth.tsx", "testsprite_tests/TC012_UI_Responsiveness_Across_Devices.py"],
+     {"TC001", "TC002", "TC003", "TC012", "TC013"}),
+])
+def test_affected_tcs(paths, tcs):
+    assert affected_tcs(paths, FEATURES, ["TC001"]) == tcs
+
+
+def test_changed_files():
+    before = {"a.ts": 1, "b.ts": 2, "c.ts": 3}
+    after = {"a.ts": 1, "b.ts": 5, "d.ts": 4}
+    assert changed_files(before, after) == ["b.ts", "c.ts", "d.ts"]
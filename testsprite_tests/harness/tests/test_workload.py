@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from harness.workload import SERVER_WORKLOAD, WorkloadRecorder, load_workload, parse_request  # noqa: E402
+
+REST = "http://127.0.0.1:54321/rest/v1/"
+
+
+def test_parse_request():
+    shape = parse_request("get", REST + "orders?select=*,order_items(*)&user_id=eq.u1&status=in.(paid,pending)"
+                                        "&created_at=gte.2025-01-01&order=created_at.desc&limit=20"
+                                        "&payment_status=not.eq.failed&order_items.product_id=eq.p1")
+    assert (shape.method, shape.table, shape.limit) == ("GET", "orders", 20)
+    assert shape.equality == [("user_id", "u1"), ("status", "(paid,pending)")]
+    assert shape.ranges == [("created_at", "gte", "2025-01-01")]
+    assert shape.order == [("created_at", "desc")]
+    assert shape.key() == ("orders", ("status", "user_id"), (("created_at", "gte"),), (("created_at", "desc"),))
+
+
+def test_parse_request_ignores_rpc_and_other_urls():
+    assert parse_request("POST", REST + "rpc/create_order_with_lock") is None
+    assert parse_request("GET", "http://localhost:8084/loja") is None
+
+
+def write_workload(path, urls):
+    with open(path, "w", encoding="utf-8") as fh:
+        for url in urls:
+            fh.write(json.dumps({"tc": "TC004", "ts": 0, "method": "GET", "url": url}) + "\n")
+
+
+def test_server_lookups_are_weighted(tmp_path):
+    path = tmp_path / "workload.jsonl"
+    write_workload(path, [REST + "products?select=*&category=eq.camisetas"] * 3)
+    assert len(load_workload(path, include_server=False)) == 3
+    assert len(load_workload(path)) == 3 + len(SERVER_WORKLOAD)
+    assert len(load_workload(path, server_weight=4)) == 3 + 4 * len(SERVER_WORKLOAD)
+
+
+class Request:
+    method = "GET"
+
+    def __init__(self, url):
+        self.url = url
+
+
+def record(path, append):
+    recorder = WorkloadRecorder(path, append)
+    recorder._on_request(Request(REST + "products?select=*"))
+    recorder._on_request(Request("http://localhost:8084/assets/index.js"))
+    recorder.close()
+    return path.read_text().splitlines()
+
+
+def test_recorder_truncates_unless_appending(tmp_path):
+    path = tmp_path / "workload.jsonl"
+    assert len(record(path, append=False)) == 1
+    assert len(record(path, append=False)) == 1
+    assert len(record(path, append=True)) == 2
@@ -0,0 +1,176 @@
+"""Run TCs as a mid-range phone: device descriptor + CPU and network throttling.
+
+TC012 "checks mobile" by scrolling a 1280x720 window. A :class:`Profile`
+combines a Playwright device descriptor (viewport, DPR, touch, user agent),
+CDP CPU throttling (``Emulation.setCPUThrottlingRate``) and network
+emulation (``Network.emulateNetworkConditions``). :class:`ThrottleHook`
+applies it to every context and page of any TC and records the navigation
+timing of each page load.
+
+Each profile writes its own ``tmp/harness/throttling-<profile>.json``, and a
+TC x profile table of durations is printed at the end.
+
+Usage::
+
+    python -m harness.throttling TC006 TC017 --profiles desktop midrange-android lowend-android
+    python -m harness.throttling TC012 --profiles pixel-4g --network 200/1200/600
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import dataclass
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from harness import config
+from harness.runner import ContextHook, find_tcs, on_new_page, run_tcs
+
+# Latency (ms) and throughput (kbit/s), DevTools/Lighthouse presets
+NETWORKS = {
+    "4g": {"latency_ms": 60, "down_kbps": 9000, "up_kbps": 1500},
+    "slow-4g": {"latency_ms": 150, "down_kbps": 1600, "up_kbps": 750},
+    "3g": {"latency_ms": 300, "down_kbps": 750, "up_kbps": 250},
+    "slow-3g": {"latency_ms": 2000, "down_kbps": 400, "up_kbps": 400},
+}
+
+
+@dataclass
+class Profile:
+    name: str
+    device: str = None      # key of playwright.devices
+    cpu_rate: float = 1.0   # 4 = four times slower than this machine
+    network: str = None     # key of NETWORKS
+
+
+PROFILES = {
+    "desktop": Profile("desktop"),
+    "pixel-4g": Profile("pixel-4g", "Pixel 5", 4, "4g"),
+    "midrange-android": Profile("midrange-android", "Moto G4", 4, "slow-4g"),
+    "lowend-android": Profile("lowend-android", "Moto G4", 6, "3g"),
+    "iphone-4g": Profile("iphone-4g", "iPhone 12", 2, "4g"),
+}
+
+TIMING_JS = """
+() => {
+  const nav = performance.getEntriesByType('navigation')[0];
+  const fcp = performance.getEntriesByName('first-contentful-paint')[0];
+  return nav && {
+    url: location.pathname,
+    dom_content_loaded_ms: nav.domContentLoadedEventEnd,
+    load_ms: nav.loadEventEnd,
+    fcp_ms: fcp ? fcp.startTime : null,
+    transfer_bytes: nav.transferSize,
+  };
+}
+"""
+
+
+def parse_network(text):
+    """``NAME`` from :data:`NETWORKS` or ``latency_ms/down_kbps/up_kbps``."""
+    if text in NETWORKS:
+        return NETWORKS[text]
+    try:
+        latency, down, up = (float(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected one of %s or LATENCY/DOWN/UP, got %r"
+                                         % (", ".join(NETWORKS), text))
+    return {"latency_ms": latency, "down_kbps": down, "up_kbps": up}
+
+
+async def device_descriptors(names):
+    """Playwright descriptors as ``new_context`` options (they live on the driver)."""
+    async with async_playwright() as pw:
+        descriptors = {}
+        for name in names:
+            if name not in pw.devices:
+                raise SystemExit("Unknown device %r" % name)
+            descriptor = dict(pw.devices[name])
+            descriptor.pop("default_browser_type", None)
+            descriptors[name] = descriptor
+        return descriptors
+
+
+class ThrottleHook(ContextHook):
+    def __init__(self, profile, descriptor=None, network=None):
+        self.profile = profile
+        self.descriptor = descriptor or {}
+        self.network = network
+        self.loads = []
+
+    def context_options(self, options):
+        # Explicit TC options win over the device
+        return dict(self.descriptor, **options)
+
+    async def on_context(self, context):
+        on_new_page(context, self._throttle)
+
+    async def _throttle(self, page):
+        cdp = await page.context.new_cdp_session(page)
+        if self.profile.cpu_rate > 1:
+            await cdp.send("Emulation.setCPUThrottlingRate", {"rate": self.profile.cpu_rate})
+        if self.network:
+            await cdp.send("Network.enable")
+            await cdp.send("Network.emulateNetworkConditions", {
+                "offline": False,
+                "latency": self.network["latency_ms"],
+                # CDP wants bytes per second
+                "downloadThroughput": self.network["down_kbps"] * 1000 / 8,
+                "uploadThroughput": self.network["up_kbps"] * 1000 / 8,
+            })
+        page.on("load", self._on_load)
+
+    async def _on_load(self, page):
+        try:
+            timing = await page.evaluate(TIMING_JS)
+        except async_api.Error:
+            return
+        if timing:
+            self.loads.append(timing)
+
+    def on_finish(self, result):
+        result.extras["profile"] = self.profile.name
+        result.extras["page_loads"] = self.loads
+        self.loads = []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run TCs under device/CPU/network profiles")
+    parser.add_argument("tests", nargs="*", help="TC ids; all when omitted")
+    parser.add_argument("--profiles", nargs="+", choices=tuple(PROFILES), default=["midrange-android"])
+    parser.add_argument("--cpu", type=float, default=None, help="override the profiles' CPU slowdown")
+    parser.add_argument("--network", type=parse_network, default=None,
+                        help="override the profiles' network: preset name or LATENCY/DOWN/UP (ms/kbps)")
+    args = parser.parse_args(argv)
+
+    profiles = [PROFILES[name] for name in args.profiles]
+    descriptors = asyncio.run(device_descriptors({p.device for p in profiles if p.device}))
+    paths = find_tcs(args.tests)
+    durations = {}
+    passed = True
+    for profile in profiles:
+        if args.cpu is not None:
+            profile = Profile(profile.name, profile.device, args.cpu, profile.network)
+        network = args.network or NETWORKS.get(profile.network)
+        hook = ThrottleHook(profile, descriptors.get(profile.device), network)
+        print("== %s (%s, cpu %gx, %s)" % (profile.name, profile.device or "desktop", profile.cpu_rate,
+                                           "%(latency_ms)gms %(down_kbps)g/%(up_kbps)gkbps" % network
+                                           if network else "no network throttling"))
+        results = run_tcs(paths, [hook])
+        passed = passed and all(r.passed for r in results)
+        for result in results:
+            durations.setdefault(result.name, {})[profile.name] = (result.duration_s, result.passed)
+        with open(config.output_path("throttling-%s.json" % profile.name), "w", encoding="utf-8") as fh:
+            json.dump([r.__dict__ for r in results], fh, indent=2)
+
+    print("%-7s %s" % ("TC", "".join("%18s" % p.name for p in profiles)))
+    for name, by_profile in durations.items():
+        print("%-7s %s" % (name, "".join(
+            "%16.1fs%s" % (by_profile[p.name][0], " " if by_profile[p.name][1] else "!") for p in profiles)))
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""Responsive checks for desktop, tablet and phone viewports, all at once.
+
+TC012 "resizes to mobile" by scrolling a 1280x720 window, so the mobile
+layout is never rendered. This scenario opens one context per viewport in a
+single browser and drives them concurrently; each one checks:
+
+* no horizontal overflow on ``/`` and ``/loja`` (the widest offenders are
+  listed);
+* the navbar: desktop links from the ``md`` breakpoint (768px) up, the
+  ``MobileMenu`` trigger below it;
+* below ``md``, the mobile menu opens, closes with Escape and gives focus
+  back to its trigger;
+* the product modal on ``/loja`` fits the viewport and closes with Escape;
+* cumulative layout shift of each page (largest session window, as
+  web-vitals computes it) under ``--max-cls``.
+
+Screenshots of every step land in ``tmp/harness/viewports/`` and the
+result, with per-viewport and wall time, in ``tmp/harness/viewport_matrix.json``.
+
+Usage::
+
+    python -m harness.viewport_matrix
+    python -m harness.viewport_matrix --viewports iphone-se pixel-5 tablet --full-page
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import dataclass
+
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from harness import browser as hb
+from harness import config
+
+SCREENSHOT_DIR = config.OUTPUT_DIR / "viewports"
+
+# Tailwind ``md``: the navbar swaps the mobile menu for the desktop links here
+MD_BREAKPOINT = 768
+
+
+@dataclass
+class Viewport:
+    name: str
+    device: str = None  # key of playwright.devices; width/height otherwise
+    width: int = 0
+    height: int = 0
+
+
+VIEWPORTS = {
+    "desktop": Viewport("desktop", width=1280, height=720),
+    "desktop-wide": Viewport("desktop-wide", width=1920, height=1080),
+    "tablet": Viewport("tablet", "iPad Mini"),
+    "tablet-landscape": Viewport("tablet-landscape", "iPad Mini landscape"),
+    "iphone-se": Viewport("iphone-se", "iPhone SE"),
+    "iphone-12": Viewport("iphone-12", "iPhone 12"),
+    "pixel-5": Viewport("pixel-5", "Pixel 5"),
+    "galaxy-s9": Viewport("galaxy-s9", "Galaxy S9+"),
+}
+
+DESKTOP_LINKS = "nav div.hidden.md\\:flex"
+MENU_TRIGGER = '[aria-label="Abrir menu de navegação"]'
+MENU = "#mobile-navigation-menu"
+MODAL_TRIGGER = 'section [aria-haspopup="dialog"]'
+PRODUCT_MODAL = '[data-testid="product-modal"]'
+
+# Layout shifts grouped in session windows (gap < 1s, span < 5s); CLS is the worst window
+CLS_JS = """
+(() => {
+  const state = window.__harnessCls = { value: 0, shifts: 0, window: 0, first: 0, last: 0 };
+  new PerformanceObserver(list => {
+    for (const entry of list.getEntries()) {
+      if (entry.hadRecentInput) continue;
+      state.shifts += 1;
+      if (state.window && entry.startTime - state.last < 1000 && entry.startTime - state.first < 5000) {
+        state.window += entry.value;
+      } else {
+        state.window = entry.value;
+        state.first = entry.startTime;
+      }
+      state.last = entry.startTime;
+      state.value = Math.max(state.value, state.window);
+    }
+  }).observe({ type: 'layout-shift', buffered: true });
+})();
+"""
+
+OVERFLOW_JS = """
+() => {
+  const width = document.documentElement.clientWidth;
+  const offenders = [];
+  for (const el of document.body.querySelectorAll('*')) {
+    const right = el.getBoundingClientRect().right;
+    if (right > width + 1 && getComputedStyle(el).position !== 'fixed') {
+      const name = el.tagName.toLowerCase() + (el.id ? '#' + el.id : '')
+        + (typeof el.className === 'string' && el.className ? '.' + el.className.trim().split(/\\s+/).slice(0, 3).join('.') : '');
+      offenders.push({ element: name, right: Math.round(right) });
+    }
+  }
+  offenders.sort((a, b) => b.right - a.right);
+  return { scroll_width: document.documentElement.scrollWidth, width, offenders: offenders.slice(0, 5) };
+}
+"""
+
+
+class ViewportRun:
+    """Checks, CLS and screenshots of one viewport."""
+
+    def __init__(self, viewport, options, args):
+        self.viewport = viewport
+        self.options = options
+        self.args = args
+        self.width = options["viewport"]["width"]
+        self.mobile = self.width < MD_BREAKPOINT
+        self.checks = []
+        self.cls = {}
+        self.screenshots = []
+
+    def check(self, name, ok, detail=""):
+        self.checks.append({"check": name, "ok": bool(ok), "detail": detail})
+
+    async def screenshot(self, page, step):
+        path = SCREENSHOT_DIR / ("%s-%s.png" % (self.viewport.name, step))
+        await page.screenshot(path=str(path), full_page=self.args.full_page)
+        self.screenshots.append(str(path))
+
+    async def settle(self, page):
+        try:
+            await page.wait_for_load_state("networkidle", timeout=self.args.settle * 1000)
+        except async_api.TimeoutError:
+            pass
+
+    async def step(self, name, coro):
+        """Run one check step; a Playwright error fails it without ending the viewport."""
+        try:
+            await coro
+        except async_api.Error as exc:
+            self.check(name, False, str(exc).splitlines()[0])
+
+    async def overflow(self, page, route):
+        found = await page.evaluate(OVERFLOW_JS)
+        self.check("overflow %s" % route, found["scroll_width"] <= found["width"] + 1,
+                   ", ".join("%(element)s@%(right)dpx" % o for o in found["offenders"]))
+
+    async def navbar(self, page):
+        desktop = await page.locator(DESKTOP_LINKS).first.is_visible()
+        trigger = await page.locator(MENU_TRIGGER).first.is_visible()
+        expected = (False, True) if self.mobile else (True, False)
+        self.check("navbar", (desktop, trigger) == expected,
+                   "desktop links %s, menu button %s" % ("shown" if desktop else "hidden",
+                                                         "shown" if trigger else "hidden"))
+
+    async def mobile_menu(self, page):
+        await page.locator(MENU_TRIGGER).first.click()
+        menu = page.locator(MENU)
+        await menu.wait_for()
+        await self.overflow(page, "menu")
+        await self.screenshot(page, "menu")
+        await page.keyboard.press("Escape")
+        await menu.wait_for(state="hidden")
+        focused = await page.evaluate("() => document.activeElement && document.activeElement.getAttribute('aria-label')")
+        self.check("mobile menu", True)
+        self.check("menu focus return", focused == "Abrir menu de navegação", "focused %r" % focused)
+
+    async def product_modal(self, page):
+        await page.locator(MODAL_TRIGGER).first.click()
+        modal = page.locator(PRODUCT_MODAL)
+        await modal.wait_for()
+        box = await modal.bounding_box()
+        fits = box and box["x"] >= -1 and box["x"] + box["width"] <= self.width + 1
+        self.check("product modal fits", fits,
+                   "x=%.0f width=%.0f viewport=%d" % (box["x"], box["width"], self.width) if box else "no box")
+        await self.screenshot(page, "modal")
+        await page.keyboard.press("Escape")
+        await modal.wait_for(state="hidden")
+        self.check("product modal closes", True)
+
+    async def read_cls(self, page, route):
+        cls = await page.evaluate("() => window.__harnessCls")
+        self.cls[route] = cls["value"]
+        self.check("cls %s" % route, cls["value"] <= self.args.max_cls,
+                   "%.3f over %d shifts" % (cls["value"], cls["shifts"]))
+
+    async def run(self, browser):
+        started = time.perf_counter()
+        context = await hb.new_context(browser, **self.options)
+        await context.add_init_script(CLS_JS)
+        try:
+            page = await hb.open_page(context, "/")
+            await self.settle(page)
+            await self.step("overflow /", self.overflow(page, "/"))
+            await self.step("navbar", self.navbar(page))
+            await self.step("screenshot /", self.screenshot(page, "home"))
+            if self.mobile:
+                await self.step("mobile menu", self.mobile_menu(page))
+            await self.step("cls /", self.read_cls(page, "/"))
+
+            await page.goto(config.url("/loja"), timeout=self.args.timeout * 1000)
+            await self.settle(page)
+            await self.step("overflow /loja", self.overflow(page, "/loja"))
+            await self.step("screenshot /loja", self.screenshot(page, "loja"))
+            await self.step("product modal", self.product_modal(page))
+            await self.step("cls /loja", self.read_cls(page, "/loja"))
+        except async_api.Error as exc:
+            self.check("navigation", False, str(exc).splitlines()[0])
+        finally:
+            await context.close()
+        return {
+            "viewport": self.viewport.name,
+            "device": self.viewport.device,
+            "size": "%dx%d" % (self.width, self.options["viewport"]["height"]),
+            "mobile_layout": self.mobile,
+            "passed": all(c["ok"] for c in self.checks),
+            "duration_s": time.perf_counter() - started,
+            "cls": self.cls,
+            "checks": self.checks,
+            "screenshots": self.screenshots,
+        }
+
+
+def context_options(pw, viewport):
+    """``new_context`` options of a viewport: its device descriptor or a bare size."""
+    if viewport.device is None:
+        return {"viewport": {"width": viewport.width, "height": viewport.height}}
+    if viewport.device not in pw.devices:
+        raise SystemExit("Unknown device %r" % viewport.device)
+    options = dict(pw.devices[viewport.device])
+    options.pop("default_browser_type", None)
+    return options
+
+
+async def run(args, report=print):
+    SCREENSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    async with async_playwright() as pw:
+        browser = await hb.launch(pw)
+        try:
+            runs = [ViewportRun(VIEWPORTS[name], context_options(pw, VIEWPORTS[name]), args)
+                    for name in args.viewports]
+            started = time.perf_counter()
+            results = await asyncio.gather(*(r.run(browser) for r in runs))
+            wall = time.perf_counter() - started
+        finally:
+            await browser.close()
+
+    for result in results:
+        failed = [c for c in result["checks"] if not c["ok"]]
+        report("%s %-17s %-9s %5.1fs  cls %s" % (
+            "PASS" if result["passed"] else "FAIL", result["viewport"], result["size"], result["duration_s"],
+            " ".join("%s=%.3f" % item for item in result["cls"].items()) or "-"))
+        for check in failed:
+            report("     %-22s %s" % (check["check"], check["detail"]))
+    serial = sum(r["duration_s"] for r in results)
+    report("%d viewports in %.1fs wall (%.1fs if run one after another)" % (len(results), wall, serial))
+    return {"wall_s": wall, "serial_s": serial, "viewports": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the responsive checks on many viewports in parallel")
+    parser.add_argument("--viewports", nargs="+", choices=tuple(VIEWPORTS), default=list(VIEWPORTS))
+    parser.add_argument("--max-cls", type=float, default=0.1, help="web-vitals 'good' threshold by default")
+    parser.add_argument("--full-page", action="store_true", help="full-page screenshots instead of the viewport")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds for a page load")
+    parser.add_argument("--settle", type=float, default=3.0, help="seconds to wait for network idle")
+    parser.add_argument("--out", default=str(config.output_path("viewport_matrix.json")))
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, indent=2)
+    return 0 if all(r["passed"] for r in result["viewports"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,387 @@
+"""Visual regression of the store, cart and checkout pages against a baseline.
+
+Each step of the scenario (``/``, ``/loja``, product modal, ``/carrinho``,
+``/checkout``, with the cart seeded by :mod:`harness.fixtures`) ends with a
+full-page screenshot on every ``--viewports`` entry of
+:mod:`harness.viewport_matrix`, all viewports in parallel.
+
+Storage is content-addressed: a PNG is kept once under
+``tmp/harness/visual/objects/<sha256>.png`` however many runs or viewports
+produce it, and a run is a small manifest ``{viewport/step: digest}``.
+Animations are frozen and the dynamic parts (event countdown, Pix QR codes)
+masked at capture, so unchanged pages hash the same and are not even decoded
+when compared. ``gc`` drops the objects no baseline or recent run uses.
+
+Frames that differ are compared with NumPy over whole arrays:
+
+* colour distance in YIQ space (pixelmatch's perceptual metric), against
+  ``--threshold``;
+* anti-aliasing: a differing pixel that matches a 1px neighbour in the other
+  image, both ways, is an edge that moved by rendering and is not counted;
+* the ignore regions recorded at capture are cleared from the diff.
+
+A frame fails above ``--max-diff`` of its pixels (or on a size change); a
+red/yellow diff image is written next to the run. Decoding and comparing run
+on a thread pool, so hundreds of full pages take seconds.
+
+Usage::
+
+    python -m harness.visual run                      # compare with the baseline
+    python -m harness.visual run --viewports desktop pixel-5 --update
+    python -m harness.visual approve                  # latest run becomes the baseline
+    python -m harness.visual gc --keep 10
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+from playwright import async_api
+from playwright.async_api import async_playwright
+
+from harness import browser as hb
+from harness import config
+from harness.fixtures import Fixtures
+from harness.viewport_matrix import MODAL_TRIGGER, PRODUCT_MODAL, VIEWPORTS, context_options
+
+VISUAL_DIR = config.OUTPUT_DIR / "visual"
+OBJECTS_DIR = VISUAL_DIR / "objects"
+RUNS_DIR = VISUAL_DIR / "runs"
+BASELINE_FILE = VISUAL_DIR / "baseline.json"
+
+# Content that changes by itself: masked in the screenshot and ignored by the diff
+IGNORE = (
+    "div.flex-wrap.justify-center.gap-4:has(> div > .bg-butterfly-orange)",  # EventCountdown
+    'img[alt="QR Code PIX"]',
+    'svg[style*="crispEdges"]',  # ui/qr-code
+)
+
+CART_LINK = '[data-testid="cart-icon"]'
+CART_ITEM = '[data-testid="cart-item"]'
+
+# Largest YIQ distance between two RGB colours (pixelmatch)
+MAX_DELTA = 35215.0
+NEIGHBOURS = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx]
+
+REGIONS_JS = """
+selectors => selectors.flatMap(sel => [...document.querySelectorAll(sel)].map(el => {
+  const r = el.getBoundingClientRect();
+  return [Math.floor(r.left + scrollX), Math.floor(r.top + scrollY), Math.ceil(r.width), Math.ceil(r.height)];
+})).filter(r => r[2] > 0 && r[3] > 0)
+"""
+
+
+def object_path(digest):
+    return OBJECTS_DIR / digest[:2] / ("%s.png" % digest)
+
+
+def store(png):
+    """Write ``png`` once under its SHA-256; returns the digest."""
+    digest = hashlib.sha256(png).hexdigest()
+    path = object_path(digest)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name("%s.%d.tmp" % (path.name, os.getpid()))
+        partial.write_bytes(png)
+        os.replace(partial, path)
+    return digest
+
+
+def load_rgb(digest):
+    with Image.open(object_path(digest)) as image:
+        return np.asarray(image.convert("RGB"))
+
+
+def yiq(rgb):
+    rgb = rgb.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    return np.stack((
+        r * 0.29889531 + g * 0.58662247 + b * 0.11448223,
+        r * 0.59597799 - g * 0.27417610 - b * 0.32180189,
+        r * 0.21147017 - g * 0.52261711 + b * 0.31114694,
+    ), axis=-1)
+
+
+def color_delta(a, b):
+    d = a - b
+    return 0.5053 * d[..., 0] ** 2 + 0.299 * d[..., 1] ** 2 + 0.1957 * d[..., 2] ** 2
+
+
+def matches_neighbour(a, b, ys, xs, limit):
+    """Whether each pixel ``(ys, xs)`` of ``a`` is within ``limit`` of a 1px neighbour in ``b``."""
+    height, width = b.shape[:2]
+    best = np.full(len(ys), np.inf, dtype=np.float32)
+    pixels = a[ys, xs]
+    for dy, dx in NEIGHBOURS:
+        yy = np.clip(ys + dy, 0, height - 1)
+        xx = np.clip(xs + dx, 0, width - 1)
+        np.minimum(best, color_delta(pixels, b[yy, xx]), out=best)
+    return best <= limit
+
+
+def compare(base, current, ignore=(), threshold=0.1):
+    """Differing pixels of two RGB arrays: ``(counts, diff mask, anti-aliasing mask)``.
+
+    Pixels outside the common area of different-sized frames all count as different.
+    """
+    height = min(base.shape[0], current.shape[0])
+    width = min(base.shape[1], current.shape[1])
+    a = yiq(base[:height, :width])
+    b = yiq(current[:height, :width])
+    limit = MAX_DELTA * threshold ** 2
+    diff = color_delta(a, b) > limit
+    for x, y, w, h in ignore:
+        diff[max(y, 0):max(y + h, 0), max(x, 0):max(x + w, 0)] = False
+    ys, xs = np.nonzero(diff)
+    aliased = np.zeros_like(diff)
+    if len(ys):
+        edge = matches_neighbour(a, b, ys, xs, limit) & matches_neighbour(b, a, ys, xs, limit)
+        aliased[ys[edge], xs[edge]] = True
+        diff[ys[edge], xs[edge]] = False
+    total = max(base.shape[0], current.shape[0]) * max(base.shape[1], current.shape[1])
+    outside = total - height * width
+    counts = {
+        "diff_pixels": int(diff.sum()) + outside,
+        "aa_pixels": int(aliased.sum()),
+        "total_pixels": total,
+    }
+    return counts, diff, aliased
+
+
+def diff_image(current, diff, aliased, path):
+    """Faded current frame with differences in red and anti-aliasing in yellow."""
+    height, width = diff.shape
+    out = (current[:height, :width].astype(np.float32) * 0.25 + 191).astype(np.uint8)
+    out[aliased] = (255, 200, 0)
+    out[diff] = (230, 0, 0)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(out).save(path)
+    return str(path)
+
+
+def compare_frame(name, base, current, args, diffs_dir):
+    """Status of one frame against its baseline entry (both manifest entries)."""
+    if base is None:
+        return {"name": name, "status": "new"}
+    if base["digest"] == current["digest"]:
+        return {"name": name, "status": "same"}
+    base_rgb = load_rgb(base["digest"])
+    current_rgb = load_rgb(current["digest"])
+    counts, diff, aliased = compare(base_rgb, current_rgb, base["ignore"] + current["ignore"], args.threshold)
+    ratio = counts["diff_pixels"] / counts["total_pixels"]
+    resized = base_rgb.shape != current_rgb.shape
+    result = dict(counts, name=name, diff_ratio=ratio, status="fail" if resized or ratio > args.max_diff else "pass")
+    if resized:
+        result["size"] = {"baseline": list(base_rgb.shape[1::-1]), "current": list(current_rgb.shape[1::-1])}
+    if result["status"] == "fail":
+        result["diff_image"] = diff_image(current_rgb, diff, aliased, diffs_dir / ("%s.png" % name.replace("/", "-")))
+    return result
+
+
+def compare_manifest(baseline, frames, args, diffs_dir):
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        return list(pool.map(lambda name: compare_frame(name, baseline.get(name), frames[name], args, diffs_dir),
+                             sorted(frames)))
+
+
+async def settle(page, timeout=5000):
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout)
+    except async_api.TimeoutError:
+        pass
+
+
+async def open_store(page):
+    await page.goto(config.url("/loja"))
+    await page.locator(MODAL_TRIGGER).first.wait_for()
+
+
+async def open_modal(page):
+    await page.locator(MODAL_TRIGGER).first.click()
+    await page.locator(PRODUCT_MODAL).wait_for()
+
+
+async def open_cart(page):
+    await page.keyboard.press("Escape")
+    await page.locator(PRODUCT_MODAL).wait_for(state="hidden")
+    await page.locator(CART_LINK).first.click()
+    await page.locator(CART_ITEM).first.wait_for()
+
+
+async def open_checkout(page):
+    await page.goto(config.url("/checkout"))
+    await settle(page)
+
+
+async def open_home(page):
+    await page.goto(config.url("/"))
+    await settle(page)
+
+
+STEPS = (
+    ("home", open_home),
+    ("loja", open_store),
+    ("product-modal", open_modal),
+    ("carrinho", open_cart),
+    ("checkout", open_checkout),
+)
+
+
+async def capture_viewport(browser, viewport, options, fixtures, storage_state, report):
+    """Run the steps on one viewport; ``{viewport/step: manifest entry}``."""
+    frames = {}
+    context = await hb.new_context(browser, storage_state=storage_state, **options)
+    try:
+        if storage_state is None:
+            await fixtures.local_cart(context, products=1)
+        page = await context.new_page()
+        for step, action in STEPS:
+            name = "%s/%s" % (viewport, step)
+            try:
+                await action(page)
+                await page.evaluate("() => document.fonts.ready")
+                ignore = await page.evaluate(REGIONS_JS, list(IGNORE))
+                png = await page.screenshot(
+                    full_page=True, animations="disabled", caret="hide", scale="css",
+                    mask=[page.locator(selector) for selector in IGNORE],
+                )
+            except async_api.Error as exc:
+                report("%-28s %s" % (name, str(exc).splitlines()[0]))
+                break  # later steps build on this one
+            frames[name] = {"digest": store(png), "ignore": ignore}
+    finally:
+        await context.close()
+    return frames
+
+
+async def capture(args, report=print):
+    storage_state = args.storage_state if args.storage_state and os.path.exists(args.storage_state) else None
+    async with async_playwright() as pw:
+        fixtures = await Fixtures.start(pw, storage_state)
+        browser = await hb.launch(pw)
+        try:
+            if storage_state:
+                await fixtures.cart(products=1)
+            per_viewport = await asyncio.gather(*(
+                capture_viewport(browser, name, context_options(pw, VIEWPORTS[name]), fixtures, storage_state, report)
+                for name in args.viewports
+            ))
+        finally:
+            await browser.close()
+            await fixtures.cleanup()
+    return {name: frame for frames in per_viewport for name, frame in frames.items()}
+
+
+def load_json(path, default):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return default
+
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=2, sort_keys=True)
+
+
+def latest_run():
+    runs = sorted(RUNS_DIR.glob("*.json"))
+    if not runs:
+        raise SystemExit("No visual runs under %s" % RUNS_DIR)
+    return runs[-1]
+
+
+def approve(frames, names=None):
+    """Copy ``frames`` (all, or only ``names``) into the baseline."""
+    baseline = load_json(BASELINE_FILE, {})
+    baseline.update({name: frame for name, frame in frames.items() if not names or name in names})
+    write_json(BASELINE_FILE, baseline)
+    return len(baseline)
+
+
+def gc(keep):
+    """Delete objects referenced neither by the baseline nor by the last ``keep`` runs."""
+    runs = sorted(RUNS_DIR.glob("*.json"))
+    for old in runs[:-keep] if keep else runs:
+        old.unlink()
+    live = {frame["digest"] for frame in load_json(BASELINE_FILE, {}).values()}
+    for path in RUNS_DIR.glob("*.json"):
+        live.update(frame["digest"] for frame in load_json(path, {}).values())
+    removed = freed = 0
+    for path in OBJECTS_DIR.glob("*/*.png"):
+        if path.stem not in live:
+            freed += path.stat().st_size
+            path.unlink()
+            removed += 1
+    return removed, freed, len(live)
+
+
+def run(args, report=print):
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    frames = asyncio.run(capture(args, report))
+    write_json(RUNS_DIR / ("%s.json" % stamp), frames)
+
+    started = time.perf_counter()
+    results = compare_manifest(load_json(BASELINE_FILE, {}), frames, args, VISUAL_DIR / "diffs" / stamp)
+    elapsed = time.perf_counter() - started
+    for result in results:
+        if result["status"] in ("fail", "pass"):
+            report("%-4s %-28s %7.3f%% differ, %d anti-aliased%s" % (
+                result["status"].upper(), result["name"], 100 * result["diff_ratio"], result["aa_pixels"],
+                "  -> %s" % result["diff_image"] if "diff_image" in result else ""))
+        else:
+            report("%-4s %s" % (result["status"].upper(), result["name"]))
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("same", "pass", "fail", "new")}
+    report("%d frames compared in %.2fs: %s" % (len(results), elapsed,
+                                                ", ".join("%d %s" % (n, s) for s, n in counts.items())))
+    if args.update:
+        report("baseline: %d frames" % approve(frames))
+    elif counts["new"]:
+        report("new frames have no baseline; accept them with: python -m harness.visual approve")
+    return {"run": stamp, "compare_s": elapsed, "counts": counts, "frames": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screenshot regression against a content-addressed baseline")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="capture every step and compare with the baseline")
+    run_parser.add_argument("--viewports", nargs="+", choices=tuple(VIEWPORTS), default=["desktop", "tablet", "pixel-5"])
+    run_parser.add_argument("--storage-state", default=config.CUSTOMER_STORAGE_STATE,
+                            help="session used for /checkout; anonymous when the file is missing")
+    run_parser.add_argument("--threshold", type=float, default=0.1, help="per-pixel YIQ tolerance, 0..1")
+    run_parser.add_argument("--max-diff", type=float, default=0.001, help="fraction of pixels allowed to differ")
+    run_parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="frames compared in parallel")
+    run_parser.add_argument("--update", action="store_true", help="accept this run as the new baseline")
+    run_parser.add_argument("--out", default=str(config.output_path("visual.json")))
+    approve_parser = sub.add_parser("approve", help="make a run (default: the latest) the baseline")
+    approve_parser.add_argument("run", nargs="?", help="run id, e.g. 20250101-120000")
+    approve_parser.add_argument("--only", nargs="+", help="viewport/step names to accept")
+    gc_parser = sub.add_parser("gc", help="drop screenshots no baseline or recent run references")
+    gc_parser.add_argument("--keep", type=int, default=10, help="run manifests to keep")
+    args = parser.parse_args(argv)
+
+    if args.command == "approve":
+        path = RUNS_DIR / ("%s.json" % args.run) if args.run else latest_run()
+        print("baseline: %d frames (from %s)" % (approve(load_json(path, {}), args.only), path.stem))
+        return 0
+    if args.command == "gc":
+        removed, freed, live = gc(args.keep)
+        print("removed %d objects (%.1f MiB), %d still referenced" % (removed, freed / 2 ** 20, live))
+        return 0
+    result = run(args)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, indent=2)
+    return 1 if result["counts"]["fail"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
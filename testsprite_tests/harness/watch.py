@@ -0,0 +1,194 @@
+"""Rerun the TCs affected by each source change, against the warm browser.
+
+Polls ``src/`` and the ``TC*.py`` files for changes (mtime scan, no extra
+dependency). Changed files are mapped to features through the
+feature -> files list in ``tmp/code_summary.json`` and features to TCs
+through :data:`FEATURE_TCS`; an edited TC file reruns that TC. A ``src/``
+file listed in no feature falls back to the features whose files share its
+directory, and then to ``--fallback``.
+
+Affected TCs run in a ``harness.runner`` subprocess connected to
+:mod:`harness.browser_server` (started here when it is not up), and its
+output streams to the terminal line by line. When a newer change lands
+mid-run, the run is killed and restarted with the TCs it had not finished
+plus the newly affected ones. Vite HMR keeps serving the edited modules in
+the meantime, so the rerun sees them without a reload of the dev server.
+
+Usage::
+
+    python -m harness.watch
+    python -m harness.watch --fallback TC001 TC004 --debounce 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+
+from harness import browser_server, config
+from harness.runner import find_tcs, tc_id
+
+REPO_DIR = config.TESTS_DIR.parent
+CODE_SUMMARY = config.TESTS_DIR / "tmp" / "code_summary.json"
+
+# TCs exercising each feature of tmp/code_summary.json (by feature name)
+FEATURE_TCS = {
+    "API AbacatePay": ["TC007", "TC008", "TC016"],
+    "Componentes Admin": ["TC009", "TC010"],
+    "Checkout": ["TC005", "TC006", "TC007", "TC017"],
+    "Autenticação": ["TC001", "TC002", "TC003", "TC013"],
+    "Realtime e Offline": ["TC011"],
+    "UI Base": ["TC004", "TC012"],
+    "Testes Unitários e Integração": ["TC015"],
+    "Aplicação": ["TC001", "TC004", "TC013"],
+    "Monitoramento e Logs": ["TC014"],
+    "Webhooks e Serviços Auxiliares": ["TC008", "TC016"],
+    "MCP AbacatePay": ["TC007"],
+}
+
+RESULT_RE = re.compile(r"^(PASS|FAIL) (TC\d{3})\b")
+
+
+def load_features(path=CODE_SUMMARY):
+    """``{feature name: [repo-relative file, ...]}``."""
+    with open(path, encoding="utf-8") as fh:
+        summary = json.load(fh)
+    return {feature["name"]: feature["files"] for feature in summary["features"]}
+
+
+def scan(roots):
+    """``{repo-relative path: mtime_ns}`` of every file under ``roots`` plus the TC files."""
+    files = {}
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(REPO_DIR / root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".") and d != "node_modules"]
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    files[os.path.relpath(path, REPO_DIR)] = os.stat(path).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+    for path in find_tcs():
+        files[os.path.relpath(path, REPO_DIR)] = path.stat().st_mtime_ns
+    return files
+
+
+def changed_files(before, after):
+    return sorted(path for path in set(before) | set(after) if before.get(path) != after.get(path))
+
+
+def affected_tcs(paths, features, fallback):
+    """TC ids to rerun for the changed ``paths``."""
+    tcs = set()
+    for path in paths:
+        name = os.path.basename(path)
+        if re.match(r"TC\d{3}_", name):
+            tcs.add(name[:5])
+            continue
+        hits = [feature for feature, files in features.items() if path in files]
+        if not hits:
+            folder = os.path.dirname(path)
+            hits = [feature for feature, files in features.items()
+                    if any(os.path.dirname(f) == folder for f in files)]
+        for feature in hits:
+            tcs.update(FEATURE_TCS.get(feature, ()))
+        if not hits:
+            tcs.update(fallback)
+    return tcs
+
+
+async def rerun(tcs, done, report):
+    """Run ``tcs`` in one runner subprocess, streaming its output.
+
+    TC ids are added to ``done`` as their result lines arrive, so a cancelled
+    run leaves behind exactly the TCs still to do.
+    """
+    report("-- running %s" % " ".join(tcs))
+    started = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "harness.runner", *tcs,
+        cwd=str(config.TESTS_DIR), env=dict(os.environ, PYTHONUNBUFFERED="1"),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+    )
+    try:
+        async for raw in proc.stdout:
+            line = raw.decode(errors="replace").rstrip()
+            match = RESULT_RE.match(line)
+            if match:
+                done.add(match.group(2))
+            report("   " + line)
+        await proc.wait()
+    except asyncio.CancelledError:
+        proc.kill()
+        await proc.wait()
+        raise
+    report("-- %d/%d finished in %.1fs" % (len(done), len(tcs), time.perf_counter() - started))
+
+
+async def watch(args, report=print):
+    features = load_features(args.code_summary)
+    snapshot = scan(args.roots)
+    report("watching %s and %d TC files" % (", ".join(args.roots), len(find_tcs())))
+    task = None
+    todo = []
+    done = set()
+    while True:
+        await asyncio.sleep(args.interval)
+        current = scan(args.roots)
+        changed = changed_files(snapshot, current)
+        if not changed:
+            continue
+        # Editors write in bursts; wait for the tree to stop moving
+        await asyncio.sleep(args.debounce)
+        current = scan(args.roots)
+        changed = changed_files(snapshot, current)
+        snapshot = current
+        tcs = affected_tcs(changed, features, args.fallback)
+        report("changed %s -> %s" % (", ".join(changed[:5]) + (" ..." if len(changed) > 5 else ""),
+                                     " ".join(sorted(tcs)) or "nothing to run"))
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            report("-- cancelled, %d TCs carried over" % len(set(todo) - done))
+            tcs |= set(todo) - done
+        if not tcs:
+            continue
+        todo = sorted(tcs)
+        done = set()
+        task = asyncio.ensure_future(rerun(todo, done, report))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rerun affected TCs on every source change")
+    parser.add_argument("--roots", nargs="+", default=["src"], help="repo directories to watch")
+    parser.add_argument("--code-summary", default=str(CODE_SUMMARY))
+    parser.add_argument("--fallback", nargs="*", default=["TC001", "TC004"],
+                        help="TCs for changes that map to no feature")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between scans")
+    parser.add_argument("--debounce", type=float, default=0.3)
+    args = parser.parse_args(argv)
+    args.fallback = [tc_id(path) for path in find_tcs(args.fallback)]
+
+    started_server = False
+    if not browser_server.endpoint():
+        print("starting browser server")
+        browser_server.start_detached(["--warm", "/"])
+        started_server = True
+    try:
+        asyncio.run(watch(args))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if started_server:
+            browser_server.stop_server()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
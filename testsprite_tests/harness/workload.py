@@ -0,0 +1,182 @@
+"""Record the PostgREST queries the E2E flows issue and parse them into shapes.
+
+Every ``supabase.from(...)`` call in the frontend becomes a request to
+``/rest/v1/<table>?<filters>``. :class:`WorkloadRecorder` captures those
+requests from the browser while the TCs run; :func:`parse_request` turns each
+one into a :class:`QueryShape` (table, filter columns, order-by) that the
+index advisor aggregates.
+
+Each run truncates ``--out``; ``--append`` adds to it instead, so counts
+only accumulate across runs when asked to.
+
+Usage::
+
+    python -m harness.workload --out tmp/harness/workload.jsonl TC004 TC005 TC010
+    python -m harness.workload --append TC016
+"""
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from urllib.parse import parse_qsl, urlsplit
+
+from harness import config
+from harness.runner import ContextHook, find_tcs, run_tcs, tc_id
+
+REST_PREFIX = "/rest/v1/"
+
+# Query-string keys PostgREST reserves for non-filter purposes
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns", "or", "and"}
+
+EQUALITY_OPS = {"eq", "is", "in"}
+RANGE_OPS = {"gt", "gte", "lt", "lte", "like", "ilike"}
+
+# Lookups issued server-side (webhook-abacatepay function, webhook server,
+# reconciliation agent). They never go through the browser, so they are
+# merged into every workload explicitly, each counted ``server_weight``
+# times (once by default, whatever the number of recorded runs).
+SERVER_WORKLOAD = [
+    ("GET", "/rest/v1/orders?select=*&payment_id=eq.pix_char_0000&payment_status=eq.paid"),
+    ("GET", "/rest/v1/orders?select=*&external_id=eq.order_0000&limit=1"),
+    ("GET", "/rest/v1/orders?select=*&id=eq.00000000-0000-0000-0000-000000000000"),
+    ("GET", "/rest/v1/orders?select=*&status=eq.pending&created_at=gte.2025-01-01T00:00:00Z"),
+    ("GET", "/rest/v1/order_items?select=*&order_id=eq.00000000-0000-0000-0000-000000000000"),
+    ("GET", "/rest/v1/tickets?select=*&order_id=eq.00000000-0000-0000-0000-000000000000"),
+    ("GET", "/rest/v1/customers?select=*&email=eq.cliente@example.com"),
+    ("GET", "/rest/v1/abacatepay_charges?select=*&charge_id=eq.pix_char_0000"),
+    ("GET", "/rest/v1/webhooks?select=*&order_id=is.null&created_at=gte.2025-01-01T00:00:00Z"),
+]
+
+
+@dataclass
+class QueryShape:
+    """Table access pattern extracted from one PostgREST request."""
+
+    method: str
+    table: str
+    equality: list = field(default_factory=list)   # [(column, value)]
+    ranges: list = field(default_factory=list)     # [(column, op, value)]
+    order: list = field(default_factory=list)      # [(column, "asc"|"desc")]
+    limit: int = None
+
+    def key(self):
+        """Value-independent identity used to aggregate repeated queries."""
+        return (
+            self.table,
+            tuple(sorted(c for c, _ in self.equality)),
+            tuple(sorted((c, op) for c, op, _ in self.ranges)),
+            tuple(self.order),
+        )
+
+
+def _split_value(raw):
+    """``not.eq.x`` -> ("eq", "x", True); ``eq.x`` -> ("eq", "x", False)."""
+    negated = raw.startswith("not.")
+    if negated:
+        raw = raw[4:]
+    op, _, value = raw.partition(".")
+    return op, value, negated
+
+
+def parse_order(raw):
+    """``created_at.desc.nullslast,id`` -> [("created_at", "desc"), ("id", "asc")]."""
+    order = []
+    for part in filter(None, raw.split(",")):
+        column, *modifiers = part.split(".")
+        order.append((column, "desc" if "desc" in modifiers else "asc"))
+    return order
+
+
+def parse_request(method, url):
+    """Parse a PostgREST URL into a :class:`QueryShape`; ``None`` for RPC/other."""
+    parts = urlsplit(url)
+    if REST_PREFIX not in parts.path:
+        return None
+    table = parts.path.split(REST_PREFIX, 1)[1].strip("/")
+    if not table or table.startswith("rpc/") or "/" in table:
+        return None
+    shape = QueryShape(method=method.upper(), table=table)
+    for key, raw in parse_qsl(parts.query, keep_blank_values=True):
+        if key == "order":
+            shape.order = parse_order(raw)
+        elif key == "limit" and raw.isdigit():
+            shape.limit = int(raw)
+        elif key in RESERVED_PARAMS or "." in key:
+            # Embedded-resource filters (``orders.status``) belong to a join
+            continue
+        else:
+            op, value, negated = _split_value(raw)
+            if negated:
+                continue
+            if op in EQUALITY_OPS:
+                shape.equality.append((key, value))
+            elif op in RANGE_OPS:
+                shape.ranges.append((key, op, value))
+    return shape
+
+
+def load_workload(path, include_server=True, server_weight=1):
+    """Read a recorded JSONL workload into a list of :class:`QueryShape`."""
+    shapes = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            shape = parse_request(entry["method"], entry["url"])
+            if shape:
+                shapes.append(shape)
+    if include_server:
+        server = list(filter(None, (parse_request(m, u) for m, u in SERVER_WORKLOAD)))
+        shapes.extend(shape for shape in server for _ in range(server_weight))
+    return shapes
+
+
+class WorkloadRecorder(ContextHook):
+    """Write every PostgREST request seen by a context to a JSONL file."""
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.current_tc = ""
+        self.count = 0
+        self._fh = open(path, "a" if append else "w", encoding="utf-8")
+
+    async def on_context(self, context):
+        context.on("request", self._on_request)
+
+    def _on_request(self, request):
+        if REST_PREFIX not in request.url:
+            return
+        entry = {"tc": self.current_tc, "ts": time.time(), "method": request.method, "url": request.url}
+        self._fh.write(json.dumps(entry) + "\n")
+        self.count += 1
+
+    def on_finish(self, result):
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record PostgREST queries issued by the TC flows")
+    parser.add_argument("tests", nargs="*", help="TC ids; all when omitted")
+    parser.add_argument("--out", default=str(config.output_path("workload.jsonl")))
+    parser.add_argument("--append", action="store_true", help="add to --out instead of replacing it")
+    args = parser.parse_args(argv)
+
+    recorder = WorkloadRecorder(args.out, args.append)
+    try:
+        for path in find_tcs(args.tests):
+            recorder.current_tc = tc_id(path)
+            run_tcs([path], [recorder])
+    finally:
+        recorder.close()
+    print("Recorded %d PostgREST requests to %s" % (recorder.count, args.out))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())